@@ -0,0 +1,266 @@
+"""
+Admission control middleware
+Classifies each request as cheap, normal or heavy, tracks what is in flight
+and how far the event loop is lagging, and answers requests over the limit
+at once with "server busy" so cheap MCP calls keep low latency while scans
+saturate the machine.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+import anyio
+
+logger = logging.getLogger(__name__)
+
+CHEAP, NORMAL, HEAVY = 0, 1, 2
+PRIORITY_NAMES = ("cheap", "normal", "heavy")
+
+# Concurrent requests per class before new ones are shed (cheap: the hard cap for everything)
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", 512))
+MAX_NORMAL = int(os.getenv("MAX_NORMAL_REQUESTS", 64))
+MAX_CONCURRENT_SCANS = int(os.getenv("MAX_CONCURRENT_SCANS", 2))
+# Open notification streams, which stay open for as long as their client and
+# are counted apart from requests so idle subscribers cannot use up MAX_IN_FLIGHT
+MAX_STREAMS = int(os.getenv("MAX_STREAMS", 256))
+# Event-loop lag (seconds) above which normal and heavy requests are shed
+LAG_SHED_NORMAL = 1.0
+LAG_SHED_HEAVY = 0.25
+
+JSONRPC_PATHS = ("/", "/mcp", "/rpc", "/sse")
+CHEAP_METHODS = ("initialize", "ping", "tools/list", "resources/list", "prompts/list")
+CHEAP_TOOLS = ("validate",)
+HEAVY_TOOLS = ("scan_repository",)
+HEAVY_PATHS = ("/scan", "/cluster")
+# GET on these with Accept: text/event-stream opens a notification stream
+STREAM_PATHS = ("/mcp",)
+NORMAL_PREFIXES = ("/findings", "/validate/batch")
+# Only bodies this small are inspected to classify a request
+MAX_CLASSIFY_BODY = 64 * 1024
+# Tool names in the part of a larger body that was read
+_TOOL_NAME = re.compile(rb'"name"\s*:\s*"([^"\\]*)"')
+
+BUSY_JSONRPC_CODE = -32000
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from a short sleep"""
+
+    def __init__(self, interval: float = 0.1, decay: float = 0.7):
+        self.interval = interval
+        self.decay = decay
+        self.lag = 0.0
+        # Heartbeat read by the stall watchdog's thread: when the loop last woke up, and where it runs
+        self.beat: Optional[float] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread_id: Optional[int] = None
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        while True:
+            start = anyio.current_time()
+            self.beat = time.monotonic()
+            await anyio.sleep(self.interval)
+            observed = max(0.0, anyio.current_time() - start - self.interval)
+            # Spikes register at once and fade over a few intervals
+            self.lag = max(observed, self.lag * self.decay)
+
+
+class AdmissionController:
+    """Counts in-flight requests per class and decides whether a new one fits"""
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, max_normal: int = MAX_NORMAL,
+                 max_heavy: int = MAX_CONCURRENT_SCANS, monitor: Optional[LoopLagMonitor] = None,
+                 max_streams: int = MAX_STREAMS):
+        self.limits = (max_in_flight, max_normal, max_heavy)
+        self.lag_limits = (None, LAG_SHED_NORMAL, LAG_SHED_HEAVY)
+        self.monitor = monitor or LoopLagMonitor()
+        self.in_flight = [0, 0, 0]
+        self.shed = [0, 0, 0]
+        self.max_streams = max_streams
+        self.streams = 0
+        self.streams_shed = 0
+
+    def try_admit(self, priority: int) -> bool:
+        # Runs on the event loop thread between awaits, so plain counters are safe
+        total = sum(self.in_flight)
+        lag_limit = self.lag_limits[priority]
+        if (total >= self.limits[CHEAP]
+                or (priority != CHEAP and self.in_flight[priority] >= self.limits[priority])
+                or (lag_limit is not None and self.monitor.lag > lag_limit)):
+            self.shed[priority] += 1
+            return False
+        self.in_flight[priority] += 1
+        return True
+
+    def release(self, priority: int):
+        self.in_flight[priority] -= 1
+
+    def try_open_stream(self) -> bool:
+        if self.streams >= self.max_streams:
+            self.streams_shed += 1
+            return False
+        self.streams += 1
+        return True
+
+    def close_stream(self):
+        self.streams -= 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": dict(zip(PRIORITY_NAMES, self.in_flight)),
+            "shed": dict(zip(PRIORITY_NAMES, self.shed)),
+            "streams": {"open": self.streams, "shed": self.streams_shed},
+            "loop_lag_ms": round(self.monitor.lag * 1000, 1),
+        }
+
+
+def _message_priority(message) -> int:
+    if not isinstance(message, dict):
+        return NORMAL
+    method = message.get("method", "")
+    if method in CHEAP_METHODS or method.startswith("notifications/"):
+        return CHEAP
+    if method == "tools/call":
+        params = message.get("params") or {}
+        tool = params.get("name") if isinstance(params, dict) else None
+        if tool in CHEAP_TOOLS:
+            return CHEAP
+        if tool in HEAVY_TOOLS:
+            return HEAVY
+    return NORMAL
+
+
+def _truncated_priority(body: bytes) -> int:
+    """
+    Priority of a body only partly read: never cheap, and heavy unless the
+    tools named in the part read are known and none of them is heavy
+    """
+    tools = {name.decode("utf-8", "replace") for name in _TOOL_NAME.findall(body)}
+    if not tools or tools & set(HEAVY_TOOLS):
+        return HEAVY
+    return NORMAL
+
+
+def classify(method: str, path: str, body: bytes) -> int:
+    """Priority of a request from its path and, for MCP calls, its JSON-RPC method and tool"""
+    if path in HEAVY_PATHS:
+        return HEAVY
+    if path.startswith(NORMAL_PREFIXES):
+        return NORMAL
+    if method != "POST" or (path not in JSONRPC_PATHS and path != "/mcp/tools/call"):
+        return CHEAP  # Pages, static files, health, discovery, /validate
+    if len(body) > MAX_CLASSIFY_BODY:
+        return _truncated_priority(body)
+    try:
+        message = json.loads(body)
+    except ValueError:
+        return NORMAL  # Rejected by the endpoint, which still has to read and parse it
+    if path == "/mcp/tools/call":
+        message = {"method": "tools/call", "params": message}
+    if isinstance(message, list):
+        return max((_message_priority(item) for item in message), default=CHEAP)
+    return _message_priority(message)
+
+
+def is_stream(method: str, path: str, headers) -> bool:
+    """Whether a request opens a long-lived notification stream"""
+    if method != "GET" or path not in STREAM_PATHS:
+        return False
+    return any(name == b"accept" and b"text/event-stream" in value for name, value in headers)
+
+
+def busy_response(path: str, body: bytes) -> bytes:
+    if path in JSONRPC_PATHS:
+        try:
+            request_id = json.loads(body).get("id")
+        except (ValueError, AttributeError):
+            request_id = None
+        return json.dumps({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {"code": BUSY_JSONRPC_CODE, "message": "Server busy, retry later"}
+        }).encode()
+    return json.dumps({"success": False, "error": "Server busy, retry later"}).encode()
+
+
+class AdmissionMiddleware:
+    """ASGI middleware shedding requests the controller does not admit with a fast 503"""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or AdmissionController()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            # The lag monitor lives as long as the server
+            async with anyio.create_task_group() as task_group:
+                task_group.start_soon(self.controller.monitor.run)
+                await self.app(scope, receive, send)
+                task_group.cancel_scope.cancel()
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"].rstrip("/") or "/"
+        if is_stream(scope["method"], path, scope["headers"]):
+            if not self.controller.try_open_stream():
+                logger.warning(f"Shedding stream to {path}: {self.controller.stats()}")
+                await self._busy(send, path, b"")
+                return
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.controller.close_stream()
+            return
+
+        body = b""
+        messages = []
+        if scope["method"] == "POST" and (path in JSONRPC_PATHS or path == "/mcp/tools/call"):
+            # Read the (small) body to classify, then hand the same messages to the app
+            while True:
+                message = await receive()
+                messages.append(message)
+                if message["type"] != "http.request":
+                    break
+                body += message.get("body", b"")
+                if not message.get("more_body", False) or len(body) > MAX_CLASSIFY_BODY:
+                    break
+
+        priority = classify(scope["method"], path, body)
+        if not self.controller.try_admit(priority):
+            logger.warning(f"Shedding {PRIORITY_NAMES[priority]} request to {path}: {self.controller.stats()}")
+            await self._busy(send, path, body)
+            return
+
+        async def replay_receive():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        try:
+            await self.app(scope, replay_receive, send)
+        finally:
+            self.controller.release(priority)
+
+    @staticmethod
+    async def _busy(send, path: str, body: bytes):
+        content = busy_response(path, body)
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(content)).encode()),
+                (b"retry-after", b"1"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": content})
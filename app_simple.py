@@ -6,12 +6,35 @@ This is a simplified version to ensure compatibility with Vercel serverless func
 from fastapi import FastAPI, HTTPException, Depends, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import logging
 import os
 import json
+import secrets
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import anyio
+import numpy as np
+
+import auth_tokens
+import cursors
+import scanner
+from admission import AdmissionController, AdmissionMiddleware
+from capture import CAPTURE_FILE, CaptureMiddleware
+from coalesce import IdempotencyConflict, Outcome, ToolCalls, principal_of
+from compression import CompressionMiddleware
+from deadlines import DeadlineMiddleware, parse_timeout
+from loop_watchdog import LoopWatchdog
+import mcp_resources
+from mcp_resources import findings_page, sse_event
+from scanner import cancel
+from scanner import cluster
+from scanner import progress as scan_progress
+from scanner import export
+from scanner.store import get_store
+from static_assets import StaticAssetCache
 
 # Configure logging for Vercel
 logging.basicConfig(level=logging.INFO)
@@ -24,9 +47,17 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Mount static files
-if os.path.exists("static"):
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+# Static assets are served from memory; set STATIC_RELOAD=1 in dev to pick up edits
+static_assets = StaticAssetCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"),
+    reload=os.getenv("STATIC_RELOAD", "0") == "1",
+)
+
+def warmup():
+    """Populate caches before serve.py forks workers so each starts hot"""
+    static_assets.load_all()
+    get_store()
+    scanner.warmup()
 
 # CORS middleware
 app.add_middleware(
@@ -37,6 +68,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Sampled, redacted request/response capture for replay.py (enabled by CAPTURE_FILE);
+# inside compression so bodies are recorded as the app produced them
+if CAPTURE_FILE:
+    app.add_middleware(CaptureMiddleware)
+
+# Compress JSON/NDJSON/SSE responses above 1 KiB
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+# Per-request deadline (X-Request-Timeout, capped by REQUEST_TIMEOUT) and disconnect cancellation
+app.add_middleware(DeadlineMiddleware)
+
+# Outermost: shed load before any other work is done for a request
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+# Logs event-loop stalls with the stack of the code blocking the loop (LOOP_STALL_THRESHOLD)
+loop_watchdog = LoopWatchdog(admission.monitor)
+
 # Security
 security = HTTPBearer()
 
@@ -62,15 +110,332 @@ class HealthResponse(BaseModel):
     status: str = "healthy"
     version: str = "1.0.0"
     server: str = "VulnGPT MCP Server"
+    load: dict = {}
+
+# MCP tool definitions
+VALIDATE_TOOL = {
+    "name": "validate",
+    "description": "Validate bearer token and return user's phone number in country_code+number format",
+    "inputSchema": {
+        "type": "object",
+        "properties": {},
+        "required": []
+    }
+}
+
+VALIDATE_BATCH_TOOL = {
+    "name": "validate_batch",
+    "description": "Validate many bearer tokens at once; returns, in order, each token's phone number or an error code (invalid_token, expired, revoked, invalid_phone)",
+    "inputSchema": {
+        "type": "object",
+        "properties": {
+            "tokens": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Bearer tokens to validate"
+            }
+        },
+        "required": ["tokens"]
+    }
+}
+
+SCAN_TOOL = {
+    "name": "scan_repository",
+    "description": "Scan a GitHub repository for security vulnerabilities",
+    "inputSchema": {
+        "type": "object",
+        "properties": {
+            "repository_url": {
+                "type": "string",
+                "description": "The GitHub repository URL to scan"
+            },
+            "scan_type": {
+                "type": "string",
+                "description": "Type of scan to perform",
+                "enum": ["quick", "deep", "full"]
+            },
+            "commit": {
+                "type": "string",
+                "description": "Commit, branch or tag to scan (default: HEAD)"
+            },
+            "base_commit": {
+                "type": "string",
+                "description": "Only report findings introduced or fixed since this commit, scanning just the changed files"
+            }
+        },
+        "required": ["repository_url"]
+    }
+}
+
+LIST_FINDINGS_TOOL = {
+    "name": "list_findings",
+    "description": "List stored findings of the latest scan of a repository",
+    "inputSchema": {
+        "type": "object",
+        "properties": {
+            "repository_url": {
+                "type": "string",
+                "description": "The repository URL that was scanned"
+            },
+            "commit": {
+                "type": "string",
+                "description": "Commit of the scan (default: latest scan)"
+            },
+            "rule_id": {"type": "string"},
+            "severity": {
+                "type": "string",
+                "enum": ["Critical", "High", "Medium", "Low"]
+            },
+            "file": {
+                "type": "string",
+                "description": "File or directory path prefix"
+            },
+            "limit": {"type": "integer", "default": 100},
+            "cursor": {
+                "type": "string",
+                "description": "nextCursor of a previous page (list_findings or scan_repository); carries the scan and filters"
+            }
+        },
+        "required": ["repository_url"]
+    }
+}
+
+DIFF_SCANS_TOOL = {
+    "name": "diff_scans",
+    "description": "Compare two stored scans of a repository: new and fixed findings",
+    "inputSchema": {
+        "type": "object",
+        "properties": {
+            "repository_url": {
+                "type": "string",
+                "description": "The repository URL that was scanned"
+            },
+            "base_commit": {
+                "type": "string",
+                "description": "Commit to compare against (default: the previously scanned commit)"
+            },
+            "head_commit": {
+                "type": "string",
+                "description": "Commit to compare (default: latest scan)"
+            }
+        },
+        "required": ["repository_url"]
+    }
+}
+
+TOOLS = [VALIDATE_TOOL, VALIDATE_BATCH_TOOL, SCAN_TOOL, LIST_FINDINGS_TOOL, DIFF_SCANS_TOOL]
+
+SCAN_TYPES = ("quick", "deep", "full")
+SCAN_FORMATS = ("json", "sarif", "binary")
+
+# Page sizes: tools per tools/list response, findings in a scan_repository result
+TOOLS_PAGE_SIZE = int(os.getenv("TOOLS_PAGE_SIZE", 50))
+SCAN_RESULT_PAGE = int(os.getenv("SCAN_RESULT_PAGE", 100))
+TOOL_POSITIONS = {tool["name"]: index for index, tool in enumerate(TOOLS)}
+
+def list_tools(cursor: Optional[str] = None) -> dict:
+    """A page of the tools/list result; the cursor names the last tool of the previous page"""
+    start = 0
+    if cursor:
+        after = cursors.decode("tools", cursor).get("after")
+        if after not in TOOL_POSITIONS:
+            raise cursors.InvalidCursor("Invalid cursor")
+        start = TOOL_POSITIONS[after] + 1
+    page = TOOLS[start:start + TOOLS_PAGE_SIZE]
+    result = {"tools": page}
+    if start + TOOLS_PAGE_SIZE < len(TOOLS):
+        result["nextCursor"] = cursors.encode("tools", {"after": page[-1]["name"]})
+    return result
+
+async def execute_scan(repository_url: str, scan_type: str, commit: str = None) -> Tuple["scanner.ScanResult", Optional[Future]]:
+    """Validate a scan request and run the scan engine off the event loop"""
+    if not repository_url:
+        raise ValueError("Repository URL is required")
+    if scan_type not in SCAN_TYPES:
+        raise ValueError(f"Invalid scan type: {scan_type}")
+    return await anyio.to_thread.run_sync(scan_and_record, repository_url, scan_type, commit)
+
+def scan_and_record(repository_url: str, scan_type: str, commit: str = None) -> Tuple["scanner.ScanResult", Optional[Future]]:
+    """Scan a repository and queue the result for the findings store's writer thread; the future resolves to the scan id"""
+    result = scanner.scan_repository(repository_url, scan_type, commit)
+    store = get_store()
+    stored = store.record(repository_url, scan_type, result) if store is not None else None
+    return result, stored
+
+async def run_scan(repository_url: str, scan_type: str, commit: str = None, page_size: Optional[int] = None,
+                   rule_timings: bool = False) -> dict:
+    """
+    Run a scan and build the scan report. With a page size, the report names
+    the stored scan's resource and lists only its first page of findings,
+    with a nextCursor for list_findings. rule_timings adds the time each rule took
+    """
+    result, stored = await execute_scan(repository_url, scan_type, commit)
+    report = {
+        "repository_url": repository_url,
+        "scan_type": scan_type,
+        "commit": result.commit,
+        "files_scanned": result.files_scanned,
+        "vulnerabilities_found": len(result.findings),
+    }
+    if result.skipped:
+        report["skipped_files"] = result.skipped
+    if rule_timings:
+        report["rule_timings"] = result.rule_timings
+    if page_size is not None and stored is not None:
+        try:
+            scan_id = await anyio.to_thread.run_sync(stored.result)
+        except Exception as e:
+            logger.error(f"Returning all findings, the scan of {repository_url} was not stored: {e}")
+        else:
+            report["resource"] = mcp_resources.scan_uri(scan_id)
+            if len(result.findings) > page_size:
+                page = await anyio.to_thread.run_sync(findings_page, scan_id, {}, 0, page_size)
+                report["vulnerabilities"] = page["findings"]
+                report["nextCursor"] = page["nextCursor"]
+                return report
+    report["vulnerabilities"] = [finding.to_dict() for finding in result.findings]
+    return report
+
+async def run_diff(repository_url: str, scan_type: str, base_commit: str, commit: str = None) -> dict:
+    """Scan the files changed since base_commit and build the diff report"""
+    if not repository_url:
+        raise ValueError("Repository URL is required")
+    if scan_type not in SCAN_TYPES:
+        raise ValueError(f"Invalid scan type: {scan_type}")
+    result = await anyio.to_thread.run_sync(scanner.diff_repository, repository_url, base_commit, commit, scan_type)
+    report = {
+        "repository_url": repository_url,
+        "scan_type": scan_type,
+        "base_commit": result.base,
+        "commit": result.head,
+        "files_changed": result.files_changed,
+        "files_scanned": result.files_scanned,
+        "new_found": len(result.new),
+        "fixed_found": len(result.fixed),
+        "new": [finding.to_dict() for finding in result.new],
+        "fixed": [finding.to_dict() for finding in result.fixed],
+        "unchanged": [finding.to_dict() for finding in result.unchanged]
+    }
+    if result.skipped:
+        report["skipped_files"] = result.skipped
+    return report
+
+async def run_scan_tool(arguments: dict) -> dict:
+    """scan_repository tool: a full scan, or a diff scan when base_commit is given"""
+    repository_url = arguments.get("repository_url", "")
+    scan_type = arguments.get("scan_type", "quick")
+    if arguments.get("base_commit"):
+        return await run_diff(repository_url, scan_type, arguments["base_commit"], arguments.get("commit"))
+    return await run_scan(repository_url, scan_type, arguments.get("commit"), page_size=SCAN_RESULT_PAGE)
+
+def stored_scan(repository_url: str, commit: str = None, **kwargs) -> dict:
+    """Stored scan of a repository, raising ValueError when there is none"""
+    store = get_store()
+    if store is None:
+        raise ValueError("The findings store is disabled")
+    if not repository_url:
+        raise ValueError("Repository URL is required")
+    scan = store.find_scan(repository_url, commit, **kwargs)
+    if scan is None:
+        raise ValueError(f"No stored scan of {repository_url}" + (f" at {commit}" if commit else ""))
+    return scan
+
+def query_findings(arguments: dict) -> dict:
+    """
+    Stored findings of a scan, filtered by rule, severity and path prefix;
+    a cursor from a previous page carries the scan, filters and position
+    """
+    if arguments.get("cursor"):
+        if get_store() is None:
+            raise ValueError("The findings store is disabled")
+        position = cursors.decode("findings", arguments["cursor"])
+        scan = get_store().get_scan(position.get("scan"))
+        if scan is None:
+            raise cursors.InvalidCursor("Invalid cursor")
+        filters = {name: position[name] for name in mcp_resources.FINDINGS_FILTERS if name in position}
+        page = findings_page(scan["id"], filters, position.get("after", 0), position.get("limit", 100))
+        return {"scan": scan, "totals": get_store().count_findings(scan["id"]), **page}
+
+    scan = stored_scan(arguments.get("repository_url", ""), arguments.get("commit"))
+    try:
+        limit = int(arguments.get("limit", 100))
+        offset = int(arguments.get("offset", 0))
+    except (TypeError, ValueError):
+        raise ValueError("limit and offset must be integers")
+    filters = {name: arguments[name] for name in mcp_resources.FINDINGS_FILTERS if arguments.get(name)}
+    if offset:
+        # Offsets still work but cost more the deeper the page; cursors do not
+        findings = get_store().list_findings(scan["id"], limit=limit, offset=offset, **filters)
+        page = {"findings": [finding.to_dict() for finding in findings]}
+    else:
+        page = findings_page(scan["id"], filters, 0, limit)
+    return {"scan": scan, "totals": get_store().count_findings(scan["id"]), **page}
+
+def query_diff(arguments: dict) -> dict:
+    """New and fixed findings between two stored scans of a repository"""
+    repository_url = arguments.get("repository_url", "")
+    head = stored_scan(repository_url, arguments.get("head_commit"))
+    if arguments.get("base_commit"):
+        base = stored_scan(repository_url, arguments["base_commit"])
+    else:
+        base = stored_scan(repository_url, before=head["id"], other_than=head["commit"])
+    diff = get_store().diff(base["id"], head["id"])
+    return {
+        "base": base,
+        "head": head,
+        "new": [finding.to_dict() for finding in diff["new"]],
+        "fixed": [finding.to_dict() for finding in diff["fixed"]],
+        "totals": diff["totals"],
+        "truncated": diff["truncated"]
+    }
+
+FINDINGS_TOOLS = {"list_findings": query_findings, "diff_scans": query_diff}
+
+def findings_tool_result(tool_name: str, data: dict) -> dict:
+    """MCP tool result for a findings query: a summary plus the data as JSON"""
+    if tool_name == "diff_scans":
+        summary = f"{data['totals']['new']} new and {data['totals']['fixed']} fixed findings since {data['base']['commit'] or 'the previous scan'}."
+        if data["truncated"]:
+            summary += f" Only the first {max(len(data['new']), len(data['fixed']))} of each are listed."
+    else:
+        summary = f"{len(data['findings'])} findings from the scan of {data['scan']['repository']}."
+    return {
+        "content": [
+            {"type": "text", "text": summary},
+            {"type": "text", "text": json.dumps(data)}
+        ],
+        "isError": False
+    }
+
+def scan_tool_result(report: dict) -> dict:
+    """MCP tool result for a scan or diff report: a summary plus the report as JSON"""
+    if "base_commit" in report:
+        summary = (f"Diff scan completed for {report['repository_url']}. "
+                   f"{report['new_found']} new and {report['fixed_found']} fixed vulnerabilities in {report['files_changed']} changed files.")
+    else:
+        summary = f"Scan completed for {report['repository_url']}. Found {report['vulnerabilities_found']} vulnerabilities."
+    if report.get("skipped_files"):
+        summary += f" {len(report['skipped_files'])} files were skipped: limit exceeded."
+    return {
+        "content": [
+            {
+                "type": "text",
+                "text": summary
+            },
+            {
+                "type": "text",
+                "text": json.dumps(report)
+            }
+        ],
+        "isError": False
+    }
 
 # Routes
 @app.get("/", response_class=HTMLResponse)
-async def root():
+async def root(request: Request):
     """Serve the frontend HTML"""
-    try:
-        with open("static/index.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read(), status_code=200)
-    except FileNotFoundError:
+    response = static_assets.response(request, "index.html")
+    if response is None:
         # Fallback API response if frontend not found
         return {
             "message": "VulnGPT MCP Server is running",
@@ -81,19 +446,93 @@ async def root():
                 "health": "/health"
             }
         }
+    return response
 
 @app.get("/app")
-async def app_page():
+async def app_page(request: Request):
     """Alternative route to serve the frontend"""
-    return await root()
+    return await root(request)
+
+@app.get("/static/{asset_path:path}")
+async def static_file(asset_path: str, request: Request):
+    """Serve a static asset, cached for a year when requested with ?v="""
+    response = static_assets.response(request, asset_path, versioned="v" in request.query_params)
+    if response is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    return response
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint"""
-    return HealthResponse()
+    """Health check endpoint, with this worker's admission counters and event-loop stalls"""
+    return HealthResponse(load={**admission.stats(), "loop_stalls": loop_watchdog.stats()})
+
+def phone_for_token(token: Optional[str]) -> Optional[str]:
+    """Phone number of a static token in USER_DATABASE or a signed token, verified locally"""
+    if not token:
+        return None
+    return USER_DATABASE.get(token) or auth_tokens.phone_number(token)
+
+PHONE_LENGTH = 12
+_DIGIT_TABLE = np.zeros(256, dtype=bool)
+_DIGIT_TABLE[np.frombuffer(b"0123456789", dtype=np.uint8)] = True
+
+def valid_phone_number(phone_number: str) -> bool:
+    """Indian phone number in country_code+number format: 12 digits starting with 91"""
+    return (phone_number.startswith("91") and len(phone_number) == PHONE_LENGTH
+            and phone_number.isascii() and phone_number.isdigit())
+
+def valid_phone_numbers(phone_numbers: List[str]) -> np.ndarray:
+    """valid_phone_number of each phone number, checked at once over a matrix of their bytes"""
+    valid = np.zeros(len(phone_numbers), dtype=bool)
+    candidates = [index for index, phone in enumerate(phone_numbers) if len(phone) == PHONE_LENGTH and phone.isascii()]
+    if candidates:
+        digits = np.frombuffer("".join(phone_numbers[index] for index in candidates).encode("ascii"), dtype=np.uint8)
+        digits = digits.reshape(len(candidates), PHONE_LENGTH)
+        valid[candidates] = _DIGIT_TABLE[digits].all(axis=1) & (digits[:, 0] == ord("9")) & (digits[:, 1] == ord("1"))
+    return valid
+
+# Tokens accepted by one /validate/batch request or validate_batch call
+MAX_BATCH_TOKENS = int(os.getenv("MAX_BATCH_TOKENS", 10000))
+
+def batch_tokens(tokens) -> List[str]:
+    if not isinstance(tokens, list) or not all(isinstance(token, str) for token in tokens):
+        raise ValueError("tokens must be a list of strings")
+    if len(tokens) > MAX_BATCH_TOKENS:
+        raise ValueError(f"At most {MAX_BATCH_TOKENS} tokens per batch")
+    return tokens
+
+def validate_tokens(tokens: List[str]) -> dict:
+    """
+    Phone number or error code of each token, in request order. Each distinct
+    token is resolved once: static tokens from USER_DATABASE, signed ones in a
+    single verification pass; the distinct phone numbers are format-checked together
+    """
+    phones = {token: USER_DATABASE.get(token) for token in tokens}
+    signed = auth_tokens.phone_numbers([token for token, phone in phones.items() if phone is None])
+    phones.update(signed)
+    distinct = list({phone for phone in phones.values() if isinstance(phone, str)})
+    formats = dict(zip(distinct, valid_phone_numbers(distinct).tolist()))
+    results = []
+    valid = 0
+    for token in tokens:
+        phone = phones[token]
+        if isinstance(phone, auth_tokens.InvalidToken):
+            results.append(phone.code)
+        elif formats[phone]:
+            results.append(phone)
+            valid += 1
+        else:
+            results.append("invalid_phone")
+    logger.info(f"Validated a batch of {len(tokens)} tokens ({len(phones)} distinct), {valid} valid")
+    return {"results": results, "valid": valid, "invalid": len(tokens) - valid}
+
+def bearer_token(request: Request) -> Optional[str]:
+    auth_header = request.headers.get("authorization", "")
+    return auth_header[7:] if auth_header.startswith("Bearer ") else None
 
 def authenticate_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
     """Authenticate bearer token"""
+    cancel.check()
     token = credentials.credentials
     
     if not token:
@@ -102,7 +541,7 @@ def authenticate_token(credentials: HTTPAuthorizationCredentials = Depends(secur
             detail="Bearer token required"
         )
     
-    if token not in USER_DATABASE:
+    if phone_for_token(token) is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
@@ -117,10 +556,10 @@ async def validate_token(token: str = Depends(authenticate_token)):
     Required endpoint for Puch AI MCP server validation
     """
     try:
-        phone_number = USER_DATABASE[token]
+        phone_number = phone_for_token(token)
         
         # Validate phone format (12 digits starting with 91)
-        if not (phone_number.startswith("91") and len(phone_number) == 12 and phone_number[2:].isdigit()):
+        if not valid_phone_number(phone_number):
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Invalid phone number format in database"
@@ -144,9 +583,222 @@ async def validate_token(token: str = Depends(authenticate_token)):
             detail="Internal server error during validation"
         )
 
+@app.post("/validate/batch")
+async def validate_token_batch(request_data: dict, token: str = Depends(authenticate_token)):
+    """
+    Validate many bearer tokens in one request, for gateways fanning in downstream calls
+    "results" holds, in request order, each token's phone number or an error
+    code: invalid_token, expired, revoked or invalid_phone
+    """
+    try:
+        tokens = batch_tokens(request_data.get("tokens"))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return JSONResponse(await anyio.to_thread.run_sync(validate_tokens, tokens))
+
+def validate_batch_tool_result(data: dict) -> dict:
+    """MCP tool result for a token batch: a summary plus the results as JSON"""
+    return {
+        "content": [
+            {"type": "text", "text": f"{data['valid']} of {len(data['results'])} tokens are valid."},
+            {"type": "text", "text": json.dumps(data, separators=(",", ":"))}
+        ],
+        "isError": False
+    }
+
 # MCP protocol endpoints (JSON-RPC 2.0 over HTTP) - Strict Implementation
 server_initialized = False
 
+# Progress notifications buffered per streamed tool call
+PROGRESS_BUFFER = 4
+
+# JSON-RPC error code for tools that need a valid bearer token
+UNAUTHORIZED_CODE = -32003
+
+# Cancel scopes of in-flight JSON-RPC requests in this worker, keyed by (session, id)
+in_flight_requests = {}
+
+# Identical concurrent tool calls share one execution; idempotency keys replay results
+tool_calls = ToolCalls()
+
+def mcp_session(request: Request) -> str:
+    """Client session: the Mcp-Session-Id issued at initialize, else a digest of the caller's credentials"""
+    return request.headers.get("mcp-session-id") or principal_of(request.headers.get("authorization", ""))
+
+def cancel_key(request: Request, request_id) -> Optional[Tuple[str, str]]:
+    """
+    Key of a request's cancel scope: its Mcp-Session-Id, else its valid bearer
+    token, and its id; None for anonymous callers, who share no secret and so
+    cannot cancel requests
+    """
+    if not request.headers.get("mcp-session-id") and phone_for_token(bearer_token(request)) is None:
+        return None
+    return mcp_session(request), json.dumps(request_id)
+
+RESOURCE_METHODS = {
+    "resources/list": lambda session, params: mcp_resources.list_resources(params.get("cursor")),
+    "resources/templates/list": lambda session, params: {"resourceTemplates": mcp_resources.RESOURCE_TEMPLATES},
+    "resources/read": lambda session, params: mcp_resources.read_resource(params.get("uri")),
+    "resources/subscribe": lambda session, params: mcp_resources.subscribe(session, params.get("uri")) or {},
+    "resources/unsubscribe": lambda session, params: mcp_resources.unsubscribe(session, params.get("uri")) or {},
+}
+# Resource methods that reveal no stored scan and need no bearer token
+PUBLIC_RESOURCE_METHODS = ("resources/templates/list",)
+
+def cancelled_error(request_id, error: cancel.Cancelled) -> JSONResponse:
+    """JSON-RPC error for a request that was cancelled or ran out of time"""
+    if isinstance(error, cancel.DeadlineExceeded):
+        return JSONResponse({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {"code": -32001, "message": "Deadline exceeded"}
+        }, status_code=504)
+    return JSONResponse({
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": -32800, "message": str(error) or "Request cancelled"}
+    }, status_code=499)
+
+async def call_tool(request: Request, request_id, params: dict) -> Response:
+    """JSON-RPC response for a tools/call request, shared with identical concurrent calls"""
+    tool_name = params.get("name")
+    arguments = params.get("arguments", {})
+    meta = params.get("_meta") or {}
+    idempotency_key = request.headers.get("idempotency-key") or meta.get("idempotencyKey")
+    authorization = request.headers.get("authorization", "")
+    request_scope = cancel.current()
+    in_flight_key = cancel_key(request, request_id) if request_scope is not None else None
+    if in_flight_key is not None:
+        in_flight_requests[in_flight_key] = request_scope
+    try:
+        outcome = await tool_calls.call(authorization, tool_name, arguments, idempotency_key,
+                                        lambda: dispatch_tool(request, tool_name, arguments))
+    except IdempotencyConflict as e:
+        outcome = Outcome.error(-32602, str(e), status_code=422)
+    except cancel.Cancelled as e:
+        logger.info(f"Tool call {request_id} stopped: {e}")
+        return cancelled_error(request_id, e)
+    finally:
+        if in_flight_key is not None:
+            in_flight_requests.pop(in_flight_key, None)
+    return Response(outcome.response_body(request_id), status_code=outcome.status_code, media_type="application/json")
+
+async def dispatch_tool(request: Request, tool_name: str, arguments: dict) -> Outcome:
+    """Run one tool and build its JSON-RPC result or error"""
+    if tool_name == "validate":
+        # Get phone number for authenticated user
+        phone_number = phone_for_token(bearer_token(request)) or "917305041960"
+        
+        result = {
+            "content": [
+                {
+                    "type": "text",
+                    "text": phone_number
+                }
+            ]
+        }
+        logger.info(f"Validate result: {result}")
+        return Outcome.result(result)
+    elif tool_name == "validate_batch":
+        # Answers which tokens are valid and whose phone numbers they carry, as REST /validate/batch
+        if phone_for_token(bearer_token(request)) is None:
+            return Outcome.error(UNAUTHORIZED_CODE, "Invalid or expired token", status_code=401)
+        try:
+            tokens = batch_tokens(arguments.get("tokens"))
+        except ValueError as e:
+            return Outcome.error(-32602, str(e))
+        return Outcome.result(validate_batch_tool_result(await anyio.to_thread.run_sync(validate_tokens, tokens)))
+    elif tool_name == "scan_repository":
+        # Scans fetch remote repositories, so only authenticated callers may start them
+        if phone_for_token(bearer_token(request)) is None:
+            return Outcome.error(UNAUTHORIZED_CODE, "Invalid or expired token", status_code=401)
+        try:
+            report = await run_scan_tool(arguments)
+        except ValueError as e:
+            return Outcome.error(-32602, str(e))
+        return Outcome.result(scan_tool_result(report))
+    elif tool_name in FINDINGS_TOOLS:
+        if phone_for_token(bearer_token(request)) is None:
+            return Outcome.error(UNAUTHORIZED_CODE, "Invalid or expired token", status_code=401)
+        try:
+            data = await anyio.to_thread.run_sync(FINDINGS_TOOLS[tool_name], arguments)
+        except ValueError as e:
+            return Outcome.error(-32602, str(e))
+        return Outcome.result(findings_tool_result(tool_name, data))
+    else:
+        logger.error(f"Unknown tool: {tool_name}")
+        return Outcome.error(-32601, f"Unknown tool: {tool_name}")
+
+def wants_event_stream(request: Request) -> bool:
+    """Whether the client accepts a server-sent event stream as the response"""
+    return "text/event-stream" in request.headers.get("accept", "") or request.url.path == "/sse"
+
+class ToolProgressResponse(Response):
+    """
+    Server-sent events for a tools/call carrying a progressToken: throttled
+    notifications/progress while the tool runs, then the JSON-RPC response
+    """
+    background = None
+
+    def __init__(self, request: Request, request_id, params: dict, progress_token):
+        self.request = request
+        self.request_id = request_id
+        self.params = params
+        self.progress_token = progress_token
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+        })
+        # Small buffer: a client that falls behind skips updates instead of queueing them
+        send_stream, receive_stream = anyio.create_memory_object_stream(PROGRESS_BUFFER)
+        outcome = {}
+
+        def notify(done: int, total: int, findings: int):
+            message = {
+                "jsonrpc": "2.0",
+                "method": "notifications/progress",
+                "params": {
+                    "progressToken": self.progress_token,
+                    "progress": done,
+                    "total": total,
+                    "message": f"{done}/{total} files scanned, {findings} findings so far"
+                }
+            }
+            try:
+                anyio.from_thread.run_sync(send_stream.send_nowait, message)
+            except (anyio.WouldBlock, anyio.ClosedResourceError):
+                pass
+
+        async def run_tool():
+            async with send_stream:
+                with scan_progress.activate(scan_progress.ProgressReporter(notify)):
+                    try:
+                        outcome["response"] = await call_tool(self.request, self.request_id, self.params)
+                    except Exception as e:
+                        logger.error(f"JSON-RPC error: {str(e)}")
+                        outcome["response"] = JSONResponse({
+                            "jsonrpc": "2.0",
+                            "id": self.request_id,
+                            "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
+                        })
+
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(run_tool)
+            async with receive_stream:
+                async for message in receive_stream:
+                    await send({"type": "http.response.body", "body": sse_event(message), "more_body": True})
+        await send({
+            "type": "http.response.body",
+            "body": sse_event(json.loads(outcome["response"].body)),
+            "more_body": False,
+        })
+
 @app.post("/")
 async def mcp_jsonrpc(request: Request):
     """Main MCP endpoint using strict JSON-RPC 2.0 protocol per MCP spec"""
@@ -175,6 +827,13 @@ async def mcp_jsonrpc(request: Request):
         request_id = request_data.get("id")
         
         logger.info(f"Method: {method}, Params: {params}, ID: {request_id}")
+
+        # A timeout in _meta can only shorten the request's deadline
+        meta = (params.get("_meta") if isinstance(params, dict) else None) or {}
+        request_scope = cancel.current()
+        meta_timeout = parse_timeout(meta.get("timeout"))
+        if request_scope is not None and meta_timeout is not None:
+            request_scope.shorten(meta_timeout)
         
         # Handle initialize method - MUST be called first
         if method == "initialize":
@@ -192,7 +851,10 @@ async def mcp_jsonrpc(request: Request):
                         "tools": {
                             "listChanged": False
                         },
-                        "resources": {},
+                        "resources": {
+                            "subscribe": True,
+                            "listChanged": False
+                        },
                         "prompts": {},
                         "logging": {}
                     },
@@ -205,13 +867,21 @@ async def mcp_jsonrpc(request: Request):
             
             server_initialized = True
             logger.info(f"Initialize result: {result}")
-            return result
+            # Resource subscriptions and their notification stream belong to this session
+            return JSONResponse(result, headers={"Mcp-Session-Id": secrets.token_hex(16)})
             
         # Handle notifications (no ID, no response expected)
         if request_id is None:
             if method == "notifications/initialized":
                 logger.info("Client sent initialized notification")
                 return JSONResponse({}, status_code=204)
+            elif method == "notifications/cancelled":
+                key = cancel_key(request, params.get("requestId"))
+                cancelled_scope = in_flight_requests.get(key) if key is not None else None
+                if cancelled_scope is not None:
+                    cancelled_scope.cancel(params.get("reason") or "Request cancelled")
+                    logger.info(f"Cancelled request {params.get('requestId')}")
+                return JSONResponse({}, status_code=204)
             else:
                 logger.info(f"Ignoring notification: {method}")
                 return JSONResponse({}, status_code=204)
@@ -227,63 +897,56 @@ async def mcp_jsonrpc(request: Request):
             return JSONResponse(error_result, status_code=400)
             
         if method == "tools/list":
+            try:
+                tools_page = list_tools((params or {}).get("cursor"))
+            except cursors.InvalidCursor as e:
+                return JSONResponse({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "error": {"code": -32602, "message": str(e)}
+                }, status_code=400)
             result = {
                 "jsonrpc": "2.0",
                 "id": request_id,
-                "result": {
-                    "tools": [
-                        {
-                            "name": "validate",
-                            "description": "Validate bearer token and return user's phone number in country_code+number format",
-                            "inputSchema": {
-                                "type": "object",
-                                "properties": {},
-                                "required": []
-                            }
-                        }
-                    ]
-                }
+                "result": tools_page
             }
             logger.info(f"Tools list result: {result}")
             return result
             
-        elif method == "tools/call":
-            tool_name = params.get("name")
-            arguments = params.get("arguments", {})
-            
-            if tool_name == "validate":
-                # Get authorization header
-                auth_header = request.headers.get("authorization", "")
-                token = None
-                if auth_header.startswith("Bearer "):
-                    token = auth_header[7:]
-                
-                # Get phone number for authenticated user
-                phone_number = USER_DATABASE.get(token) if token and token in USER_DATABASE else "917305041960"
-                
-                result = {
-                    "jsonrpc": "2.0", 
+        elif method in RESOURCE_METHODS:
+            # Stored scans hold findings and snippets of private repositories
+            if method not in PUBLIC_RESOURCE_METHODS and phone_for_token(bearer_token(request)) is None:
+                return JSONResponse({
+                    "jsonrpc": "2.0",
                     "id": request_id,
-                    "result": {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": phone_number
-                            }
-                        ]
-                    }
-                }
-                logger.info(f"Validate result: {result}")
-                return result
-            else:
-                error_result = {
+                    "error": {"code": UNAUTHORIZED_CODE, "message": "Invalid or expired token"}
+                }, status_code=401)
+            try:
+                resource_result = await anyio.to_thread.run_sync(RESOURCE_METHODS[method], mcp_session(request), params or {})
+            except mcp_resources.ResourceNotFound as e:
+                return JSONResponse({
                     "jsonrpc": "2.0",
                     "id": request_id,
-                    "error": {"code": -32601, "message": f"Unknown tool: {tool_name}"}
-                }
-                logger.error(f"Unknown tool: {tool_name}")
-                return JSONResponse(error_result, status_code=400)
-                
+                    "error": {"code": mcp_resources.NOT_FOUND_CODE, "message": str(e), "data": {"uri": (params or {}).get("uri")}}
+                }, status_code=404)
+            except ValueError as e:
+                return JSONResponse({
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "error": {"code": -32602, "message": str(e)}
+                }, status_code=400)
+            return JSONResponse({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": resource_result
+            })
+
+        elif method == "tools/call":
+            progress_token = meta.get("progressToken")
+            if progress_token is not None and wants_event_stream(request):
+                return ToolProgressResponse(request, request_id, params, progress_token)
+            return await call_tool(request, request_id, params)
+            
         else:
             error_result = {
                 "jsonrpc": "2.0",
@@ -293,6 +956,9 @@ async def mcp_jsonrpc(request: Request):
             logger.error(f"Unknown method: {method}")
             return JSONResponse(error_result, status_code=400)
             
+    except cancel.Cancelled as e:
+        logger.info(f"JSON-RPC request {request_id if 'request_id' in locals() else None} stopped: {e}")
+        return cancelled_error(request_id if 'request_id' in locals() else None, e)
     except Exception as e:
         logger.error(f"JSON-RPC error: {str(e)}")
         return JSONResponse({
@@ -318,6 +984,15 @@ async def mcp_alt_endpoint(request: Request):
     """Alternative MCP endpoint"""
     return await mcp_jsonrpc(request)
 
+@app.get("/mcp")
+async def mcp_notifications(request: Request):
+    """Server-sent event stream of resource update notifications for the client's session"""
+    if "text/event-stream" not in request.headers.get("accept", ""):
+        return JSONResponse({
+            "error": "Open this endpoint with Accept: text/event-stream to receive notifications"
+        }, status_code=405)
+    return mcp_resources.ResourceUpdatesResponse(mcp_session(request))
+
 @app.post("/rpc")
 async def mcp_rpc_endpoint(request: Request):
     """RPC endpoint"""
@@ -325,10 +1000,8 @@ async def mcp_rpc_endpoint(request: Request):
 
 @app.post("/sse")
 async def mcp_sse(request: Request):
-    """MCP Server-Sent Events endpoint"""
-    return JSONResponse({
-        "error": "SSE not supported, use JSON-RPC over HTTP POST to /"
-    }, status_code=501)
+    """MCP endpoint answering tools/call with progressToken as a server-sent event stream"""
+    return await mcp_jsonrpc(request)
 
 @app.get("/ws") 
 async def mcp_websocket():
@@ -347,7 +1020,10 @@ async def mcp_initialize():
             "tools": {
                 "listChanged": False
             },
-            "resources": {},
+            "resources": {
+                "subscribe": True,
+                "listChanged": False
+            },
             "prompts": {}
         },
         "serverInfo": {
@@ -357,40 +1033,17 @@ async def mcp_initialize():
     }
 
 @app.post("/mcp/tools/list")
-async def mcp_tools_list():
-    """List available MCP tools"""
-    return {
-        "tools": [
-            {
-                "name": "validate",
-                "description": "Validate bearer token and return user's phone number in country_code+number format",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                }
-            },
-            {
-                "name": "scan_repository", 
-                "description": "Scan a GitHub repository for security vulnerabilities",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "repository_url": {
-                            "type": "string",
-                            "description": "The GitHub repository URL to scan"
-                        },
-                        "scan_type": {
-                            "type": "string", 
-                            "description": "Type of scan to perform",
-                            "enum": ["quick", "deep", "full"]
-                        }
-                    },
-                    "required": ["repository_url"]
-                }
-            }
-        ]
-    }
+async def mcp_tools_list(request: Request):
+    """List available MCP tools, a page at a time when the body carries a cursor"""
+    body = await request.body()
+    try:
+        cursor = json.loads(body).get("cursor") if body.strip() else None
+        return list_tools(cursor)
+    except (ValueError, AttributeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e) if isinstance(e, cursors.InvalidCursor) else "Invalid request body"
+        )
 
 @app.post("/mcp/tools/call")
 async def mcp_tools_call(request_data: dict, token: str = Depends(authenticate_token)):
@@ -400,7 +1053,7 @@ async def mcp_tools_call(request_data: dict, token: str = Depends(authenticate_t
     
     if tool_name == "validate":
         # Return the phone number for the authenticated user
-        phone_number = USER_DATABASE.get(token)
+        phone_number = phone_for_token(token)
         return {
             "content": [
                 {
@@ -410,36 +1063,48 @@ async def mcp_tools_call(request_data: dict, token: str = Depends(authenticate_t
             ],
             "isError": False
         }
+    elif tool_name == "validate_batch":
+        try:
+            tokens = batch_tokens(arguments.get("tokens"))
+        except ValueError as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": str(e)
+                    }
+                ],
+                "isError": True
+            }
+        return validate_batch_tool_result(await anyio.to_thread.run_sync(validate_tokens, tokens))
     elif tool_name == "scan_repository":
-        repository_url = arguments.get("repository_url", "")
-        scan_type = arguments.get("scan_type", "quick")
-        
-        vulnerabilities = [
-            {
-                "type": "SQL Injection",
-                "severity": "High", 
-                "file": "src/database.py",
-                "line": 45,
-                "description": "User input not properly sanitized"
+        try:
+            report = await run_scan_tool(arguments)
+        except ValueError as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": str(e)
+                    }
+                ],
+                "isError": True
             }
-        ]
-        
-        result = {
-            "repository_url": repository_url,
-            "scan_type": scan_type,
-            "vulnerabilities_found": len(vulnerabilities),
-            "vulnerabilities": vulnerabilities
-        }
-        
-        return {
-            "content": [
-                {
-                    "type": "text",
-                    "text": f"Scan completed for {repository_url}. Found {len(vulnerabilities)} vulnerabilities."
-                }
-            ],
-            "isError": False
-        }
+        return scan_tool_result(report)
+    elif tool_name in FINDINGS_TOOLS:
+        try:
+            data = await anyio.to_thread.run_sync(FINDINGS_TOOLS[tool_name], arguments)
+        except ValueError as e:
+            return {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": str(e)
+                    }
+                ],
+                "isError": True
+            }
+        return findings_tool_result(tool_name, data)
     else:
         return {
             "content": [
@@ -452,48 +1117,42 @@ async def mcp_tools_call(request_data: dict, token: str = Depends(authenticate_t
         }
 
 @app.post("/scan")
-async def scan_repository(request_data: dict):
+async def scan_repository(request_data: dict, token: str = Depends(authenticate_token)):
     """
-    Demo repository scanning endpoint
-    This is a demonstration - in production, this would perform actual security scanning
+    Repository scanning endpoint
+    Runs the scan engine over the repository; "format" selects the JSON report
+    (default), a SARIF 2.1.0 log or the compact binary findings format.
+    With "base_commit" only files changed since then are scanned and the JSON
+    report lists new, fixed and unchanged findings. "timings": true adds the
+    time each detector rule took to the JSON report.
     """
+    repository_url = request_data.get("repository_url", "")
+    output_format = request_data.get("format", "json")
+    if output_format not in SCAN_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid format: {output_format}"
+        )
+    if request_data.get("base_commit") and output_format != "json":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Diff scans are only available as JSON"
+        )
     try:
-        repository_url = request_data.get("repository_url", "")
-        scan_type = request_data.get("scan_type", "quick")
-        
-        if not repository_url:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Repository URL is required"
-            )
-        
-        # Demo response - in production, this would be real vulnerability data
-        vulnerabilities = [
-            {
-                "type": "SQL Injection",
-                "severity": "High",
-                "file": "src/database.py",
-                "line": 45,
-                "description": "User input not properly sanitized before database query"
-            },
-            {
-                "type": "Cross-Site Scripting",
-                "severity": "Medium", 
-                "file": "templates/user_profile.html",
-                "line": 23,
-                "description": "User data rendered without escaping"
-            }
-        ]
-        
-        return {
-            "success": True,
-            "repository_url": repository_url,
-            "scan_type": scan_type,
-            "vulnerabilities_found": len(vulnerabilities),
-            "vulnerabilities": vulnerabilities,
-            "message": "Security scan completed successfully"
-        }
-        
+        if request_data.get("base_commit"):
+            report = await run_diff(repository_url, request_data.get("scan_type", "quick"), request_data["base_commit"], request_data.get("commit"))
+        elif output_format == "json":
+            report = await run_scan(repository_url, request_data.get("scan_type", "quick"), request_data.get("commit"),
+                                    rule_timings=bool(request_data.get("timings")))
+        else:
+            result, _ = await execute_scan(repository_url, request_data.get("scan_type", "quick"), request_data.get("commit"))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except cancel.Cancelled:
+        raise
     except Exception as e:
         logger.error(f"Scan error: {str(e)}")
         raise HTTPException(
@@ -501,6 +1160,84 @@ async def scan_repository(request_data: dict):
             detail="Error during repository scan"
         )
 
+    if output_format == "sarif":
+        return StreamingResponse(
+            export.iter_sarif(result.findings, repository_url, result.commit),
+            media_type=export.SARIF_MEDIA_TYPE
+        )
+    if output_format == "binary":
+        return StreamingResponse(export.iter_binary(result.findings), media_type=export.BINARY_MEDIA_TYPE)
+    return {
+        "success": True,
+        **report,
+        "message": "Security scan completed successfully"
+    }
+
+@app.get("/findings")
+async def list_findings(request: Request, token: str = Depends(authenticate_token)):
+    """Stored findings of the latest scan of a repository (query: repository_url, commit, rule_id, severity, file, limit, cursor)"""
+    try:
+        return await anyio.to_thread.run_sync(query_findings, dict(request.query_params))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@app.get("/findings/diff")
+async def diff_scans(request: Request, token: str = Depends(authenticate_token)):
+    """New and fixed findings between two stored scans (query: repository_url, base_commit, head_commit)"""
+    try:
+        return await anyio.to_thread.run_sync(query_diff, dict(request.query_params))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@app.post("/cluster")
+async def cluster_rpc(request: Request):
+    """Worker side of distributed scans: scans one shard for a coordinator (enabled by SCAN_NODE_SECRET)"""
+    if not cluster.SCAN_NODE_SECRET:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+    if not cluster.authorized(request.headers.get("authorization")):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid cluster secret")
+    try:
+        message = json.loads(await request.body())
+    except ValueError:
+        return JSONResponse({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}, status_code=400)
+    request_id = message.get("id") if isinstance(message, dict) else None
+    if not isinstance(message, dict) or message.get("method") != cluster.SCAN_METHOD:
+        return JSONResponse({"jsonrpc": "2.0", "id": request_id, "error": {"code": -32601, "message": "Method not found"}}, status_code=404)
+    params = message.get("params")
+    try:
+        if not isinstance(params, dict) or params.get("scan_type", "quick") not in SCAN_TYPES:
+            raise ValueError("Invalid scan type")
+        result = await anyio.to_thread.run_sync(cluster.scan_shard, params)
+    except ValueError as e:
+        return JSONResponse({"jsonrpc": "2.0", "id": request_id, "error": {"code": -32602, "message": str(e)}}, status_code=400)
+    return JSONResponse({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+@app.on_event("startup")
+async def start_watchdog():
+    loop_watchdog.start()
+
+@app.on_event("shutdown")
+async def shutdown_scanner():
+    """Let in-flight scan tasks finish and queued results reach the store before the worker exits"""
+    loop_watchdog.stop()
+    await anyio.to_thread.run_sync(scanner.engine.shutdown_pool)
+    store = get_store()
+    if store is not None:
+        await anyio.to_thread.run_sync(store.close)
+
+@app.exception_handler(cancel.Cancelled)
+async def cancelled_handler(request, exc):
+    """Requests stopped by their deadline or by the client going away"""
+    if isinstance(exc, cancel.DeadlineExceeded):
+        return JSONResponse(status_code=504, content={"success": False, "error": "Deadline exceeded"})
+    return JSONResponse(status_code=499, content={"success": False, "error": str(exc) or "Request cancelled"})
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
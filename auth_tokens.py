@@ -0,0 +1,250 @@
+"""
+Stateless signed bearer tokens
+HS256 JWTs carrying the user's phone number, verified locally on every node:
+several keys can be active at once for rotation (tokens name theirs in the
+"kid" header), verified signatures are kept in a bounded LRU, and revoked
+token ids are read from a small deny-list file.
+
+    python auth_tokens.py issue 919876543210 --ttl 86400
+    python auth_tokens.py revoke <token> >> $AUTH_DENY_FILE
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# "kid:secret" pairs separated by commas; the first signs new tokens, all verify
+AUTH_KEYS = os.getenv("AUTH_KEYS", "")
+# Revoked token ids ("jti"), one per line
+AUTH_DENY_FILE = os.getenv("AUTH_DENY_FILE", "")
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 4096))
+DEFAULT_TTL = 30 * 24 * 3600
+# Seconds between checks of the deny-list file for changes
+DENY_RELOAD_INTERVAL = 5.0
+# Leeway for clocks of the issuing and verifying nodes being slightly apart
+CLOCK_SKEW = 30
+
+
+class InvalidToken(Exception):
+    """The token is malformed, badly signed, expired or revoked"""
+
+    def __init__(self, message: str, code: str = "invalid_token"):
+        super().__init__(message)
+        self.code = code
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def parse_keys(value: str) -> Dict[str, bytes]:
+    keys = {}
+    for item in value.split(","):
+        kid, _, secret = item.strip().partition(":")
+        if kid and secret:
+            keys[kid] = secret.encode("utf-8")
+    return keys
+
+
+class TokenVerifier:
+    """Issues and verifies signed tokens against a set of active keys"""
+
+    def __init__(self, keys: Dict[str, bytes], deny_file: str = AUTH_DENY_FILE, cache_size: int = AUTH_CACHE_SIZE):
+        if not keys:
+            raise ValueError("At least one signing key is required")
+        self.keys = dict(keys)
+        self.signing_kid = next(iter(self.keys))
+        self.deny_file = deny_file
+        self._denied: FrozenSet[str] = frozenset()
+        self._deny_mtime: Optional[float] = None
+        self._deny_checked = 0.0
+        self._lock = threading.Lock()
+        # Signature checks are cached per token; failures raise and are never cached
+        self._verify_signature = lru_cache(maxsize=cache_size)(self._check_signature)
+
+    def issue(self, phone_number: str, ttl: int = DEFAULT_TTL) -> str:
+        now = int(time.time())
+        header = {"alg": "HS256", "typ": "JWT", "kid": self.signing_kid}
+        claims = {"phone_number": phone_number, "iat": now, "exp": now + ttl, "jti": secrets.token_hex(8)}
+        signing_input = ".".join(_b64encode(json.dumps(part, separators=(",", ":")).encode()) for part in (header, claims))
+        signature = hmac.new(self.keys[self.signing_kid], signing_input.encode("ascii"), hashlib.sha256).digest()
+        return f"{signing_input}.{_b64encode(signature)}"
+
+    def _check_signature(self, token: str):
+        """(kid, claims) of a token whose signature matches one of the keys"""
+        try:
+            signing_input, _, signature = token.rpartition(".")
+            header_part, _, claims_part = signing_input.partition(".")
+            header = json.loads(_b64decode(header_part))
+            claims = json.loads(_b64decode(claims_part))
+            expected = _b64decode(signature)
+            signed = signing_input.encode("ascii")
+        except (ValueError, TypeError) as e:
+            raise InvalidToken(f"Malformed token: {e}")
+        if not isinstance(header, dict) or not isinstance(claims, dict) or header.get("alg") != "HS256":
+            raise InvalidToken("Unsupported token")
+        kid = header.get("kid")
+        key = self.keys.get(kid) if isinstance(kid, str) else None
+        if key is None:
+            raise InvalidToken("Unknown signing key")
+        actual = hmac.new(key, signed, hashlib.sha256).digest()
+        if not hmac.compare_digest(actual, expected):
+            raise InvalidToken("Bad signature")
+        return kid, claims
+
+    def verify(self, token: str) -> dict:
+        """Claims of a valid token; raises InvalidToken otherwise"""
+        kid, claims = self._verify_signature(token)
+        if kid not in self.keys:
+            # The key was retired after the signature was cached
+            raise InvalidToken("Unknown signing key")
+        return self._check_claims(claims, time.time(), self.denied())
+
+    @staticmethod
+    def _check_claims(claims: dict, now: float, denied: FrozenSet[str]) -> dict:
+        expires = claims.get("exp")
+        if not isinstance(expires, (int, float)) or expires + CLOCK_SKEW < now:
+            raise InvalidToken("Token expired", "expired")
+        if claims.get("jti") in denied:
+            raise InvalidToken("Token revoked", "revoked")
+        return claims
+
+    def verify_many(self, tokens: Iterable[str]) -> Dict[str, Union[dict, InvalidToken]]:
+        """Claims or the InvalidToken of each distinct token, against one clock reading and deny list"""
+        now, denied, keys = time.time(), self.denied(), self.keys
+        results: Dict[str, Union[dict, InvalidToken]] = {}
+        for token in tokens:
+            if token in results:
+                continue
+            try:
+                kid, claims = self._verify_signature(token)
+                if kid not in keys:
+                    raise InvalidToken("Unknown signing key")
+                results[token] = self._check_claims(claims, now, denied)
+            except InvalidToken as e:
+                results[token] = e
+        return results
+
+    def denied(self) -> FrozenSet[str]:
+        """Revoked token ids, re-read when the deny-list file changes"""
+        now = time.monotonic()
+        if not self.deny_file or now < self._deny_checked + DENY_RELOAD_INTERVAL:
+            return self._denied
+        with self._lock:
+            if now < self._deny_checked + DENY_RELOAD_INTERVAL:
+                return self._denied
+            self._deny_checked = now
+            try:
+                mtime = os.stat(self.deny_file).st_mtime
+                if mtime != self._deny_mtime:
+                    with open(self.deny_file, encoding="utf-8") as deny_list:
+                        self._denied = frozenset(line.strip() for line in deny_list if line.strip() and not line.startswith("#"))
+                    self._deny_mtime = mtime
+                    logger.info(f"Loaded {len(self._denied)} revoked token ids from {self.deny_file}")
+            except FileNotFoundError:
+                self._denied = frozenset()
+                self._deny_mtime = None
+        return self._denied
+
+    def rotate(self, keys: Dict[str, bytes]):
+        """Replace the active keys; the first one signs new tokens"""
+        if not keys:
+            raise ValueError("At least one signing key is required")
+        self.keys = dict(keys)
+        self.signing_kid = next(iter(self.keys))
+        self._verify_signature.cache_clear()
+
+
+_verifier: Optional[TokenVerifier] = None
+
+
+def get_verifier() -> Optional[TokenVerifier]:
+    """The process-wide verifier, None when AUTH_KEYS is not set"""
+    global _verifier
+    if _verifier is None:
+        keys = parse_keys(AUTH_KEYS)
+        if keys:
+            _verifier = TokenVerifier(keys)
+    return _verifier
+
+
+def phone_number(token: str) -> Optional[str]:
+    """Phone number claim of a valid signed token, None for anything else"""
+    verifier = get_verifier()
+    if verifier is None or token.count(".") != 2:
+        return None
+    try:
+        phone = verifier.verify(token).get("phone_number")
+    except InvalidToken as e:
+        logger.warning(f"Rejected signed token: {e}")
+        return None
+    if not isinstance(phone, str):
+        logger.warning("Rejected signed token: Token has no phone number")
+        return None
+    return phone
+
+
+def phone_numbers(tokens: Iterable[str]) -> Dict[str, Union[str, InvalidToken]]:
+    """Phone number claim or the InvalidToken of each distinct signed token, verified in one pass"""
+    verifier = get_verifier()
+    results: Dict[str, Union[str, InvalidToken]] = {}
+    signed = []
+    for token in tokens:
+        if verifier is None or token.count(".") != 2:
+            results[token] = InvalidToken("Not a signed token")
+        else:
+            signed.append(token)
+    if signed:
+        for token, claims in verifier.verify_many(signed).items():
+            if isinstance(claims, InvalidToken):
+                results[token] = claims
+            elif isinstance(claims.get("phone_number"), str):
+                results[token] = claims["phone_number"]
+            else:
+                results[token] = InvalidToken("Token has no phone number")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Issue or revoke signed bearer tokens (keys from AUTH_KEYS)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    issue = commands.add_parser("issue", help="Print a new token for a phone number")
+    issue.add_argument("phone_number")
+    issue.add_argument("--ttl", type=int, default=DEFAULT_TTL, help="Lifetime in seconds (default: %(default)s)")
+    revoke = commands.add_parser("revoke", help="Print the deny-list line for a token")
+    revoke.add_argument("token")
+    args = parser.parse_args(argv)
+
+    if args.command == "revoke":
+        # The id is read without verifying, so tokens signed with retired keys can be revoked too
+        try:
+            claims = json.loads(_b64decode(args.token.split(".")[1]))
+        except (IndexError, ValueError) as e:
+            parser.error(f"Not a signed token: {e}")
+        print(claims["jti"])
+        return 0
+    verifier = get_verifier()
+    if verifier is None:
+        parser.error("AUTH_KEYS is not set")
+    print(verifier.issue(args.phone_number, args.ttl))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
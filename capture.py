@@ -0,0 +1,223 @@
+"""
+Traffic capture middleware
+Writes a sample of request/response pairs with their timing to a JSONL file
+for replay.py. Bearer tokens, secrets and phone numbers are redacted. The
+event loop only queues the raw bytes; a writer thread redacts, serializes
+and appends them in buffered batches.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Capture is off unless CAPTURE_FILE is set
+CAPTURE_FILE = os.getenv("CAPTURE_FILE", "")
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", 0.1))
+# Request and response bodies are kept up to this size
+MAX_CAPTURE_BODY = 64 * 1024
+# Records queued beyond this are dropped rather than slowing requests down
+QUEUE_SIZE = 10000
+FLUSH_INTERVAL = 1.0
+FLUSH_RECORDS = 256
+
+CAPTURED_HEADERS = ("accept", "authorization", "content-type", "x-request-timeout")
+REDACTED = "[REDACTED]"
+SENSITIVE_KEYS = re.compile(r"token|secret|password|authorization|api[_-]?key|phone", re.IGNORECASE)
+SENSITIVE_TEXT = re.compile(r"Bearer\s+[^\s\"']+|\+?\b\d{10,15}\b")
+
+_STOP = object()
+
+
+def redact(value):
+    """Copy of a JSON value with sensitive keys and token or phone-number text replaced"""
+    if isinstance(value, dict):
+        return {key: REDACTED if SENSITIVE_KEYS.search(key) and value[key] not in (None, "") else redact(value[key])
+                for key in value}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return SENSITIVE_TEXT.sub(REDACTED, value)
+    return value
+
+
+def redact_body(body: bytes, content_type: str) -> Optional[str]:
+    """
+    Redacted body text, None when it is not text or is JSON that does not parse:
+    sensitive values are only found by their keys, so such a body is not kept
+    """
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    if "json" in content_type or text.lstrip()[:1] in ("{", "["):
+        try:
+            return json.dumps(redact(json.loads(text)), separators=(",", ":"))
+        except ValueError:
+            return None
+    return SENSITIVE_TEXT.sub(REDACTED, text)
+
+
+def _headers(raw) -> dict:
+    headers = {}
+    for name, value in raw:
+        name = name.decode("latin-1").lower()
+        if name in CAPTURED_HEADERS:
+            headers[name] = value.decode("latin-1")
+    if "authorization" in headers:
+        scheme = headers["authorization"].partition(" ")[0]
+        headers["authorization"] = f"{scheme} {REDACTED}"
+    return headers
+
+
+class CaptureWriter:
+    """Appends captured exchanges to a JSONL file from a background thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def submit(self, exchange: dict):
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(exchange)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_writer(self):
+        # Threads do not survive fork, so each worker process starts its own
+        if self._writer is not None and self._writer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._writer is None or self._writer_pid != os.getpid():
+                self._queue = queue.Queue(QUEUE_SIZE)
+                self._writer = threading.Thread(target=self._write_loop, name="capture-writer", daemon=True)
+                self._writer_pid = os.getpid()
+                self._writer.start()
+
+    def _write_loop(self):
+        lines = []
+        flush_at = time.monotonic() + FLUSH_INTERVAL
+        with open(self.path, "a", encoding="utf-8") as output:
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(0.0, flush_at - time.monotonic()))
+                except queue.Empty:
+                    item = None
+                if item is not None and item is not _STOP:
+                    try:
+                        lines.append(json.dumps(self._record(item), separators=(",", ":")) + "\n")
+                    except Exception as e:
+                        logger.error(f"Could not capture request to {item.get('path')}: {e}")
+                if lines and (item is None or item is _STOP or len(lines) >= FLUSH_RECORDS
+                              or time.monotonic() >= flush_at):
+                    # One write per batch keeps lines from several workers whole
+                    output.write("".join(lines))
+                    output.flush()
+                    lines = []
+                if item is None or time.monotonic() >= flush_at:
+                    flush_at = time.monotonic() + FLUSH_INTERVAL
+                if item is _STOP:
+                    break
+
+    @staticmethod
+    def _record(exchange: dict) -> dict:
+        request_headers = _headers(exchange.pop("request_headers"))
+        response_headers = _headers(exchange.pop("response_headers"))
+        request_body = exchange.pop("request_body")
+        request_size = exchange.pop("request_size", len(request_body))
+        response_body = exchange.pop("response_body")
+        exchange["headers"] = request_headers
+        # A cut-off body cannot be replayed or compared, nor reliably redacted
+        exchange["body"] = None if exchange["truncated"] else redact_body(request_body, request_headers.get("content-type", ""))
+        if exchange["body"] is None and request_body:
+            exchange["body_size"] = request_size
+        exchange["response_headers"] = response_headers
+        exchange["response"] = (None if exchange["response_truncated"]
+                                else redact_body(response_body, response_headers.get("content-type", "")))
+        if exchange["response"] is None:
+            exchange["response_size"] = len(response_body)
+        return exchange
+
+    def close(self, timeout: float = 10):
+        """Write out queued records and stop the writer"""
+        if self._writer is not None and self._writer_pid == os.getpid():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+            self._writer = None
+
+
+class CaptureMiddleware:
+    """ASGI middleware recording a sample of HTTP exchanges for replay"""
+
+    def __init__(self, app, path: str = CAPTURE_FILE, sample_rate: float = CAPTURE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.writer = CaptureWriter(path)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.writer.close()
+            return
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        exchange = {
+            "ts": time.time(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope["query_string"].decode("latin-1"),
+            "request_headers": scope["headers"],
+            "status": None,
+            "response_headers": [],
+            "ttfb_ms": None,
+        }
+        request_body = bytearray()
+        response_body = bytearray()
+        request_size = 0
+
+        async def capture_receive():
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+                if len(request_body) <= MAX_CAPTURE_BODY:
+                    request_body.extend(message.get("body", b""))
+            return message
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                exchange["status"] = message["status"]
+                exchange["response_headers"] = message.get("headers", [])
+                exchange["ttfb_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            elif message["type"] == "http.response.body" and len(response_body) <= MAX_CAPTURE_BODY:
+                response_body.extend(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            exchange["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            # A truncated request cannot be replayed; a truncated response is not compared
+            exchange["truncated"] = len(request_body) > MAX_CAPTURE_BODY
+            exchange["response_truncated"] = len(response_body) > MAX_CAPTURE_BODY
+            exchange["request_body"] = bytes(request_body[:MAX_CAPTURE_BODY])
+            exchange["request_size"] = request_size
+            exchange["response_body"] = bytes(response_body[:MAX_CAPTURE_BODY])
+            self.writer.submit(exchange)
@@ -0,0 +1,219 @@
+"""
+Idempotent and coalesced tool calls
+Concurrent identical tools/call requests (same caller, tool and normalized
+arguments) share one execution and all receive its result. A call carrying
+an idempotency key also leaves its result in a bounded cache, so a retry with
+the same key gets the stored response instead of running the tool again.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import anyio
+
+from scanner import cancel
+from scanner import progress
+
+logger = logging.getLogger(__name__)
+
+# Seconds a response stays replayable under its idempotency key
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", 3600))
+# Total size of cached responses per worker
+IDEMPOTENCY_CACHE_BYTES = int(os.getenv("IDEMPOTENCY_CACHE_BYTES", 64 * 1024 * 1024))
+MAX_IDEMPOTENCY_KEY = 255
+# Seconds between checks of a waiting caller's own deadline and cancellation
+WAIT_POLL = 0.1
+
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused for a different call"""
+
+
+@dataclass(frozen=True)
+class Outcome:
+    """A tool call's JSON-RPC result or error, encoded once and shared by every caller"""
+    status_code: int
+    member: str  # "result" or "error"
+    body: bytes
+
+    @classmethod
+    def result(cls, value) -> "Outcome":
+        return cls(200, "result", json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def error(cls, code: int, message: str, status_code: int = 400) -> "Outcome":
+        return cls(status_code, "error", json.dumps({"code": code, "message": message}, separators=(",", ":")).encode("utf-8"))
+
+    def response_body(self, request_id) -> bytes:
+        """The JSON-RPC response to one caller, spliced around the shared encoded member"""
+        return b'{"jsonrpc":"2.0","id":%s,"%s":%s}' % (json.dumps(request_id).encode("utf-8"), self.member.encode("ascii"), self.body)
+
+
+def principal_of(authorization: str) -> str:
+    """Digest standing in for the caller's credentials in keys kept in memory"""
+    return hashlib.sha256(authorization.encode("utf-8")).hexdigest()[:32]
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items() if item not in (None, "")}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def call_key(principal: str, tool_name: str, arguments: dict) -> str:
+    """Key of a call: same caller, same tool, same arguments up to key order and empty values"""
+    normalized = _normalize(arguments if isinstance(arguments, dict) else {})
+    repository_url = normalized.get("repository_url")
+    if isinstance(repository_url, str):
+        # Trailing slash or .git name the same repository
+        repository_url = repository_url.rstrip("/")
+        normalized["repository_url"] = repository_url[:-4] if repository_url.endswith(".git") else repository_url
+    encoded = json.dumps([principal, tool_name, normalized], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Outcomes by (principal, idempotency key), evicted oldest first by age and total size"""
+
+    def __init__(self, max_bytes: int = IDEMPOTENCY_CACHE_BYTES, ttl: float = IDEMPOTENCY_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str, Outcome]]" = OrderedDict()
+
+    def get(self, key: Tuple[str, str]) -> Optional[Tuple[str, Outcome]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, key_of_call, outcome = entry
+        if expires < time.monotonic():
+            self._remove(key)
+            return None
+        return key_of_call, outcome
+
+    def put(self, key: Tuple[str, str], key_of_call: str, outcome: Outcome):
+        if len(outcome.body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, key_of_call, outcome)
+        self.size += len(outcome.body)
+        # Entries are added in expiry order, so the oldest are both the first to expire and to evict
+        while self._entries and (self.size > self.max_bytes or next(iter(self._entries.values()))[0] < time.monotonic()):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Tuple[str, str]):
+        _, _, outcome = self._entries.pop(key)
+        self.size -= len(outcome.body)
+
+
+class _Flight:
+    """One running execution and the callers waiting for it"""
+
+    def __init__(self, deadline: Optional[float]):
+        self.scope = cancel.CancelScope(deadline)
+        self.done = anyio.Event()
+        self.outcome: Optional[Outcome] = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+        self.reporters: list = []
+        self.idempotency_keys: Set[Tuple[str, str]] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    def join(self, deadline: Optional[float]):
+        # The execution runs until the most patient caller gives up
+        self.waiters += 1
+        if self.scope.deadline is not None and (deadline is None or deadline > self.scope.deadline):
+            self.scope.deadline = deadline
+
+    def report(self, done: int, total: int, findings: int):
+        for reporter in list(self.reporters):
+            reporter.report(done, total, findings)
+
+
+class ToolCalls:
+    """Runs tool calls once per key at a time and replays results for idempotency keys"""
+
+    def __init__(self, cache: Optional[ResponseCache] = None):
+        self.cache = cache or ResponseCache()
+        self._flights: Dict[str, _Flight] = {}
+
+    async def call(self, authorization: str, tool_name: str, arguments: dict, idempotency_key: Optional[str],
+                   execute: Callable[[], Awaitable[Outcome]]) -> Outcome:
+        principal = principal_of(authorization)
+        key = call_key(principal, tool_name, arguments)
+        cache_key = None
+        if idempotency_key:
+            if len(idempotency_key) > MAX_IDEMPOTENCY_KEY:
+                raise IdempotencyConflict(f"Idempotency key longer than {MAX_IDEMPOTENCY_KEY} characters")
+            cache_key = (principal, idempotency_key)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                key_of_call, outcome = cached
+                if key_of_call != key:
+                    raise IdempotencyConflict("Idempotency key was already used with different arguments")
+                logger.info(f"Replaying {tool_name} result for idempotency key {idempotency_key[:16]}")
+                return outcome
+
+        flight = self._flights.get(key)
+        # An execution every caller abandoned is still winding down; it is not joined
+        if flight is None or flight.scope.cancelled:
+            flight = self._flights[key] = _Flight(cancel.deadline())
+            # The execution belongs to all of its callers, not to the task of the first one
+            flight.task = asyncio.get_running_loop().create_task(self._execute(key, flight, execute))
+        else:
+            logger.info(f"Joining in-flight {tool_name} call ({flight.waiters} waiting)")
+        return await self._wait(flight, cache_key)
+
+    async def _execute(self, key: str, flight: _Flight, execute: Callable[[], Awaitable[Outcome]]):
+        try:
+            reporter = progress.ProgressReporter(flight.report, min_interval=0)
+            with cancel.activate(flight.scope), progress.activate(reporter):
+                flight.outcome = await execute()
+            # Cancelled calls and server errors are not replayed; a retry runs them again
+            if flight.outcome.status_code < 500:
+                for cache_key in flight.idempotency_keys:
+                    self.cache.put(cache_key, key, flight.outcome)
+        except BaseException as e:
+            flight.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.done.set()
+
+    async def _wait(self, flight: _Flight, cache_key: Optional[Tuple[str, str]]) -> Outcome:
+        caller = cancel.current()
+        reporter = progress.current()
+        flight.join(caller.deadline if caller is not None else None)
+        if cache_key is not None:
+            flight.idempotency_keys.add(cache_key)
+        if reporter is not None:
+            flight.reporters.append(reporter)
+        try:
+            while not flight.done.is_set():
+                with anyio.move_on_after(WAIT_POLL):
+                    await flight.done.wait()
+                if caller is not None and not flight.done.is_set():
+                    caller.check()
+        finally:
+            flight.waiters -= 1
+            if reporter is not None:
+                flight.reporters.remove(reporter)
+            if flight.waiters == 0 and not flight.done.is_set():
+                flight.scope.cancel("Every caller went away")
+        if flight.error is not None:
+            raise flight.error
+        return flight.outcome
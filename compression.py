@@ -0,0 +1,251 @@
+"""
+Response compression middleware
+Negotiates brotli/zstd/gzip, streams NDJSON/SSE and offloads large bodies to threads
+"""
+
+import logging
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+import anyio
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Content types that are worth compressing
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/sarif+json",
+    "application/vnd.vulngpt.findings",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+# Content types that are streamed chunk by chunk and must be flushed per chunk
+STREAMING_TYPES = ("application/x-ndjson", "text/event-stream")
+
+
+def available_encodings() -> List[str]:
+    """Encodings supported by this process, in order of preference"""
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str, supported: List[str]) -> Optional[str]:
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _Encoder:
+    """Incremental compressor with a common interface over gzip/brotli/zstd"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data)
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        """Emit everything buffered so far without ending the stream"""
+        if self.encoding == "br":
+            return self._obj.flush()
+        if self.encoding == "zstd":
+            return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+
+def compress_body(encoding: str, body: bytes, level: int) -> bytes:
+    """One-shot compression of a complete body"""
+    encoder = _Encoder(encoding, level)
+    return encoder.compress(body) + encoder.finish()
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses above a size threshold"""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        offload_size: int = 256 * 1024,
+        levels: Optional[dict] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.levels = {"br": 4, "zstd": 3, "gzip": 6}
+        if levels:
+            self.levels.update(levels)
+        self.supported = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding, self.supported)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    """Wraps the ASGI send callable for a single response"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Callable):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.level = middleware.levels[encoding]
+        self.send = send
+        self.start_message: Optional[dict] = None
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.encoder: Optional[_Encoder] = None
+        self.streaming = False
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self.passthrough, self.streaming = self._classify(message)
+            if self.passthrough:
+                await self.send(message)
+            elif self.streaming:
+                # Streams have no known length, compress from the first byte
+                self.encoder = _Encoder(self.encoding, self.level)
+                await self.send(self._compressed_start())
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.streaming:
+            data = self.encoder.compress(body)
+            data += self.encoder.flush() if more_body else self.encoder.finish()
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        if self.encoder is not None:
+            # Already committed to incremental compression of a large body
+            data = self.encoder.compress(body)
+            if not more_body:
+                data += self.encoder.finish()
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        self.buffer.append(body)
+        self.buffered += len(body)
+
+        if not more_body:
+            await self._send_complete(b"".join(self.buffer))
+        elif self.buffered >= self.middleware.offload_size:
+            # Large chunked body: compress incrementally rather than holding it all
+            self.encoder = _Encoder(self.encoding, self.level)
+            await self.send(self._compressed_start())
+            data = self.encoder.compress(b"".join(self.buffer))
+            self.buffer = []
+            await self.send({"type": "http.response.body", "body": data, "more_body": True})
+
+    def _classify(self, message) -> Tuple[bool, bool]:
+        """Return (passthrough, streaming) for a response start message"""
+        if message.get("status", 200) in (204, 304) or message.get("status", 200) < 200:
+            return True, False
+        content_type = ""
+        for name, value in message.get("headers", []):
+            if name == b"content-encoding":
+                return True, False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return True, False
+        return False, content_type.startswith(STREAMING_TYPES)
+
+    def _compressed_start(self) -> dict:
+        headers = [
+            (name, value)
+            for name, value in self.start_message.get("headers", [])
+            if name not in (b"content-length", b"vary")
+        ]
+        vary = [value for name, value in self.start_message.get("headers", []) if name == b"vary"]
+        vary.append(b"Accept-Encoding")
+        headers.append((b"vary", b", ".join(vary)))
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        return {**self.start_message, "headers": headers}
+
+    async def _send_complete(self, body: bytes):
+        if len(body) < self.middleware.minimum_size:
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": body, "more_body": False})
+            return
+
+        if len(body) >= self.middleware.offload_size:
+            # Keep the event loop responsive while a large report is compressed
+            data = await anyio.to_thread.run_sync(compress_body, self.encoding, body, self.level)
+        else:
+            data = compress_body(self.encoding, body, self.level)
+
+        start = self._compressed_start()
+        start["headers"].append((b"content-length", str(len(data)).encode("latin-1")))
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": data, "more_body": False})
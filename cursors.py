@@ -0,0 +1,47 @@
+"""
+Opaque pagination cursors
+A cursor is a small JSON position (what is being paged and where the last
+page ended) with an HMAC, so any worker can resume from it without keeping
+state and clients cannot forge or edit one.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+
+# Shared by all servers behind a load balancer; the generated default is shared
+# by the pre-forked workers of one server only
+CURSOR_SECRET = (os.getenv("CURSOR_SECRET") or secrets.token_hex(32)).encode("utf-8")
+SIGNATURE_SIZE = 12
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not issued by this server or is for something else"""
+
+
+def _sign(kind: str, payload: bytes) -> bytes:
+    return hmac.new(CURSOR_SECRET, kind.encode("utf-8") + b"\0" + payload, hashlib.sha256).digest()[:SIGNATURE_SIZE]
+
+
+def encode(kind: str, position: dict) -> str:
+    """Cursor for a position in a kind of listing"""
+    payload = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(_sign(kind, payload) + payload).rstrip(b"=").decode("ascii")
+
+
+def decode(kind: str, cursor: str) -> dict:
+    """Position of a cursor issued for this kind of listing; raises InvalidCursor otherwise"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    except (TypeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+    signature, payload = data[:SIGNATURE_SIZE], data[SIGNATURE_SIZE:]
+    if not hmac.compare_digest(signature, _sign(kind, payload)):
+        raise InvalidCursor("Invalid cursor")
+    position = json.loads(payload)
+    if not isinstance(position, dict):
+        raise InvalidCursor("Invalid cursor")
+    return position
@@ -0,0 +1,83 @@
+"""
+Request deadline middleware
+Gives every HTTP request a cancel scope: a deadline from the X-Request-Timeout
+header (capped by REQUEST_TIMEOUT) and cancellation when the client disconnects,
+so scans stop once nobody is waiting for their result.
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+import anyio
+
+from scanner import cancel
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for any request, in seconds (0 disables it)
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", 300))
+TIMEOUT_HEADER = b"x-request-timeout"
+
+
+def parse_timeout(value: Optional[str]) -> Optional[float]:
+    """Seconds from a timeout header or _meta field, None if absent or invalid"""
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        return None
+    return timeout if timeout > 0 else None
+
+
+class DeadlineMiddleware:
+    """ASGI middleware activating a cancel scope for each HTTP request"""
+
+    def __init__(self, app, default_timeout: float = REQUEST_TIMEOUT):
+        self.app = app
+        self.default_timeout = default_timeout or None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout = self.default_timeout
+        for name, value in scope["headers"]:
+            if name == TIMEOUT_HEADER:
+                requested = parse_timeout(value.decode("latin-1"))
+                if requested is not None:
+                    timeout = min(requested, timeout) if timeout else requested
+                break
+        request_scope = cancel.CancelScope(time.time() + timeout if timeout else None)
+        disconnected = anyio.Event()
+        body_complete = False
+
+        async with anyio.create_task_group() as task_group:
+
+            async def watch_disconnect():
+                # Owns receive once the body is read; nothing else arrives before a disconnect
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    request_scope.cancel("Client disconnected")
+                    disconnected.set()
+
+            async def wrapped_receive():
+                nonlocal body_complete
+                if body_complete:
+                    await disconnected.wait()
+                    return {"type": "http.disconnect"}
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    request_scope.cancel("Client disconnected")
+                    disconnected.set()
+                elif not message.get("more_body", False):
+                    body_complete = True
+                    task_group.start_soon(watch_disconnect)
+                return message
+
+            try:
+                with cancel.activate(request_scope):
+                    await self.app(scope, wrapped_receive, send)
+            finally:
+                task_group.cancel_scope.cancel()
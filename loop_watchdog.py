@@ -0,0 +1,139 @@
+"""
+Event-loop stall watchdog
+The lag monitor's heartbeat task stamps the time whenever the loop runs it. A
+sampling thread notices when the stamp goes stale and, while the loop is still
+blocked, captures the stack of the event-loop thread and the task it is
+running, so each stall is logged and counted with the code that caused it
+(usually blocking I/O or CPU work inside an async handler).
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from admission import LoopLagMonitor
+
+logger = logging.getLogger(__name__)
+
+# Seconds the loop may be late before a stall is recorded (0 disables the watchdog)
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", 0.1))
+SAMPLE_INTERVAL = 0.02
+# A stall still going on after this many seconds is logged before it ends
+LONG_STALL = 5.0
+RECENT_STALLS = 20
+STACK_LIMIT = 30
+
+_LIBRARY_DIRS = tuple({sysconfig.get_paths()[name] for name in ("stdlib", "platstdlib", "purelib", "platlib")})
+
+
+def _location(frames) -> str:
+    """Innermost frame outside the standard library and installed packages, else the innermost frame"""
+    for frame in reversed(frames):
+        if not frame.filename.startswith(_LIBRARY_DIRS):
+            break
+    else:
+        frame = frames[-1]
+    return f"{frame.filename}:{frame.lineno} in {frame.name}"
+
+
+def _task_name(loop: Optional[asyncio.AbstractEventLoop]) -> Optional[str]:
+    if loop is None:
+        return None
+    try:
+        task = asyncio.current_task(loop)
+    except RuntimeError:
+        return None
+    if task is None:
+        return None
+    coro = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+
+class LoopWatchdog:
+    """Records event-loop stalls seen from outside the loop, with the blocking stack"""
+
+    def __init__(self, monitor: LoopLagMonitor, threshold: float = LOOP_STALL_THRESHOLD,
+                 sample_interval: float = SAMPLE_INTERVAL):
+        self.monitor = monitor
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.stalls = 0
+        self.stalled_seconds = 0.0
+        self.max_stall = 0.0
+        self.recent: deque = deque(maxlen=RECENT_STALLS)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.threshold <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(1)
+            self._thread = None
+
+    def _watch(self):
+        stall = None
+        while not self._stop.wait(self.sample_interval):
+            beat = self.monitor.beat
+            if beat is None:
+                continue
+            if stall is not None and beat != stall["beat"]:
+                # The loop ran the heartbeat again: the stall is over
+                self._finish(stall, beat - stall["beat"] - self.monitor.interval)
+                stall = None
+            overdue = time.monotonic() - beat - self.monitor.interval
+            if stall is None and overdue > self.threshold:
+                stall = self._capture(beat)
+            elif stall is not None and not stall["reported"] and overdue > LONG_STALL:
+                stall["reported"] = True
+                logger.error(f"Event loop blocked for {overdue:.1f}s so far in {stall['location']}, "
+                             f"task {stall['task']}:\n{''.join(stall['stack'])}")
+
+    def _capture(self, beat: float) -> dict:
+        # Sampled while the loop thread is still stuck, so its frames show the blocking call
+        frame = sys._current_frames().get(self.monitor.thread_id)
+        frames = traceback.extract_stack(frame, limit=STACK_LIMIT) if frame is not None else []
+        return {
+            "beat": beat,
+            "task": _task_name(self.monitor.loop),
+            "location": _location(frames) if frames else "unknown",
+            "stack": traceback.format_list(frames),
+            "reported": False,
+        }
+
+    def _finish(self, stall: dict, duration: float):
+        duration = max(duration, self.threshold)
+        self.stalls += 1
+        self.stalled_seconds += duration
+        self.max_stall = max(self.max_stall, duration)
+        self.recent.append({
+            "at": time.time(),
+            "duration_ms": round(duration * 1000, 1),
+            "task": stall["task"],
+            "location": stall["location"],
+            "stack": stall["stack"],
+        })
+        logger.warning(f"Event loop blocked for {duration * 1000:.0f}ms in {stall['location']}, "
+                       f"task {stall['task']}:\n{''.join(stall['stack'])}")
+
+    def stats(self) -> dict:
+        last = self.recent[-1] if self.recent else None
+        return {
+            "stalls": self.stalls,
+            "stalled_ms": round(self.stalled_seconds * 1000, 1),
+            "max_stall_ms": round(self.max_stall * 1000, 1),
+            "last": {key: last[key] for key in ("duration_ms", "task", "location")} if last else None,
+        }
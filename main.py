@@ -16,6 +16,8 @@ import hashlib
 import hmac
 import secrets
 
+import auth_tokens
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -71,6 +73,12 @@ class HealthResponse(BaseModel):
     server: str = "VulnGPT MCP Server"
 
 # Utility functions
+def phone_for_token(token: Optional[str]) -> Optional[str]:
+    """Phone number of a static token in USER_DATABASE or a signed token, verified locally"""
+    if not token:
+        return None
+    return USER_DATABASE.get(token) or auth_tokens.phone_number(token)
+
 def validate_phone_format(phone: str) -> bool:
     """Validate Indian phone number format (919876543210)"""
     return phone.startswith("91") and len(phone) == 12 and phone[2:].isdigit()
@@ -86,8 +94,8 @@ def authenticate_token(credentials: HTTPAuthorizationCredentials = Depends(secur
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Check if token exists in database
-    if token not in USER_DATABASE:
+    # Check the token is known or carries a valid signature
+    if phone_for_token(token) is None:
         logger.warning(f"Invalid token attempted: {token[:10]}...")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -126,7 +134,7 @@ async def validate_token(token: str = Depends(authenticate_token)):
     Returns phone number in Indian format (919876543210).
     """
     try:
-        phone_number = USER_DATABASE[token]
+        phone_number = phone_for_token(token)
         
         # Validate phone format
         if not validate_phone_format(phone_number):
@@ -0,0 +1,225 @@
+"""
+MCP resources for stored scans
+Scan reports (vulngpt://scan/{id}) and single findings
+(vulngpt://scan/{id}/finding/{fingerprint}) are read lazily from the findings
+store; a report is read a page at a time with cursor, limit and filter
+parameters on its URI. Subscriptions live in the store so any worker can take
+them, and each client's notification stream polls the store for new scans
+that change a subscribed report.
+"""
+
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+import anyio
+from fastapi.responses import Response
+
+import cursors
+from scanner.store import get_store
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPE = "application/json"
+RESOURCES_PAGE_SIZE = 50
+REPORT_PAGE_SIZE = 100
+FINDINGS_FILTERS = ("rule_id", "severity", "file")
+# Seconds between checks for new scans, and between keepalive comments, on a notification stream
+POLL_INTERVAL = 1.0
+KEEPALIVE_INTERVAL = 15.0
+# JSON-RPC error code MCP uses for unknown resources
+NOT_FOUND_CODE = -32002
+
+_URI = re.compile(r"vulngpt://scan/(\d+)(?:/finding/([0-9a-f]+))?(?:\?(.*))?\Z")
+
+RESOURCE_TEMPLATES = [
+    {
+        "uriTemplate": "vulngpt://scan/{id}",
+        "name": "Scan report",
+        "description": "Findings of a stored scan, most severe first; page with ?cursor= and ?limit=, filter with ?severity=, ?rule_id= or ?file= (path prefix)",
+        "mimeType": MIME_TYPE
+    },
+    {
+        "uriTemplate": "vulngpt://scan/{id}/finding/{fingerprint}",
+        "name": "Finding",
+        "description": "A single finding of a stored scan",
+        "mimeType": MIME_TYPE
+    }
+]
+
+
+class ResourceNotFound(ValueError):
+    """No stored scan or finding behind a resource URI"""
+
+
+def scan_uri(scan_id: int, **query) -> str:
+    uri = f"vulngpt://scan/{scan_id}"
+    return f"{uri}?{urlencode(query)}" if query else uri
+
+
+def finding_uri(scan_id: int, fingerprint: str) -> str:
+    return f"vulngpt://scan/{scan_id}/finding/{fingerprint}"
+
+
+def parse_uri(uri: str) -> Tuple[int, Optional[str], dict]:
+    """(scan id, fingerprint or None, query parameters) of a resource URI"""
+    match = _URI.match(uri or "")
+    if match is None:
+        raise ResourceNotFound(f"Unknown resource: {uri}")
+    return int(match.group(1)), match.group(2), dict(parse_qsl(match.group(3) or ""))
+
+
+def _store():
+    store = get_store()
+    if store is None:
+        raise ValueError("The findings store is disabled")
+    return store
+
+
+def findings_page(scan_id: int, filters: dict, after: int, limit: int) -> dict:
+    """One page of a stored scan's findings and the cursor of the next page, if any"""
+    findings, following = _store().seek_findings(scan_id, after=after, limit=limit, **filters)
+    page = {"findings": [finding.to_dict() for finding in findings]}
+    if following is not None:
+        page["nextCursor"] = cursors.encode("findings", {"scan": scan_id, "after": following, "limit": limit, **filters})
+    return page
+
+
+def list_resources(cursor: Optional[str] = None) -> dict:
+    """resources/list: stored scans, newest first; findings are reached through the templates"""
+    store = get_store()
+    if store is None:
+        return {"resources": []}
+    before = cursors.decode("resources", cursor).get("before") if cursor else None
+    scans = store.list_scans(before=before, limit=RESOURCES_PAGE_SIZE)
+    result = {
+        "resources": [
+            {
+                "uri": scan_uri(scan["id"]),
+                "name": f"Scan {scan['id']} of {scan['repository']}",
+                "description": f"{scan['scan_type']} scan" + (f" at {scan['commit'][:12]}" if scan["commit"] else ""),
+                "mimeType": MIME_TYPE
+            }
+            for scan in scans
+        ]
+    }
+    if len(scans) == RESOURCES_PAGE_SIZE:
+        result["nextCursor"] = cursors.encode("resources", {"before": scans[-1]["id"]})
+    return result
+
+
+def read_resource(uri: str) -> dict:
+    """resources/read: a page of a scan report, or one finding"""
+    store = _store()
+    scan_id, fingerprint, query = parse_uri(uri)
+    scan = store.get_scan(scan_id)
+    if scan is None:
+        raise ResourceNotFound(f"Unknown resource: {uri}")
+    if fingerprint is not None:
+        finding = store.get_finding(scan_id, fingerprint)
+        if finding is None:
+            raise ResourceNotFound(f"Unknown resource: {uri}")
+        data = {"scan": scan_uri(scan_id), **finding.to_dict()}
+    else:
+        if query.get("cursor"):
+            position = cursors.decode("findings", query["cursor"])
+            if position.get("scan") != scan_id:
+                raise cursors.InvalidCursor("Invalid cursor")
+            filters = {name: position[name] for name in FINDINGS_FILTERS if name in position}
+            after, limit = position.get("after", 0), position.get("limit", REPORT_PAGE_SIZE)
+        else:
+            filters = {name: query[name] for name in FINDINGS_FILTERS if query.get(name)}
+            try:
+                after, limit = 0, int(query.get("limit", REPORT_PAGE_SIZE))
+            except ValueError:
+                raise ValueError("limit must be an integer")
+        latest = store.find_scan(scan["repository"])
+        data = {
+            "scan": scan,
+            "latest": scan_uri(latest["id"]) if latest else None,
+            "totals": store.count_findings(scan_id),
+            **findings_page(scan_id, filters, after, limit)
+        }
+        if "nextCursor" in data:
+            data["next"] = scan_uri(scan_id, cursor=data["nextCursor"])
+    return {"contents": [{"uri": uri, "mimeType": MIME_TYPE, "text": json.dumps(data)}]}
+
+
+def subscribe(session: str, uri: str):
+    """resources/subscribe: updates are sent when a rescan of the scan's repository changes the report"""
+    store = _store()
+    scan_id, _, _ = parse_uri(uri)
+    scan = store.get_scan(scan_id)
+    if scan is None:
+        raise ResourceNotFound(f"Unknown resource: {uri}")
+    store.subscribe(session, uri, scan["repository"]).result()
+
+
+def unsubscribe(session: str, uri: str):
+    _store().unsubscribe(session, uri).result()
+
+
+@lru_cache(maxsize=1024)
+def report_changed(scan_id: int) -> bool:
+    # Scans never change once stored, so each is compared with its predecessor once per worker
+    return get_store().changed(scan_id)
+
+
+def pending_updates(session: str, last_seen: int) -> Tuple[int, List[str]]:
+    """Subscribed URIs of a session whose reports changed in scans after last_seen, and the new last scan id"""
+    store = get_store()
+    updated = []
+    for scan_id, repository in store.scans_after(last_seen):
+        last_seen = scan_id
+        subscribed = store.subscriptions(session, repository)
+        if subscribed and report_changed(scan_id):
+            updated.extend(uri for uri in subscribed if uri not in updated)
+    return last_seen, updated
+
+
+def sse_event(message: dict) -> bytes:
+    return b"event: message\ndata: " + json.dumps(message).encode("utf-8") + b"\n\n"
+
+
+class ResourceUpdatesResponse(Response):
+    """Server-sent event stream of notifications/resources/updated for one client session"""
+    background = None
+
+    def __init__(self, session: str):
+        self.session = session
+
+    async def __call__(self, scope, receive, send):
+        store = get_store()
+        last_seen = await anyio.to_thread.run_sync(store.last_scan_id) if store is not None else 0
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+        })
+        await send({"type": "http.response.body", "body": b": connected\n\n", "more_body": True})
+
+        async with anyio.create_task_group() as task_group:
+
+            async def watch_disconnect():
+                while (await receive())["type"] != "http.disconnect":
+                    pass
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(watch_disconnect)
+            idle = 0.0
+            while True:
+                await anyio.sleep(POLL_INTERVAL)
+                updated = []
+                if store is not None:
+                    last_seen, updated = await anyio.to_thread.run_sync(pending_updates, self.session, last_seen)
+                for uri in updated:
+                    message = {"jsonrpc": "2.0", "method": "notifications/resources/updated", "params": {"uri": uri}}
+                    await send({"type": "http.response.body", "body": sse_event(message), "more_body": True})
+                idle = 0.0 if updated else idle + POLL_INTERVAL
+                if idle >= KEEPALIVE_INTERVAL:
+                    # Keeps proxies from closing a quiet stream
+                    await send({"type": "http.response.body", "body": b": keepalive\n\n", "more_body": True})
+                    idle = 0.0
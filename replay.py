@@ -0,0 +1,319 @@
+"""
+Replay captured MCP traffic
+Re-drives a capture written by CaptureMiddleware (CAPTURE_FILE) against an
+app in-process or a running server, at the captured pace or sped up, and
+reports latency percentiles per operation next to the captured ones, plus
+responses that differ from what was captured.
+
+    python replay.py capture.jsonl --app strict_mcp:app --speed 10
+    python replay.py capture.jsonl --url http://localhost:8000 --speed 0
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import httpx
+
+from capture import REDACTED, redact
+from serve import load_app
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger("replay")
+
+JSONRPC_PATHS = ("/", "/mcp", "/rpc", "/sse")
+# Response fields that differ between runs without anything having changed
+VOLATILE_KEYS = ("timestamp", "created_at", "duration_ms", "scan_id", "load")
+PERCENTILES = (50, 90, 99)
+
+
+def load_capture(path: str) -> List[dict]:
+    """Captured exchanges in arrival order, without truncated ones that cannot be re-sent"""
+    records = []
+    skipped = 0
+    with open(path, encoding="utf-8") as capture:
+        for line in capture:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("truncated") or (record.get("body") is None and record["method"] == "POST"):
+                skipped += 1
+                continue
+            records.append(record)
+    if skipped:
+        logger.warning(f"Skipped {skipped} truncated or binary requests")
+    return sorted(records, key=lambda record: record["ts"])
+
+
+def operation(record: dict) -> str:
+    """Label to group latencies by: the JSON-RPC method (and tool), otherwise method and path"""
+    if record["method"] == "POST" and record["path"].rstrip("/") in JSONRPC_PATHS + ("",):
+        try:
+            message = json.loads(record["body"])
+        except ValueError:
+            message = None
+        if isinstance(message, dict):
+            method = message.get("method", "?")
+            if method == "tools/call":
+                return f"tools/call {(message.get('params') or {}).get('name', '?')}"
+            return method
+    return f"{record['method']} {record['path']}"
+
+
+def _last_event(text: str) -> Optional[str]:
+    data = None
+    for line in text.splitlines():
+        if line.startswith("data:"):
+            data = line[5:].strip()
+    return data
+
+
+def _strip_volatile(value):
+    if isinstance(value, dict):
+        return {key: _strip_volatile(item) for key, item in value.items() if key not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_strip_volatile(item) for item in value]
+    return value
+
+
+def normalize(text: Optional[str], content_type: str):
+    """Comparable form of a response: parsed JSON (for SSE, the final event) without volatile fields"""
+    if text is None:
+        return None
+    if "event-stream" in content_type:
+        # Progress events depend on timing; only the final result is compared
+        text = _last_event(text) or ""
+    try:
+        return _strip_volatile(json.loads(text))
+    except ValueError:
+        return text
+
+
+def difference(expected, actual, where: str = "$") -> Optional[str]:
+    """First place two normalized responses differ, None if they match"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual)):
+            if key not in actual:
+                return f"{where}.{key}: missing"
+            if key not in expected:
+                return f"{where}.{key}: unexpected"
+            found = difference(expected[key], actual[key], f"{where}.{key}")
+            if found:
+                return found
+        return None
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return f"{where}: {len(expected)} items, got {len(actual)}"
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            found = difference(left, right, f"{where}[{index}]")
+            if found:
+                return found
+        return None
+    if expected != actual:
+        return f"{where}: {json.dumps(expected)[:80]} != {json.dumps(actual)[:80]}"
+    return None
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Run an ASGI app's startup and shutdown around an in-process replay"""
+    events: asyncio.Queue = asyncio.Queue()
+    replies: asyncio.Queue = asyncio.Queue()
+    await events.put({"type": "lifespan.startup"})
+    task = asyncio.ensure_future(app({"type": "lifespan", "asgi": {"version": "3.0"}}, events.get, replies.put))
+    reply = await replies.get()
+    if reply["type"] != "lifespan.startup.complete":
+        raise RuntimeError(f"App startup failed: {reply.get('message', reply['type'])}")
+    try:
+        yield
+    finally:
+        await events.put({"type": "lifespan.shutdown"})
+        await replies.get()
+        await task
+
+
+async def send(client: httpx.AsyncClient, record: dict, token: Optional[str]) -> dict:
+    headers = dict(record.get("headers") or {})
+    if token and headers.get("authorization", "").endswith(REDACTED):
+        headers["authorization"] = f"Bearer {token}"
+    path = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+    content = record["body"].encode("utf-8") if record.get("body") else None
+    started = time.perf_counter()
+    try:
+        response = await client.request(record["method"], path, headers=headers, content=content)
+    except httpx.HTTPError as e:
+        return {"record": record, "status": None, "latency_ms": (time.perf_counter() - started) * 1000, "error": str(e)}
+    latency = (time.perf_counter() - started) * 1000
+    content_type = response.headers.get("content-type", "")
+    try:
+        text = response.content.decode("utf-8")
+    except UnicodeDecodeError:
+        text = None
+    else:
+        text = json.dumps(redact(json.loads(text))) if "json" in content_type and _is_json(text) else text
+    return {"record": record, "status": response.status_code, "latency_ms": latency,
+            "response": text, "content_type": content_type}
+
+
+def _is_json(text: str) -> bool:
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
+
+
+def is_initialize(record: dict) -> bool:
+    return operation(record) == "initialize"
+
+
+def initialize_record(records: List[dict]) -> Optional[dict]:
+    """
+    An initialize request for a capture that holds JSON-RPC calls but, being
+    sampled, no initialize of its own; None when it needs none
+    """
+    for record in records:
+        if record["method"] == "POST" and record["path"].rstrip("/") in JSONRPC_PATHS + ("",):
+            message = {"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {
+                "protocolVersion": "2024-11-05", "capabilities": {},
+                "clientInfo": {"name": "replay", "version": "1.0"}}}
+            return {"ts": record["ts"], "method": "POST", "path": record["path"], "query": "",
+                    "headers": {"content-type": "application/json", "accept": "application/json, text/event-stream"},
+                    "body": json.dumps(message)}
+    return None
+
+
+async def replay(records: List[dict], client: httpx.AsyncClient, speed: float = 1.0,
+                 concurrency: int = 64, token: Optional[str] = None) -> List[dict]:
+    """
+    Send the captured requests in order, spaced as captured divided by speed
+    (0: back to back). The server is initialized before anything else is sent:
+    with the captured initialize requests, or a made-up one when the sample
+    holds none (its result is not reported)
+    """
+    if not records:
+        return []
+    initialize = [record for record in records if is_initialize(record)]
+    if not initialize:
+        made_up = initialize_record(records)
+        if made_up is not None:
+            result = await send(client, made_up, token)
+            if result["status"] != 200:
+                logger.warning(f"Initialize failed with status {result['status']}")
+    results: List[Optional[dict]] = [await send(client, record, token) for record in initialize]
+    records = [record for record in records if not is_initialize(record)]
+    if not records:
+        return results
+    limit = asyncio.Semaphore(concurrency)
+    first = records[0]["ts"]
+    started = time.perf_counter()
+    results += [None] * len(records)
+    offset = len(initialize)
+
+    async def run(index: int, record: dict):
+        try:
+            results[index] = await send(client, record, token)
+        finally:
+            limit.release()
+
+    tasks = []
+    for index, record in enumerate(records):
+        if speed > 0:
+            delay = (record["ts"] - first) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await limit.acquire()
+        tasks.append(asyncio.ensure_future(run(offset + index, record)))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def compare(result: dict) -> Optional[str]:
+    """Why a replayed response differs from the captured one, None if it matches"""
+    record = result["record"]
+    if result["status"] != record.get("status"):
+        return f"status {record.get('status')} != {result['status']}" + (f" ({result['error']})" if result.get("error") else "")
+    if record.get("response") is None or record.get("response_truncated") or result.get("response") is None:
+        return None
+    expected = normalize(record["response"], record.get("response_headers", {}).get("content-type", ""))
+    actual = normalize(result["response"], result.get("content_type", ""))
+    return difference(expected, actual)
+
+
+def report(results: List[dict], show_diffs: int = 10, out=sys.stdout) -> int:
+    """Print latency percentiles per operation and response differences; returns the number of differences"""
+    replayed = defaultdict(list)
+    captured = defaultdict(list)
+    diffs = []
+    for result in results:
+        label = operation(result["record"])
+        replayed[label].append(result["latency_ms"])
+        if result["record"].get("duration_ms") is not None:
+            captured[label].append(result["record"]["duration_ms"])
+        reason = compare(result)
+        if reason:
+            diffs.append((label, reason))
+
+    columns = " ".join(f"{'p' + str(q):>9}" for q in PERCENTILES)
+    print(f"{'operation':<32} {'count':>6} {columns} {'max':>9}   captured {columns}", file=out)
+    for label in sorted(replayed):
+        now = " ".join(f"{percentile(replayed[label], q):9.1f}" for q in PERCENTILES)
+        then = " ".join(f"{percentile(captured[label], q):9.1f}" for q in PERCENTILES)
+        print(f"{label[:32]:<32} {len(replayed[label]):>6} {now} {max(replayed[label]):9.1f}   {'':>8} {then}", file=out)
+    print(f"\n{len(results)} requests replayed (latencies in ms), {len(diffs)} responses differ", file=out)
+    for label, reason in diffs[:show_diffs]:
+        print(f"  {label}: {reason}", file=out)
+    return len(diffs)
+
+
+async def _main(args) -> int:
+    records = load_capture(args.capture)
+    if args.app:
+        app = load_app(args.app)
+        transport = httpx.ASGITransport(app=app)
+        async with lifespan(app), httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+            results = await replay(records, client, args.speed, args.concurrency, args.token)
+    else:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            results = await replay(records, client, args.speed, args.concurrency, args.token)
+    diffs = report(results, args.show_diffs)
+    return 1 if diffs and args.fail_on_diff else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a traffic capture against an MCP server")
+    parser.add_argument("capture", help="JSONL file written by the capture middleware")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--app", help="ASGI app to run in-process as module:attribute, e.g. app_simple:app")
+    target.add_argument("--url", help="Base URL of a running server")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay rate relative to the capture; 0 sends requests back to back (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight at most (default: %(default)s)")
+    parser.add_argument("--token", default=os.getenv("REPLAY_TOKEN"),
+                        help="Bearer token to send in place of redacted ones (default: $REPLAY_TOKEN)")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout against --url")
+    parser.add_argument("--show-diffs", type=int, default=10, help="Differences to list")
+    parser.add_argument("--fail-on-diff", action="store_true", help="Exit with status 1 if any response differs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    return asyncio.run(_main(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
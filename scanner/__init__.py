@@ -0,0 +1,8 @@
+"""
+VulnGPT scan engine
+"""
+
+from scanner.engine import DiffResult, ScanResult, diff_repository, scan_path, scan_repository, scan_source, warmup
+from scanner.findings import Finding
+
+__all__ = ["DiffResult", "Finding", "ScanResult", "diff_repository", "scan_path", "scan_repository", "scan_source", "warmup"]
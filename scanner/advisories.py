@@ -0,0 +1,26 @@
+"""
+Advisory index command line
+Kept apart from scanner.dependencies, which the scanner package imports, so
+running it with -m does not load that module twice.
+
+    python -m scanner.advisories build <osv-export-dir> [index-path]
+"""
+
+import logging
+import sys
+from typing import List
+
+from scanner.dependencies import INDEX_PATH, build_index
+
+
+def main(argv: List[str]) -> int:
+    logging.basicConfig(level=logging.INFO)
+    if len(argv) < 2 or argv[0] != "build":
+        print("usage: python -m scanner.advisories build <osv-export-dir> [index-path]")
+        return 2
+    build_index(argv[1], argv[2] if len(argv) > 2 else INDEX_PATH)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,94 @@
+"""
+Deadlines and cooperative cancellation
+The request pipeline activates a CancelScope in a context variable; scan code
+calls check() at safe points (per file, per pool batch, before git commands)
+and stops with Cancelled once the caller has gone away or run out of time.
+Deadlines are wall-clock times so they can be handed to pool processes.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class Cancelled(Exception):
+    """The caller cancelled the request or disconnected"""
+
+
+class DeadlineExceeded(Cancelled):
+    """The request's deadline passed"""
+
+
+class CancelScope:
+    """Deadline plus an explicit cancel flag for one request"""
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self.reason: Optional[str] = None
+        self._cancelled = threading.Event()
+
+    def cancel(self, reason: str = "Request cancelled"):
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def shorten(self, timeout: float):
+        """Move the deadline to timeout seconds from now if that is sooner"""
+        deadline = time.time() + timeout
+        if self.deadline is None or deadline < self.deadline:
+            self.deadline = deadline
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise Cancelled(self.reason)
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise DeadlineExceeded("Deadline exceeded")
+
+
+_current: ContextVar[Optional[CancelScope]] = ContextVar("cancel_scope", default=None)
+
+
+def current() -> Optional[CancelScope]:
+    return _current.get()
+
+
+@contextmanager
+def activate(scope: CancelScope) -> Iterator[CancelScope]:
+    """Make scope the current one for this context (and threads started from it)"""
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+
+
+def check():
+    """Raise Cancelled if the current request was cancelled or is past its deadline"""
+    scope = _current.get()
+    if scope is not None:
+        scope.check()
+
+
+def deadline() -> Optional[float]:
+    scope = _current.get()
+    return None if scope is None else scope.deadline
+
+
+def timeout(default: float) -> float:
+    """A blocking call's timeout, capped by the time left before the deadline"""
+    scope = _current.get()
+    remaining = None if scope is None else scope.remaining()
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+    return min(default, remaining)
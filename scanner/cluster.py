@@ -0,0 +1,357 @@
+"""
+Distributed scans
+A coordinator (SCAN_NODES set) splits the files of a large scan into
+size-balanced shards and sends them as JSON-RPC calls to POST /cluster on
+worker nodes: the same server with SCAN_NODE_SECRET set. Nodes that fail or
+time out are rested and their shards sent elsewhere (or scanned locally once
+no node is left); when the queue is empty, idle nodes take a copy of shards
+running far longer than usual and the first copy to finish wins. The
+coordinator merges the shards' findings and runs the repository-wide pass over
+their summaries itself.
+"""
+
+import gzip
+import hmac
+import http.client
+import json
+import logging
+import os
+import socket
+import statistics
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from scanner import cancel, progress
+from scanner.findings import Finding
+
+logger = logging.getLogger(__name__)
+
+# Base URLs of worker nodes, comma separated; setting them makes this server a coordinator
+SCAN_NODES = [url.strip().rstrip("/") for url in os.getenv("SCAN_NODES", "").split(",") if url.strip()]
+# Shared by the coordinator and its workers; a server only accepts shards when it is set
+SCAN_NODE_SECRET = os.getenv("SCAN_NODE_SECRET", "")
+# Scans of fewer files are not worth the round trips
+DISTRIBUTE_THRESHOLD = int(os.getenv("SCAN_DISTRIBUTE_THRESHOLD", 2000))
+# Shards sent to a node at once; should not exceed the node's MAX_CONCURRENT_SCANS
+NODE_CONCURRENCY = int(os.getenv("SCAN_NODE_CONCURRENCY", 2))
+SHARD_TIMEOUT = float(os.getenv("SCAN_SHARD_TIMEOUT", 300))
+# Shards per node: smaller shards balance better, larger ones cost fewer round trips
+SHARDS_PER_NODE = 4
+# Scan cost of a file on top of its size, in bytes
+FILE_COST = 4096
+# Failed sends of a shard before the coordinator scans it itself
+MAX_ATTEMPTS = 3
+# Seconds a node is left out after failing, or after answering "server busy"
+NODE_RETRY_AFTER = 30.0
+BUSY_RETRY_AFTER = 1.0
+# A shard running this many times longer than the median finished one is copied to an idle node
+STRAGGLER_FACTOR = 2.0
+STRAGGLER_MIN = 2.0
+POLL = 0.1
+
+RPC_PATH = "/cluster"
+SCAN_METHOD = "shard/scan"
+
+
+class ShardFailed(Exception):
+    """A node could not scan a shard"""
+
+
+class NodeBusy(ShardFailed):
+    """A node shed the shard with "server busy" """
+
+
+def should_distribute(file_count: int) -> bool:
+    return bool(SCAN_NODES) and bool(SCAN_NODE_SECRET) and file_count >= DISTRIBUTE_THRESHOLD
+
+
+def authorized(authorization: Optional[str]) -> bool:
+    """Whether a shard request carries this cluster's secret"""
+    if not SCAN_NODE_SECRET or not authorization:
+        return False
+    scheme, _, secret = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(secret.encode("utf-8"), SCAN_NODE_SECRET.encode("utf-8"))
+
+
+@dataclass
+class Shard:
+    index: int
+    entries: List[Tuple[str, str]]
+    cost: int
+    attempts: int = 0
+    copies: int = 0
+    result: Optional[Tuple[List[Finding], int, Dict[str, list], List[dict]]] = None
+
+
+@dataclass
+class Node:
+    url: str
+    in_flight: int = 0
+    failed: bool = False
+    rest_until: float = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.in_flight < NODE_CONCURRENCY and now >= self.rest_until
+
+    def down(self, now: float) -> bool:
+        return self.failed and now < self.rest_until
+
+
+def make_shards(entries: List[Tuple[str, str]], sizes: List[int], count: int) -> List[Shard]:
+    """Split entries into count shards of about equal cost, largest files placed first; most costly shard first"""
+    count = max(1, min(count, len(entries)))
+    buckets: List[List[Tuple[str, str]]] = [[] for _ in range(count)]
+    costs = [0] * count
+    heap = [(0, index) for index in range(count)]
+    for size, entry in sorted(zip(sizes, entries), reverse=True):
+        cost, index = heappop(heap)
+        buckets[index].append(entry)
+        costs[index] = cost + size + FILE_COST
+        heappush(heap, (costs[index], index))
+    shards = [Shard(index, sorted(bucket), costs[index]) for index, bucket in enumerate(buckets) if bucket]
+    return sorted(shards, key=lambda shard: shard.cost, reverse=True)
+
+
+@dataclass
+class _Call:
+    """One shard request to a node; abort() drops the connection, which cancels the scan on the node"""
+    node: Node
+    shard: Shard
+    started: float = field(default_factory=time.monotonic)
+    aborted: bool = False
+    connection: Optional[http.client.HTTPConnection] = None
+
+    def run(self, body: bytes, timeout: float) -> dict:
+        url = urlsplit(self.node.url)
+        connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self.connection = connection_class(url.netloc, timeout=timeout)
+        try:
+            self.connection.request("POST", url.path + RPC_PATH, body=body, headers={
+                "Authorization": f"Bearer {SCAN_NODE_SECRET}",
+                "Content-Type": "application/json",
+                "Accept-Encoding": "gzip",
+                # The node stops scanning when the coordinator's request would have timed out
+                "X-Request-Timeout": str(max(1, int(timeout))),
+            })
+            response = self.connection.getresponse()
+            data = response.read()
+        finally:
+            self.connection.close()
+        if response.status == 503:
+            raise NodeBusy("Server busy")
+        if response.getheader("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        try:
+            message = json.loads(data)
+        except ValueError:
+            raise ShardFailed(f"HTTP {response.status}")
+        if not isinstance(message, dict) or "result" not in message:
+            error = message.get("error") if isinstance(message, dict) else None
+            raise ShardFailed(error.get("message", f"HTTP {response.status}") if isinstance(error, dict) else f"HTTP {response.status}")
+        return message["result"]
+
+    def abort(self):
+        self.aborted = True
+        connection = self.connection
+        if connection is not None and connection.sock is not None:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def _request(repository_url: str, commit: Optional[str], scan_type: str, shard: Shard) -> bytes:
+    return json.dumps({
+        "jsonrpc": "2.0",
+        "id": shard.index,
+        "method": SCAN_METHOD,
+        "params": {
+            "repository_url": repository_url,
+            "commit": commit,
+            "scan_type": scan_type,
+            "entries": shard.entries,
+        },
+    }, separators=(",", ":")).encode("utf-8")
+
+
+def _decode(result: dict) -> Tuple[List[Finding], int, Dict[str, list], List[dict]]:
+    try:
+        findings = [Finding(**finding) for finding in result["findings"]]
+        return findings, int(result["files_scanned"]), dict(result["summaries"]), list(result.get("skipped", []))
+    except (KeyError, TypeError, ValueError) as e:
+        raise ShardFailed(f"Malformed shard result: {e}")
+
+
+def _next_shard(queue: Deque[Shard], calls: Dict[Future, _Call], node: Node, durations: List[float],
+                now: float) -> Optional[Shard]:
+    """The next queued shard, else a copy of the slowest straggler running on another node"""
+    while queue:
+        shard = queue.popleft()
+        if shard.result is None:
+            return shard
+    if not durations:
+        return None
+    threshold = max(STRAGGLER_MIN, STRAGGLER_FACTOR * statistics.median(durations))
+    stragglers = [call for call in calls.values()
+                  if call.shard.result is None and call.shard.copies < 2 and call.node is not node
+                  and now - call.started > threshold]
+    if not stragglers:
+        return None
+    straggler = min(stragglers, key=lambda call: call.started)
+    logger.info(f"Copying shard {straggler.shard.index} from {straggler.node.url} to {node.url} "
+                f"after {now - straggler.started:.1f}s")
+    return straggler.shard
+
+
+def scan_sharded(repository_url: str, source, entries: List[Tuple[str, str]],
+                 scan_type: str) -> Tuple[List[Finding], int, Dict[str, list], List[dict]]:
+    """Scan entries across the worker nodes; returns (findings, files scanned, summaries, skipped files) like a local scan"""
+    from scanner.engine import scan_entries
+
+    nodes = [Node(url) for url in SCAN_NODES]
+    shards = make_shards(entries, source.sizes(entries), len(nodes) * SHARDS_PER_NODE)
+    commit = getattr(source, "commit", None)
+    logger.info(f"Sharding {len(entries)} files of {repository_url} into {len(shards)} shards over {len(nodes)} nodes")
+
+    queue: Deque[Shard] = deque(shards)
+    calls: Dict[Future, _Call] = {}
+    durations: List[float] = []
+    finished = files_done = findings_found = 0
+    executor = ThreadPoolExecutor(max_workers=len(nodes) * NODE_CONCURRENCY, thread_name_prefix="shard")
+
+    def complete(shard: Shard, result):
+        nonlocal finished, files_done, findings_found
+        shard.result = result
+        finished += 1
+        files_done += len(shard.entries)
+        findings_found += len(result[0])
+
+    def scan_locally(shard: Shard):
+        logger.warning(f"Scanning shard {shard.index} ({len(shard.entries)} files) on the coordinator")
+        with progress.activate(None):
+            complete(shard, scan_entries(source, shard.entries, scan_type))
+
+    try:
+        while finished < len(shards):
+            cancel.check()
+            now = time.monotonic()
+            for node in nodes:
+                while node.available(now):
+                    shard = _next_shard(queue, calls, node, durations, now)
+                    if shard is None:
+                        break
+                    call = _Call(node, shard)
+                    node.in_flight += 1
+                    shard.copies += 1
+                    body = _request(repository_url, commit, scan_type, shard)
+                    calls[executor.submit(call.run, body, cancel.timeout(SHARD_TIMEOUT))] = call
+
+            if not calls:
+                if queue and all(node.down(now) for node in nodes):
+                    scan_locally(queue.popleft())
+                else:
+                    time.sleep(POLL)  # Every node is resting after "server busy"
+                continue
+
+            done, _ = wait(calls, timeout=POLL, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in done:
+                call = calls.pop(future)
+                node, shard = call.node, call.shard
+                node.in_flight -= 1
+                shard.copies -= 1
+                try:
+                    result = _decode(future.result())
+                except NodeBusy:
+                    node.rest_until = now + BUSY_RETRY_AFTER
+                except (ShardFailed, OSError, http.client.HTTPException) as e:
+                    if not call.aborted:
+                        logger.warning(f"Shard {shard.index} failed on {node.url}: {e}")
+                        node.failed = True
+                        node.rest_until = now + NODE_RETRY_AFTER
+                        shard.attempts += 1
+                else:
+                    node.failed = False
+                    if shard.result is None:
+                        durations.append(now - call.started)
+                        complete(shard, result)
+                        for other in calls.values():
+                            if other.shard is shard:
+                                other.abort()
+                    continue
+
+                if shard.result is None and shard.copies == 0 and shard not in queue:
+                    if shard.attempts >= MAX_ATTEMPTS:
+                        scan_locally(shard)
+                    else:
+                        queue.appendleft(shard)
+            progress.report(files_done, len(entries), findings_found)
+    finally:
+        for call in calls.values():
+            call.abort()
+        executor.shutdown(wait=False)
+
+    # Merge as a local scan would: findings in path order, each file's in detector order
+    findings: List[Finding] = []
+    scanned = 0
+    summaries: Dict[str, list] = {}
+    skipped: List[dict] = []
+    for shard in sorted(shards, key=lambda shard: shard.index):
+        shard_findings, shard_scanned, shard_summaries, shard_skipped = shard.result
+        findings.extend(shard_findings)
+        scanned += shard_scanned
+        skipped.extend(shard_skipped)
+        for name, items in shard_summaries.items():
+            summaries.setdefault(name, []).extend(items)
+    findings.sort(key=lambda finding: finding.file)
+    for items in summaries.values():
+        items.sort(key=lambda summary: summary.get("path", "") if isinstance(summary, dict) else "")
+    skipped.sort(key=lambda entry: entry.get("file", ""))
+    return findings, scanned, summaries, skipped
+
+
+def _shard_source(repository_url: str, commit: Optional[str]):
+    from scanner.git_source import GitSource, ensure_mirror
+    from scanner.source import resolve_source
+
+    try:
+        return resolve_source(repository_url, commit)
+    except ValueError:
+        if commit is None or urlsplit(repository_url).scheme not in ("http", "https"):
+            raise
+        # The coordinator fetched a commit this node's mirror has not seen yet
+        return GitSource.at(ensure_mirror(repository_url, max_age=0), commit)
+
+
+def scan_shard(params: dict) -> dict:
+    """Worker side: scan one shard of a coordinator's scan, without the repository-wide pass"""
+    from scanner.engine import scan_entries
+
+    if not isinstance(params, dict):
+        raise ValueError("Invalid params")
+    repository_url = params.get("repository_url")
+    commit = params.get("commit")
+    scan_type = params.get("scan_type", "quick")
+    entries = params.get("entries")
+    if not isinstance(repository_url, str) or not isinstance(entries, list) or not (commit is None or isinstance(commit, str)):
+        raise ValueError("repository_url and entries are required")
+    pairs = []
+    for entry in entries:
+        if (not isinstance(entry, list) or len(entry) != 2 or not all(isinstance(item, str) for item in entry)
+                or entry[1].startswith("/") or ".." in entry[1].split("/")):
+            raise ValueError(f"Invalid entry: {entry!r}")
+        pairs.append((entry[0], entry[1]))
+
+    source = _shard_source(repository_url, commit)
+    findings, scanned, summaries, skipped = scan_entries(source, pairs, scan_type)
+    return {
+        "findings": [finding.to_dict() for finding in findings],
+        "files_scanned": scanned,
+        "summaries": summaries,
+        "skipped": skipped,
+    }
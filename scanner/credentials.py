@@ -0,0 +1,155 @@
+"""
+Hardcoded credential detection
+Provider-specific key patterns plus Shannon entropy scoring of candidate tokens.
+Entropy is computed for all of a file's candidates at once from NumPy byte
+histograms instead of a per-character Python loop.
+"""
+
+import re
+from typing import List, Sequence, Set, Tuple
+
+import numpy as np
+
+from scanner.findings import Finding
+from scanner.rules import SCAN_TIERS
+from scanner.text import line_of, line_starts
+
+# (rule id, description, severity, pattern); the whole match is the key material
+PROVIDER_PATTERNS = [
+    ("SECRET-AWS-ACCESS-KEY", "AWS access key ID", "Critical", r"\b(?:AKIA|ASIA)[0-9A-Z]{16}\b"),
+    ("SECRET-GITHUB-TOKEN", "GitHub token", "Critical", r"\b(?:gh[pousr]_[A-Za-z0-9]{36,255}|github_pat_[A-Za-z0-9_]{60,255})\b"),
+    ("SECRET-SLACK-TOKEN", "Slack token", "High", r"\bxox[abposr]-[A-Za-z0-9-]{10,250}"),
+    ("SECRET-GOOGLE-API-KEY", "Google API key", "High", r"\bAIza[0-9A-Za-z_\-]{35}\b"),
+    ("SECRET-STRIPE-KEY", "Stripe secret key", "Critical", r"\b(?:sk|rk)_live_[0-9a-zA-Z]{24,99}\b"),
+    ("SECRET-OPENAI-KEY", "OpenAI API key", "High", r"\bsk-(?:proj-)?[A-Za-z0-9_\-]{32,}\b"),
+    ("SECRET-PRIVATE-KEY", "Private key", "Critical", r"-----BEGIN (?:RSA |EC |DSA |OPENSSH |PGP |ENCRYPTED )?PRIVATE KEY(?: BLOCK)?-----"),
+    ("SECRET-JWT", "JSON Web Token", "Medium", r"\beyJ[A-Za-z0-9_-]{10,}\.eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}"),
+]
+_PROVIDERS = [(rule_id, desc, severity, re.compile(pattern)) for rule_id, desc, severity, pattern in PROVIDER_PATTERNS]
+
+# password = "...", API_KEY: '...', "client_secret": "..."
+_ASSIGNMENT = re.compile(
+    r"""(?i)["']?(?P<name>[\w.-]*(?:passw(?:or)?d|passwd|pwd|secret|api[_-]?key|access[_-]?key|auth[_-]?token|token|credential)[\w.-]*)["']?"""
+    r"""\s*(?::=|=>|[:=])\s*["'](?P<secret>[^"'\s]{8,200})["']"""
+)
+# Any long quoted token made of base64/hex/url-safe characters
+_QUOTED_TOKEN = re.compile(r"""["'](?P<secret>[A-Za-z0-9+/_\-=.]{20,200})["']""")
+
+# Entropy thresholds in bits per character
+ASSIGNMENT_THRESHOLD = 2.5
+HEX_THRESHOLD = 3.0
+TOKEN_THRESHOLD = 4.3
+
+# Lockfiles and checksums are full of high-entropy strings by design
+SKIP_FILES = ("package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "Pipfile.lock",
+              "Cargo.lock", "go.sum", "composer.lock", "Gemfile.lock")
+# token_type = "bearer", password_field = "pwd" ...
+NON_SECRET_SUFFIXES = ("_type", "_name", "_field", "_key_name", "_url", "_uri", "_path", "_file", "_id", "_header", "_prefix")
+_WORDS = re.compile(r"^[a-z]+(?:[_\-.][a-z]+)*$")
+PLACEHOLDERS = ("example", "changeme", "placeholder", "your_", "your-", "xxxx", "dummy", "${", "{{", "<")
+
+# Tokens scored per histogram matrix (4096 x 256 counts)
+ENTROPY_BATCH = 4096
+
+_HEX_TABLE = np.zeros(256, dtype=bool)
+_HEX_TABLE[np.frombuffer(b"0123456789abcdefABCDEF", dtype=np.uint8)] = True
+
+
+def shannon_entropy(tokens: Sequence[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """Entropy (bits/char) and an all-hex flag for every token, vectorized per batch"""
+    if len(tokens) > ENTROPY_BATCH:
+        parts = [_entropy_batch(tokens[i:i + ENTROPY_BATCH]) for i in range(0, len(tokens), ENTROPY_BATCH)]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+    return _entropy_batch(tokens)
+
+
+def _entropy_batch(tokens: Sequence[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    count = len(tokens)
+    if count == 0:
+        return np.zeros(0), np.zeros(0, dtype=bool)
+    lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=count)
+    flat = np.frombuffer(b"".join(tokens), dtype=np.uint8)
+    rows = np.repeat(np.arange(count, dtype=np.int64), lengths)
+
+    # One 256-bin histogram per token, built with a single bincount
+    histograms = np.bincount(rows * 256 + flat, minlength=count * 256).reshape(count, 256)
+    probabilities = histograms / lengths[:, None]
+    logs = np.zeros_like(probabilities)
+    np.log2(probabilities, out=logs, where=probabilities > 0)
+    entropy = -(probabilities * logs).sum(axis=1) + 0.0
+
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    is_hex = np.logical_and.reduceat(_HEX_TABLE[flat], offsets)
+    return entropy, is_hex
+
+
+def redact(secret: str) -> str:
+    return secret[:4] + "*" * min(len(secret) - 4, 16) if len(secret) > 4 else "****"
+
+
+class SecretDetector:
+    """Reports hardcoded credentials; entropy-only candidates need a deep scan"""
+    name = "secrets"
+
+    def scan(self, path: str, text: str, scan_type: str) -> List[Finding]:
+        if path.rsplit("/", 1)[-1] in SKIP_FILES:
+            return []
+
+        findings = []
+        starts = None
+        covered: Set[Tuple[int, int]] = set()
+
+        def report(rule_id, kind, severity, description, start, end):
+            nonlocal starts
+            if starts is None:
+                starts = line_starts(text)
+            line = line_of(starts, start)
+            line_end = text.find("\n", start)
+            source = text[starts[line - 1]:len(text) if line_end == -1 else line_end]
+            secret = text[start:end]
+            findings.append(Finding(
+                rule_id=rule_id,
+                type=kind,
+                severity=severity,
+                file=path,
+                line=line,
+                description=description,
+                snippet=source.replace(secret, redact(secret)).strip()[:200],
+            ))
+            covered.add((start, end))
+
+        for rule_id, description, severity, regex in _PROVIDERS:
+            for match in regex.finditer(text):
+                report(rule_id, "Hardcoded Credentials", severity, f"{description} committed to source",
+                       match.start(), match.end())
+
+        # Gather every entropy candidate first, then score them in one batch
+        candidates = []
+        for match in _ASSIGNMENT.finditer(text):
+            if match.group("name").lower().endswith(NON_SECRET_SUFFIXES) or _WORDS.match(match.group("secret")):
+                continue
+            candidates.append((match.start("secret"), match.end("secret"), True))
+        if SCAN_TIERS.get(scan_type, 0) >= SCAN_TIERS["deep"]:
+            for match in _QUOTED_TOKEN.finditer(text):
+                candidates.append((match.start("secret"), match.end("secret"), False))
+        candidates = [
+            (start, end, named) for start, end, named in candidates
+            if not any(s <= start and end <= e for s, e in covered)
+            and not any(p in text[start:end].lower() for p in PLACEHOLDERS)
+        ]
+        if not candidates:
+            return findings
+
+        entropy, is_hex = shannon_entropy([text[start:end].encode("utf-8") for start, end, _ in candidates])
+        seen = set()
+        for (start, end, named), score, hex_only in zip(candidates, entropy, is_hex):
+            if (start, end) in seen:
+                continue
+            seen.add((start, end))
+            if named and score >= ASSIGNMENT_THRESHOLD:
+                report("SECRET-HARDCODED-CREDENTIAL", "Hardcoded Credentials", "High",
+                       f"Credential assigned in source (entropy {score:.2f} bits/char)", start, end)
+            elif not named and score >= (HEX_THRESHOLD if hex_only else TOKEN_THRESHOLD):
+                report("SECRET-HIGH-ENTROPY", "Hardcoded Credentials", "Medium",
+                       f"High-entropy string may be a secret (entropy {score:.2f} bits/char)", start, end)
+        return findings
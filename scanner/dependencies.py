@@ -0,0 +1,440 @@
+"""
+Vulnerable dependency detection against a local advisory index
+An OSV export on disk is compiled once into a compact binary index:
+
+    header | package table (sorted) | interval table | advisory table | string blob
+
+Versions are encoded as fixed-width byte keys whose byte order is version order,
+so every affected range becomes a [lo, hi) pair of keys. Lookups binary-search
+the package table and the package's intervals (sorted by lo, with a running max
+of hi) straight out of a memory map, with no network and no JSON parsing.
+
+Build the index with:
+    python -m scanner.advisories build <osv-export-dir> [index-path]
+"""
+
+import bisect
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+import tomllib
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from scanner.findings import Finding
+from scanner.text import line_of, line_starts
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.getenv("ADVISORY_INDEX", os.path.join(tempfile.gettempdir(), "vulngpt-advisories.idx"))
+
+INDEX_MAGIC = b"VGAI"
+INDEX_VERSION = 1
+# magic, format version, key size, packages, intervals, advisories, section offsets
+_HEADER = struct.Struct("<4sHHIII4Q")
+# key offset, key length, first interval, interval count
+_PACKAGE = struct.Struct("<IHII")
+KEY_SIZE = 22
+# lo key, hi key, running max hi key, advisory index, fixed version offset, fixed version length
+_INTERVAL = struct.Struct(f"<{KEY_SIZE}s{KEY_SIZE}s{KEY_SIZE}sIIH")
+# id offset, id length, summary offset, summary length, severity
+_ADVISORY = struct.Struct("<IHIHB")
+
+SEVERITY_CODES = ["Low", "Medium", "High", "Critical"]
+OSV_SEVERITIES = {"LOW": 0, "MODERATE": 1, "MEDIUM": 1, "HIGH": 2, "CRITICAL": 3}
+
+_VERSION = re.compile(
+    r"^\s*v?(\d+(?:\.\d+)*)(?:[-_.]?(dev|alpha|a|beta|b|rc|c|preview|pre|post|rev|r)[-_.]?(\d*))?",
+    re.IGNORECASE,
+)
+_PRE_RANKS = {"dev": 0, "alpha": 1, "a": 1, "beta": 2, "b": 2, "rc": 3, "c": 3, "pre": 3, "preview": 3,
+              None: 4, "post": 5, "rev": 5, "r": 5}
+MIN_KEY = b"\x00" * KEY_SIZE
+MAX_KEY = b"\xff" * KEY_SIZE
+
+
+def version_key(version: str, inclusive: bool = False) -> Optional[bytes]:
+    """
+    Byte key ordered like the version: four numeric components, pre/post-release
+    rank and number. An inclusive upper bound gets a trailing 1 so it sorts just
+    above the same version used as a query.
+    """
+    match = _VERSION.match(version)
+    if match is None:
+        return None
+    numbers = [min(int(part), 0xFFFFFFFF) for part in match.group(1).split(".")[:4]]
+    numbers += [0] * (4 - len(numbers))
+    tag = match.group(2).lower() if match.group(2) else None
+    number = min(int(match.group(3)), 0xFFFFFFFF) if match.group(3) else 0
+    return struct.pack(">IIIIBIB", *numbers, _PRE_RANKS[tag], number, 1 if inclusive else 0)
+
+
+def normalize_name(ecosystem: str, name: str) -> str:
+    if ecosystem == "PyPI":
+        return re.sub(r"[-_.]+", "-", name).lower()
+    return name.lower()
+
+
+# Index building
+
+def _iter_osv(directory: str) -> Iterator[dict]:
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.endswith(".json"):
+                try:
+                    with open(os.path.join(dirpath, filename), "r", encoding="utf-8") as f:
+                        yield json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping advisory {filename}: {e}")
+
+
+def _osv_intervals(affected: dict) -> Iterator[Tuple[bytes, bytes, str]]:
+    """(lo, hi, fixed version) for every affected range of one package"""
+    for affected_range in affected.get("ranges", []):
+        if affected_range.get("type") not in ("ECOSYSTEM", "SEMVER"):
+            continue
+        lo = None
+        for event in affected_range.get("events", []):
+            if "introduced" in event:
+                lo = MIN_KEY if event["introduced"] == "0" else version_key(event["introduced"])
+            elif lo is not None and "fixed" in event:
+                hi = version_key(event["fixed"])
+                if hi is not None:
+                    yield lo, hi, event["fixed"]
+                lo = None
+            elif lo is not None and "last_affected" in event:
+                hi = version_key(event["last_affected"], inclusive=True)
+                if hi is not None:
+                    yield lo, hi, ""
+                lo = None
+        if lo is not None:
+            yield lo, MAX_KEY, ""
+    for version in affected.get("versions", []) if not affected.get("ranges") else []:
+        key = version_key(version)
+        if key is not None:
+            yield key, version_key(version, inclusive=True), ""
+
+
+def _osv_severity(record: dict) -> int:
+    severity = (record.get("database_specific") or {}).get("severity", "")
+    return OSV_SEVERITIES.get(str(severity).upper(), 1)
+
+
+def build_index(osv_directory: str, index_path: str = INDEX_PATH) -> int:
+    """Compile an OSV export into the binary index, returns the number of advisories"""
+    strings = bytearray()
+    string_offsets: Dict[str, int] = {}
+
+    def intern(value: str) -> Tuple[int, int]:
+        data = value.encode("utf-8")[:0xFFFF]
+        if value not in string_offsets:
+            string_offsets[value] = len(strings)
+            strings.extend(data)
+        return string_offsets[value], len(data)
+
+    advisories = []
+    packages: Dict[str, List[Tuple[bytes, bytes, int, str]]] = {}
+    for record in _iter_osv(osv_directory):
+        advisory_index = None
+        for affected in record.get("affected", []):
+            package = affected.get("package") or {}
+            if not package.get("name") or not package.get("ecosystem"):
+                continue
+            ecosystem = package["ecosystem"].split(":")[0]
+            key = f"{ecosystem}\0{normalize_name(ecosystem, package['name'])}"
+            for lo, hi, fixed in _osv_intervals(affected):
+                if advisory_index is None:
+                    advisory_index = len(advisories)
+                    advisories.append((record.get("id", "UNKNOWN"), record.get("summary") or record.get("details", "")[:200], _osv_severity(record)))
+                packages.setdefault(key, []).append((lo, hi, advisory_index, fixed))
+
+    package_table = bytearray()
+    interval_table = bytearray()
+    interval_count = 0
+    for key in sorted(packages, key=lambda k: k.encode("utf-8")):
+        intervals = sorted(packages[key])
+        key_offset, key_length = intern(key)
+        package_table += _PACKAGE.pack(key_offset, key_length, interval_count, len(intervals))
+        running_max = MIN_KEY
+        for lo, hi, advisory_index, fixed in intervals:
+            running_max = max(running_max, hi)
+            fixed_offset, fixed_length = intern(fixed)
+            interval_table += _INTERVAL.pack(lo, hi, running_max, advisory_index, fixed_offset, fixed_length)
+        interval_count += len(intervals)
+
+    advisory_table = bytearray()
+    for advisory_id, summary, severity in advisories:
+        id_offset, id_length = intern(advisory_id)
+        summary_offset, summary_length = intern(summary)
+        advisory_table += _ADVISORY.pack(id_offset, id_length, summary_offset, summary_length, severity)
+
+    packages_at = _HEADER.size
+    intervals_at = packages_at + len(package_table)
+    advisories_at = intervals_at + len(interval_table)
+    strings_at = advisories_at + len(advisory_table)
+    header = _HEADER.pack(INDEX_MAGIC, INDEX_VERSION, KEY_SIZE, len(packages), interval_count, len(advisories),
+                          packages_at, intervals_at, advisories_at, strings_at)
+
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_path)))
+    with os.fdopen(fd, "wb") as f:
+        f.write(header + package_table + interval_table + advisory_table + strings)
+    os.replace(tmp, index_path)
+    logger.info(f"Indexed {len(advisories)} advisories for {len(packages)} packages into {index_path}")
+    return len(advisories)
+
+
+# Index lookups
+
+class AdvisoryIndex:
+    """Memory-mapped advisory index"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, key_size, self.package_count, self.interval_count, self.advisory_count,
+         self._packages_at, self._intervals_at, self._advisories_at, self._strings_at) = _HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or key_size != KEY_SIZE:
+            raise ValueError(f"Incompatible advisory index: {path}")
+        self.path = path
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_at + offset
+        return self._map[start:start + length].decode("utf-8")
+
+    def _package_key(self, index: int) -> bytes:
+        offset, length, _, _ = _PACKAGE.unpack_from(self._map, self._packages_at + index * _PACKAGE.size)
+        start = self._strings_at + offset
+        return self._map[start:start + length]
+
+    def _find_package(self, key: bytes) -> Optional[Tuple[int, int]]:
+        lo = bisect.bisect_left(range(self.package_count), key, key=self._package_key)
+        if lo < self.package_count and self._package_key(lo) == key:
+            _, _, first, count = _PACKAGE.unpack_from(self._map, self._packages_at + lo * _PACKAGE.size)
+            return first, count
+        return None
+
+    def _interval(self, index: int):
+        return _INTERVAL.unpack_from(self._map, self._intervals_at + index * _INTERVAL.size)
+
+    def match(self, ecosystem: str, name: str, version: str) -> List[dict]:
+        """Advisories affecting one package version"""
+        query = version_key(version)
+        found = self._find_package(f"{ecosystem}\0{normalize_name(ecosystem, name)}".encode("utf-8"))
+        if query is None or found is None:
+            return []
+        first, count = found
+
+        # Last interval starting at or below the version ...
+        base = self._intervals_at + first * _INTERVAL.size
+        position = bisect.bisect_right(
+            range(count), query,
+            key=lambda i: self._map[base + i * _INTERVAL.size:base + i * _INTERVAL.size + KEY_SIZE],
+        ) - 1
+        matches, seen = [], set()
+        # ... then walk back while some earlier interval could still extend past it
+        while position >= 0:
+            lo, hi, running_max, advisory_index, fixed_offset, fixed_length = self._interval(first + position)
+            if running_max <= query:
+                break
+            if lo <= query < hi and advisory_index not in seen:
+                seen.add(advisory_index)
+                id_offset, id_length, summary_offset, summary_length, severity = _ADVISORY.unpack_from(
+                    self._map, self._advisories_at + advisory_index * _ADVISORY.size)
+                matches.append({
+                    "id": self._string(id_offset, id_length),
+                    "summary": self._string(summary_offset, summary_length),
+                    "severity": SEVERITY_CODES[severity],
+                    "fixed": self._string(fixed_offset, fixed_length),
+                })
+            position -= 1
+        return matches
+
+
+_index: Optional[AdvisoryIndex] = None
+_index_missing = False
+
+
+def get_index() -> Optional[AdvisoryIndex]:
+    """The process-wide index, or None when no index has been built"""
+    global _index, _index_missing
+    if _index is None and not _index_missing:
+        try:
+            _index = AdvisoryIndex(INDEX_PATH)
+        except (OSError, ValueError) as e:
+            _index_missing = True
+            logger.warning(f"Dependency scanning disabled, no advisory index at {INDEX_PATH}: {e}")
+    return _index
+
+
+# Manifest parsing
+
+_REQUIREMENT = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(===?|~=|>=|\^|~)?\s*v?([0-9][^\s,;#]*)?")
+
+
+def _exact(match: Optional[re.Match]) -> Optional[str]:
+    """Version of a requirement pinned to exactly one version (no operator or ==), None for ranges"""
+    if match is None or match.group(2) not in (None, "==", "===") or not match.group(3) or "*" in match.group(3):
+        return None
+    return match.group(3)
+
+
+def _pinned(spec: str) -> Optional[str]:
+    """Version a requirement is pinned to; ranges (^, ~, >=, ~=) are unpinned"""
+    return _exact(_REQUIREMENT.match(spec))
+
+
+def _pep508(spec: str) -> Optional[Tuple[str, str]]:
+    """(name, version) of a requirement pinned with == or ===; other specifiers do not name one version"""
+    match = _REQUIREMENT.match(spec)
+    if match is None or match.group(2) not in ("==", "==="):
+        return None
+    version = _exact(match)
+    return (match.group(1), version) if version else None
+
+
+def parse_requirements(text: str) -> Iterator[Tuple[str, str, str]]:
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line or line.startswith("-"):
+            continue
+        parsed = _pep508(line)
+        if parsed:
+            yield "PyPI", parsed[0], parsed[1]
+
+
+def parse_pyproject(text: str) -> Iterator[Tuple[str, str, str]]:
+    data = tomllib.loads(text)
+    project = data.get("project", {})
+    specs = list(project.get("dependencies", []))
+    for group in project.get("optional-dependencies", {}).values():
+        specs.extend(group)
+    for spec in specs:
+        parsed = _pep508(spec)
+        if parsed:
+            yield "PyPI", parsed[0], parsed[1]
+    poetry = data.get("tool", {}).get("poetry", {})
+    for section in ("dependencies", "dev-dependencies"):
+        for name, spec in poetry.get(section, {}).items():
+            version = spec.get("version") if isinstance(spec, dict) else spec
+            if name != "python" and isinstance(version, str):
+                pinned = _pinned(f"{name}{version if version[:1] in '=^~>' else '==' + version}")
+                if pinned:
+                    yield "PyPI", name, pinned
+
+
+def parse_package_json(text: str) -> Iterator[Tuple[str, str, str]]:
+    data = json.loads(text)
+    for section in ("dependencies", "devDependencies", "optionalDependencies"):
+        for name, spec in (data.get(section) or {}).items():
+            if isinstance(spec, str):
+                # A placeholder name, separated so the version is not read as part of it
+                pinned = _pinned(f"x {spec.strip().lstrip('=')}") if spec[:1].isdigit() or spec[:1] in "=v" else None
+                if pinned:
+                    yield "npm", name, pinned
+
+
+def parse_package_lock(text: str) -> Iterator[Tuple[str, str, str]]:
+    data = json.loads(text)
+    for path, info in (data.get("packages") or {}).items():
+        if path and "version" in info:
+            yield "npm", path.rpartition("node_modules/")[2], info["version"]
+    if not data.get("packages"):
+        for name, info in (data.get("dependencies") or {}).items():
+            if "version" in info:
+                yield "npm", name, info["version"]
+
+
+def parse_poetry_lock(text: str) -> Iterator[Tuple[str, str, str]]:
+    for package in tomllib.loads(text).get("package", []):
+        if "name" in package and "version" in package:
+            yield "PyPI", package["name"], package["version"]
+
+
+def parse_pipfile_lock(text: str) -> Iterator[Tuple[str, str, str]]:
+    data = json.loads(text)
+    for section in ("default", "develop"):
+        for name, info in (data.get(section) or {}).items():
+            version = info.get("version", "")
+            if version.startswith("=="):
+                yield "PyPI", name, version[2:]
+
+
+MANIFESTS = {
+    "requirements.txt": parse_requirements,
+    "pyproject.toml": parse_pyproject,
+    "package.json": parse_package_json,
+    "package-lock.json": parse_package_lock,
+    "poetry.lock": parse_poetry_lock,
+    "Pipfile.lock": parse_pipfile_lock,
+}
+
+
+def parser_for(path: str):
+    filename = path.rsplit("/", 1)[-1]
+    if filename in MANIFESTS:
+        return MANIFESTS[filename]
+    if filename.startswith("requirements") and filename.endswith(".txt"):
+        return parse_requirements
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _declaration(name: str) -> re.Pattern:
+    """
+    A PyPI requirement name at the start of a line: a requirements line, a quoted
+    pyproject entry, a poetry table key or a lock file's name = "..." / "name": entry.
+    Names compare normalised (case, and -, _ and . alike), and must end where the name does
+    """
+    name_pattern = "[-_.]+".join(re.escape(part) for part in re.split(r"[-_.]+", name))
+    return re.compile(rf"""^[ \t"']*(?:name\s*=\s*["'])?{name_pattern}(?![A-Za-z0-9._-])""", re.MULTILINE | re.IGNORECASE)
+
+
+def _declaration_offset(text: str, ecosystem: str, name: str) -> int:
+    """Offset of the line declaring a dependency, -1 if it cannot be found"""
+    if ecosystem == "npm":
+        return text.find(f'"{name}"')
+    match = _declaration(name).search(text)
+    return match.start() if match else -1
+
+
+class DependencyDetector:
+    """Matches declared and locked dependency versions against the advisory index"""
+    name = "dependencies"
+    languages = frozenset({"manifest"})
+
+    def scan(self, path: str, text: str, scan_type: str) -> List[Finding]:
+        parser = parser_for(path)
+        if parser is None:
+            return []
+        index = get_index()
+        if index is None:
+            return []
+        try:
+            dependencies = list(parser(text))
+        except (ValueError, tomllib.TOMLDecodeError) as e:
+            logger.warning(f"Could not parse {path}: {e}")
+            return []
+
+        findings = []
+        starts = None
+        for ecosystem, name, version in dependencies:
+            for advisory in index.match(ecosystem, name, version):
+                if starts is None:
+                    starts = line_starts(text)
+                offset = _declaration_offset(text, ecosystem, name)
+                fixed = f" (fixed in {advisory['fixed']})" if advisory["fixed"] else ""
+                findings.append(Finding(
+                    rule_id=advisory["id"],
+                    type="Vulnerable Dependency",
+                    severity=advisory["severity"],
+                    file=path,
+                    line=line_of(starts, offset) if offset >= 0 else 1,
+                    description=f"{name} {version}: {advisory['summary']}{fixed}",
+                    snippet=f"{name}=={version}" if ecosystem == "PyPI" else f"{name}@{version}",
+                ))
+        return findings
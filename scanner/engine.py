@@ -0,0 +1,443 @@
+"""
+Scan engine
+Selects a repository's files and runs the detectors for their language in a
+process pool, whose workers enforce the scan resource limits.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+from scanner import cancel, cluster, limits, progress, rules
+from scanner.credentials import SecretDetector
+from scanner.dependencies import DependencyDetector, get_index
+from scanner.findings import SEVERITIES, Finding, assign_fingerprints
+from scanner.git_source import GitSource, changed_paths
+from scanner.paths import PathFilter, detect_language, is_minified
+from scanner.source import MAX_FILE_SIZE, DirectorySource, resolve_source
+from scanner.taint import TaintDetector
+from scanner.text import line_of, line_starts, snippet_at
+
+logger = logging.getLogger(__name__)
+
+SCAN_WORKERS = max(1, int(os.getenv("SCAN_WORKERS", os.cpu_count() or 1)))
+# Below this many files a scan goes to the pool as one batch; more round trips cost more than they save
+SINGLE_BATCH_THRESHOLD = 64
+BATCH_SIZE = 32
+# Seconds between cancellation checks while waiting on pool batches
+CANCEL_POLL = 0.1
+
+
+@dataclass
+class ScanResult:
+    findings: List[Finding] = field(default_factory=list)
+    files_scanned: int = 0
+    commit: Optional[str] = None
+    # Files left out after running past a resource limit
+    skipped: List[dict] = field(default_factory=list)
+    # Time spent by each regex rule, slowest first
+    rule_timings: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class DiffResult:
+    """Findings of the files changed between two commits, compared by fingerprint"""
+    new: List[Finding] = field(default_factory=list)
+    fixed: List[Finding] = field(default_factory=list)
+    unchanged: List[Finding] = field(default_factory=list)
+    files_changed: int = 0
+    files_scanned: int = 0
+    base: Optional[str] = None
+    head: Optional[str] = None
+    skipped: List[dict] = field(default_factory=list)
+
+
+def sort_key(finding: Finding):
+    """Most severe first, then by location"""
+    rank = SEVERITIES.index(finding.severity) if finding.severity in SEVERITIES else len(SEVERITIES)
+    return rank, finding.file, finding.line
+
+
+class RegexDetector:
+    """Runs the compiled rule set over a file"""
+    name = "regex"
+
+    def scan(self, path: str, text: str, scan_type: str) -> List[Finding]:
+        findings = []
+        starts = None
+        timings = rules.current_timings()
+        # Rules sharing a keyword test it once per file
+        present: Dict[str, bool] = {}
+        for compiled in rules.get_ruleset().for_path(scan_type, path):
+            rule = compiled.rule
+            if rule.keyword:
+                if rule.keyword not in present:
+                    present[rule.keyword] = rule.keyword in text
+                if not present[rule.keyword]:
+                    continue
+            started = time.perf_counter() if timings is not None else 0.0
+            before = len(findings)
+            for offset in compiled.find(text):
+                if starts is None:
+                    starts = line_starts(text)
+                line = line_of(starts, offset)
+                findings.append(Finding(
+                    rule_id=rule.id,
+                    type=rule.type,
+                    severity=rule.severity,
+                    file=path,
+                    line=line,
+                    description=rule.message,
+                    snippet=snippet_at(text, starts, line),
+                ))
+            if timings is not None:
+                timing = timings.get(rule.id)
+                if timing is None:
+                    timing = timings[rule.id] = [0.0, 0, 0]
+                timing[0] += time.perf_counter() - started
+                timing[1] += 1
+                timing[2] += len(findings) - before
+        return findings
+
+
+DETECTORS = [RegexDetector(), SecretDetector(), TaintDetector(), DependencyDetector()]
+
+
+def decode_source(data: Optional[bytes]) -> Optional[str]:
+    """Text of a source file, None for missing, binary or oversized files"""
+    if data is None or len(data) > MAX_FILE_SIZE or b"\0" in data[:8192]:
+        return None
+    return data.decode("utf-8", errors="replace")
+
+
+def scan_text(path: str, text: str, scan_type: str, summaries: Optional[Dict[str, list]] = None,
+              language: Optional[str] = None) -> List[Finding]:
+    """
+    Run every detector for the file's language over its contents
+    Detectors with a repository-wide pass also leave a per-file summary in summaries
+    """
+    findings = []
+    for detector in DETECTORS:
+        languages = getattr(detector, "languages", None)
+        if languages is not None and language not in languages:
+            continue
+        try:
+            findings.extend(detector.scan(path, text, scan_type))
+            if summaries is not None and hasattr(detector, "summarize"):
+                summary = detector.summarize(path, text, scan_type)
+                if summary is not None:
+                    summaries.setdefault(detector.name, []).append(summary)
+        except (limits.LimitExceeded, MemoryError):
+            raise
+        except Exception as e:
+            logger.error(f"Detector {detector.name} failed on {path}: {e}")
+    return findings
+
+
+def finalize(summaries: Dict[str, list], scan_type: str) -> List[Finding]:
+    """Repository-wide pass of detectors over the summaries of every file"""
+    findings = []
+    for detector in DETECTORS:
+        if hasattr(detector, "finalize") and summaries.get(detector.name):
+            try:
+                findings.extend(detector.finalize(summaries[detector.name], scan_type))
+            except Exception as e:
+                logger.error(f"Detector {detector.name} failed to finalize: {e}")
+    return findings
+
+
+def _scan_batch(source, entries: List[Tuple[str, str]], scan_type: str):
+    """Scan a batch of files, returns (findings, files scanned, summaries, skipped files)"""
+    findings = []
+    summaries: Dict[str, list] = {}
+    skipped = []
+    scanned = 0
+    with source.open() as read, rules.timing() as timings:
+        for done, (path, key) in enumerate(entries):
+            cancel.check()
+            progress.report(done, len(entries), len(findings))
+            try:
+                text = decode_source(read(key))
+                if text is None:
+                    continue
+                language = detect_language(path, text)
+                if language in ("javascript", "css") and is_minified(text):
+                    continue
+                file_summaries: Dict[str, list] = {}
+                with limits.file():
+                    file_findings = scan_text(path, text, scan_type, file_summaries, language)
+                    assign_fingerprints(file_findings, text)
+            except limits.TaskLimitExceeded:
+                logger.warning(f"Scan task ran out of CPU time at {path}, skipping its last {len(entries) - done} files")
+                skipped.extend(limits.skipped(path, "cpu") for path, _ in entries[done:])
+                break
+            except limits.LimitExceeded as e:
+                logger.warning(f"Skipping {path}: {e}")
+                skipped.append(limits.skipped(path, e.limit))
+                continue
+            scanned += 1
+            findings.extend(file_findings)
+            for name, items in file_summaries.items():
+                summaries.setdefault(name, []).extend(items)
+        if timings:
+            # Travels with the summaries so pool and cluster results carry it unchanged
+            summaries[rules.TIMING_SUMMARY] = [timings]
+    return findings, scanned, summaries, skipped
+
+
+def _pool_task(source, entries: List[Tuple[str, str]], scan_type: str, deadline: Optional[float]):
+    """Pool task: a batch scan under the submitting request's deadline and the task's CPU budget"""
+    # Forked workers inherit whatever context was current at fork time; replace it
+    with cancel.activate(cancel.CancelScope(deadline)), progress.activate(None), limits.task():
+        return _scan_batch(source, entries, scan_type)
+
+
+def _init_worker(artifact: str, file_timeout: float):
+    rules.attach(artifact)
+    limits.install(file_timeout=file_timeout)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool whose workers load rules from the cached rule-set artifact and enforce the scan limits"""
+    global _pool
+    if _pool is None:
+        methods = multiprocessing.get_all_start_methods()
+        options = {}
+        if limits.SCAN_MAX_TASKS_PER_CHILD > 0:
+            # Recycling workers needs a start method other than fork; the fork server
+            # preloads the engine so each new worker still starts warm
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            if "forkserver" in methods:
+                context.set_forkserver_preload(["scanner.engine"])
+            options["max_tasks_per_child"] = limits.SCAN_MAX_TASKS_PER_CHILD
+        else:
+            context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        _pool = ProcessPoolExecutor(
+            max_workers=SCAN_WORKERS,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(rules.ensure_artifact(), limits.SCAN_FILE_TIMEOUT),
+            **options,
+        )
+    return _pool
+
+
+def _replace_pool(broken: ProcessPoolExecutor):
+    """Drop a pool that lost a worker; the next get_pool() starts a new one"""
+    global _pool
+    if _pool is broken:
+        _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def warmup():
+    """Attach to and compile the rule set and map the advisory index; never starts the pool"""
+    rules.attach().warm()
+    get_index()
+
+
+def _isolate(source, entries: List[Tuple[str, str]], scan_type: str, deadline: Optional[float]):
+    """
+    Scan files of batches that took a worker down twice one at a time, so only
+    the file that kills its worker is skipped
+    """
+    findings, summaries, skipped = [], {}, []
+    scanned = 0
+    for path, key in entries:
+        cancel.check()
+        pool = get_pool()
+        try:
+            file_findings, file_scanned, file_summaries, file_skipped = pool.submit(
+                _pool_task, source, [(path, key)], scan_type, deadline).result()
+        except BrokenProcessPool:
+            logger.warning(f"Skipping {path}: its scan worker died")
+            _replace_pool(pool)
+            skipped.append(limits.skipped(path, "worker"))
+            continue
+        findings.extend(file_findings)
+        scanned += file_scanned
+        skipped.extend(file_skipped)
+        for name, items in file_summaries.items():
+            summaries.setdefault(name, []).extend(items)
+    return findings, scanned, summaries, skipped
+
+
+def scan_entries(source, entries: List[Tuple[str, str]], scan_type: str) -> Tuple[List[Finding], int, Dict[str, list], List[dict]]:
+    """
+    Scan entries of a source across the process pool, small sets included, since
+    only pool workers can enforce the per-file and per-task limits; returns
+    (findings, files scanned, summaries, skipped files)
+    A batch whose worker dies is retried on a new pool, then file by file
+    """
+    if not entries:
+        return [], 0, {}, []
+
+    deadline = cancel.deadline()
+    size = BATCH_SIZE if len(entries) >= SINGLE_BATCH_THRESHOLD else len(entries)
+    batches = [entries[i:i + size] for i in range(0, len(entries), size)]
+    results: Dict[int, tuple] = {}
+    attempts = [0] * len(batches)
+    queued = list(range(len(batches)))
+    isolated: List[int] = []
+    files_done = findings_found = 0
+    while queued:
+        pool = get_pool()
+        pending = {pool.submit(_pool_task, source, batches[index], scan_type, deadline): index for index in queued}
+        queued = []
+        try:
+            while pending:
+                # Wake up regularly so a cancelled request stops waiting on (and queueing) batches
+                done, _ = wait(pending, timeout=CANCEL_POLL, return_when=FIRST_COMPLETED)
+                cancel.check()
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        results[index] = future.result()
+                    except BrokenProcessPool:
+                        attempts[index] += 1
+                        (queued if attempts[index] < 2 else isolated).append(index)
+                        continue
+                    findings_found += len(results[index][0])
+                    files_done += len(batches[index])
+                progress.report(files_done, len(entries), findings_found)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        if queued or isolated:
+            logger.warning(f"A scan worker died, retrying {len(queued) + len(isolated)} batches on a new pool")
+            _replace_pool(pool)
+            queued.sort()
+    for index in sorted(isolated):
+        results[index] = _isolate(source, batches[index], scan_type, deadline)
+
+    # Merge in batch order so the repository-wide pass is deterministic
+    findings: List[Finding] = []
+    scanned = 0
+    summaries: Dict[str, list] = {}
+    skipped: List[dict] = []
+    for index in range(len(batches)):
+        batch_findings, batch_scanned, batch_summaries, batch_skipped = results[index]
+        findings.extend(batch_findings)
+        scanned += batch_scanned
+        skipped.extend(batch_skipped)
+        for name, items in batch_summaries.items():
+            summaries.setdefault(name, []).extend(items)
+    return findings, scanned, summaries, skipped
+
+
+def fingerprint_finalized(source, entries: List[Tuple[str, str]], findings: List[Finding], reported: List[Finding]):
+    """
+    Snippets and fingerprints of repository-wide findings, from their files'
+    text as for per-file findings; fingerprints already reported are not reused
+    """
+    keys = dict(entries)
+    by_file: Dict[str, List[Finding]] = {}
+    for finding in findings:
+        by_file.setdefault(finding.file, []).append(finding)
+    taken = {finding.fingerprint for finding in reported}
+    with source.open() as read:
+        for path, file_findings in by_file.items():
+            text = decode_source(read(keys[path])) if path in keys else None
+            if text is not None:
+                lines = text.split("\n")
+                for finding in file_findings:
+                    if not finding.snippet and 0 < finding.line <= len(lines):
+                        finding.snippet = lines[finding.line - 1].strip()[:200]
+            assign_fingerprints(file_findings, text, taken=taken)
+
+
+def scan_source(source, scan_type: str = "quick", path_filter: Optional[PathFilter] = None,
+                repository_url: Optional[str] = None) -> ScanResult:
+    """
+    Scan the selected files of a source (a directory or a git commit)
+    Large scans of a repository URL are sharded across the SCAN_NODES worker nodes
+    """
+    entries = source.entries(path_filter or PathFilter.for_scan(scan_type))
+    result = ScanResult()
+
+    if repository_url is not None and cluster.should_distribute(len(entries)):
+        result.findings, result.files_scanned, summaries, result.skipped = cluster.scan_sharded(repository_url, source, entries, scan_type)
+    else:
+        result.findings, result.files_scanned, summaries, result.skipped = scan_entries(source, entries, scan_type)
+
+    cancel.check()
+    result.rule_timings = rules.merge_timings(summaries.pop(rules.TIMING_SUMMARY, []))
+    slow = [item for item in result.rule_timings if item["seconds"] >= rules.SLOW_RULE_SECONDS]
+    if slow:
+        logger.warning("Slow rules: " + ", ".join(f"{item['rule_id']} {item['seconds']:.2f}s over {item['files']} files"
+                                                  for item in slow))
+    finalized = finalize(summaries, scan_type)
+    if finalized:
+        fingerprint_finalized(source, entries, finalized, result.findings)
+        result.findings.extend(finalized)
+    result.findings.sort(key=sort_key)
+    progress.report(len(entries), len(entries), len(result.findings))
+    return result
+
+
+def scan_path(root: str, scan_type: str = "quick") -> ScanResult:
+    """Scan the files of a local directory"""
+    return scan_source(DirectorySource(root), scan_type)
+
+
+def scan_repository(repository_url: str, scan_type: str = "quick", commit: Optional[str] = None) -> ScanResult:
+    """Scan a repository at a commit (default: HEAD, or the working tree for local checkouts)"""
+    source = resolve_source(repository_url, commit)
+    result = scan_source(source, scan_type, repository_url=repository_url)
+    result.commit = getattr(source, "commit", None)
+    return result
+
+
+def diff_findings(base: List[Finding], head: List[Finding]) -> DiffResult:
+    """Split findings into new, fixed and unchanged by fingerprint"""
+    base_keys = {finding.fingerprint for finding in base}
+    head_keys = {finding.fingerprint for finding in head}
+    return DiffResult(
+        new=[finding for finding in head if finding.fingerprint not in base_keys],
+        fixed=[finding for finding in base if finding.fingerprint not in head_keys],
+        unchanged=[finding for finding in head if finding.fingerprint in base_keys],
+    )
+
+
+def diff_repository(repository_url: str, base_commit: str, head_commit: Optional[str] = None,
+                    scan_type: str = "quick") -> DiffResult:
+    """
+    Findings introduced and fixed between two commits
+    Only files changed between them are scanned at either commit, so the cost
+    follows the size of the change; flows through unchanged modules are not followed
+    """
+    head = resolve_source(repository_url, head_commit or "HEAD")
+    if not isinstance(head, GitSource):
+        raise ValueError(f"Not a git repository: {repository_url}")
+    base = GitSource.at(head.git_dir, base_commit)
+    paths = tuple(changed_paths(head.git_dir, base.commit, head.commit))
+
+    reporter = progress.current()
+    with progress.activate(reporter and reporter.part(0, 2)):
+        base_result = scan_source(replace(base, paths=paths), scan_type)
+    with progress.activate(reporter and reporter.part(1, 2)):
+        head_result = scan_source(replace(head, paths=paths), scan_type)
+    result = diff_findings(base_result.findings, head_result.findings)
+    result.files_changed = len(paths)
+    result.files_scanned = head_result.files_scanned
+    # A file skipped at either commit makes its findings look new or fixed
+    result.skipped = head_result.skipped + [entry for entry in base_result.skipped
+                                            if entry["file"] not in {skipped["file"] for skipped in head_result.skipped}]
+    result.base, result.head = base.commit, head.commit
+    return result
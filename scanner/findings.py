@@ -0,0 +1,79 @@
+"""
+Finding model shared by all detectors
+"""
+
+import hashlib
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Set
+
+
+@dataclass
+class Finding:
+    """A single vulnerability reported by a detector"""
+    rule_id: str
+    type: str
+    severity: str
+    file: str
+    line: int
+    description: str
+    snippet: str = ""
+    fingerprint: str = ""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# Severities in descending order, used for sorting reports
+SEVERITIES = ("Critical", "High", "Medium", "Low")
+
+
+# Non-blank lines hashed on either side of a finding
+FINGERPRINT_CONTEXT = 1
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:32]
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.split())
+
+
+def fingerprint(finding: Finding) -> str:
+    """
+    Fallback identity for findings without file text: rule, file and normalized
+    snippet, or the description (which names the sink) when there is no snippet
+    """
+    if not finding.snippet:
+        return _hash(f"{finding.rule_id}\0{finding.file}\0\0{finding.description}")
+    return _hash(f"{finding.rule_id}\0{finding.file}\0{_normalize(finding.snippet)}")
+
+
+def assign_fingerprints(findings: List[Finding], text: Optional[str], context: int = FINGERPRINT_CONTEXT,
+                        taken: Optional[Set[str]] = None):
+    """
+    Fingerprint one file's findings from their rule, file, normalized line and
+    the normalized non-blank lines around it; line numbers are left out so
+    findings keep their identity when code above them moves. Without the
+    text, the fallback fingerprint is used. Fingerprints in taken, already
+    given to other findings, are not handed out again
+    """
+    lines = [] if text is None else text.split("\n")
+    occurrences: Dict[str, int] = {}
+    for finding in findings:
+        index = finding.line - 1
+        if not 0 <= index < len(lines):
+            key = fingerprint(finding)
+        else:
+            before = [n for n in (_normalize(line) for line in reversed(lines[max(0, index - 4 * context):index])) if n][:context]
+            after = [n for n in (_normalize(line) for line in lines[index + 1:index + 1 + 4 * context]) if n][:context]
+            window = before[::-1] + [_normalize(lines[index])] + after
+            key = _hash(f"{finding.rule_id}\0{finding.file}\0" + "\n".join(window))
+        # Identical code repeated in a file gets one fingerprint per occurrence
+        count = occurrences.get(key, 0)
+        value = key if count == 0 else _hash(f"{key}\0{count}")
+        while taken and value in taken:
+            count += 1
+            value = _hash(f"{key}\0{count}")
+        occurrences[key] = count + 1
+        finding.fingerprint = value
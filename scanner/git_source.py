@@ -0,0 +1,365 @@
+"""
+Reading repositories straight from git objects
+Remote repositories are kept as bare mirrors that are fetched incrementally;
+scans list the tree of one commit and stream blobs through
+'git cat-file --batch' without ever checking files out.
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from scanner import cancel
+from scanner.paths import PathFilter, select_tree
+from scanner.source import MAX_FILE_SIZE, Reader
+
+logger = logging.getLogger(__name__)
+
+MIRROR_DIR = os.getenv("SCAN_MIRROR_DIR", os.path.join(tempfile.gettempdir(), "vulngpt-mirrors"))
+# Skip the fetch when the mirror was refreshed this recently
+FETCH_INTERVAL = int(os.getenv("SCAN_FETCH_INTERVAL", 60))
+GIT_TIMEOUT = int(os.getenv("SCAN_CLONE_TIMEOUT", 300))
+# Hosts remote repositories may be cloned from, comma separated; ".example.com" also
+# allows its subdomains and "*" any host
+ALLOWED_HOSTS = [host.strip().lower() for host in
+                 os.getenv("SCAN_ALLOWED_HOSTS", "github.com,gitlab.com,bitbucket.org").split(",") if host.strip()]
+# Mirrors kept on disk; the least recently used are removed beyond either limit
+MIRROR_MAX_COUNT = int(os.getenv("SCAN_MIRROR_MAX_COUNT", 100))
+MIRROR_MAX_BYTES = int(os.getenv("SCAN_MIRROR_MAX_MB", 10240)) * 1024 * 1024
+# Disk space a clone must leave free in MIRROR_DIR
+MIRROR_MIN_FREE_BYTES = int(os.getenv("SCAN_MIRROR_MIN_FREE_MB", 1024)) * 1024 * 1024
+# Seconds between size checks of a running clone
+CLONE_POLL = 0.5
+# Mirrors used this recently are never evicted, a scan may still be reading them
+EVICT_GRACE = GIT_TIMEOUT
+# Longer path lists are filtered from a full tree listing instead of passed to git
+PATHSPEC_LIMIT = 1000
+_REF = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_./~^@{}-]*$")
+
+GIT_ENV = {**os.environ, "GIT_TERMINAL_PROMPT": "0", "GIT_ASKPASS": "true", "GIT_ALLOW_PROTOCOL": "https"}
+# A redirect could point an allowed host's URL at any other host
+REMOTE_CONFIG = ("-c", "http.followRedirects=false")
+
+
+def check_remote_url(repository_url: str):
+    """Raise ValueError unless the URL is https on an allowed host and the default port"""
+    parsed = urlparse(repository_url)
+    try:
+        port = parsed.port
+    except ValueError:
+        port = -1
+    host = (parsed.hostname or "").lower()
+    if parsed.scheme != "https" or not host or port not in (None, 443):
+        raise ValueError(f"Unsupported repository URL: {repository_url}")
+    if "*" not in ALLOWED_HOSTS and not any(
+            host == allowed or (allowed.startswith(".") and host.endswith(allowed)) for allowed in ALLOWED_HOSTS):
+        raise ValueError(f"Repository host not allowed: {host}")
+
+
+def git(git_dir: str, *args: str, timeout: int = GIT_TIMEOUT, input: Optional[bytes] = None) -> bytes:
+    """Run a git command against a repository, raising ValueError on failure"""
+    try:
+        result = subprocess.run(
+            ["git", f"--git-dir={git_dir}", *args],
+            input=input, check=True, capture_output=True, timeout=cancel.timeout(timeout), env=GIT_ENV,
+        )
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"git {args[0]} failed: {e.stderr.decode(errors='replace').strip()}")
+    except subprocess.TimeoutExpired:
+        cancel.check()
+        raise ValueError(f"git {args[0]} timed out")
+    return result.stdout
+
+
+def find_git_dir(path: str) -> Optional[str]:
+    """The object store of a working copy or bare repository, None if path is neither"""
+    if os.path.isdir(os.path.join(path, ".git")):
+        return os.path.join(path, ".git")
+    if os.path.isfile(os.path.join(path, "HEAD")) and os.path.isdir(os.path.join(path, "objects")):
+        return path
+    return None
+
+
+@contextmanager
+def _locked(path: str, blocking: bool = True):
+    """Exclusive lock of a mirror; without blocking, yields False when another process holds it"""
+    with open(path + ".lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _tree_size(path: str) -> int:
+    size = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(directory, name)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def _record_size(path: str, size: int) -> int:
+    """Keep a mirror's size next to it, updated on clone and fetch, so evictions do not walk every mirror"""
+    try:
+        with open(path + ".size", "w") as f:
+            f.write(str(size))
+    except OSError:
+        pass
+    return size
+
+
+def _mirror_size(path: str) -> int:
+    try:
+        with open(path + ".size") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return _record_size(path, _tree_size(path))
+
+
+def evict_mirrors(keep: Optional[str] = None):
+    """Remove least recently used mirrors until MIRROR_MAX_COUNT and MIRROR_MAX_BYTES hold"""
+    try:
+        names = os.listdir(MIRROR_DIR)
+    except OSError:
+        return
+    mirrors = sorted(
+        (_mtime(os.path.join(MIRROR_DIR, name) + ".fetched"), os.path.join(MIRROR_DIR, name))
+        for name in names if name.endswith(".git") and not name.startswith(".")
+    )
+    sizes = {path: _mirror_size(path) for _, path in mirrors}
+    count, total = len(mirrors), sum(sizes.values())
+    now = time.time()
+    for used, path in mirrors:
+        if count <= MIRROR_MAX_COUNT and total <= MIRROR_MAX_BYTES:
+            return
+        if path == keep or now - used < EVICT_GRACE:
+            continue
+        with _locked(path, blocking=False) as acquired:
+            if not acquired:
+                continue  # Being cloned or fetched
+            shutil.rmtree(path, ignore_errors=True)
+            for suffix in (".fetched", ".size", ".lock"):
+                try:
+                    os.remove(path + suffix)
+                except OSError:
+                    pass
+        count, total = count - 1, total - sizes[path]
+        logger.info(f"Evicted mirror {path} ({sizes[path] // 1024} KiB)")
+    if count > MIRROR_MAX_COUNT or total > MIRROR_MAX_BYTES:
+        logger.warning(f"{count} mirrors ({total // (1024 * 1024)} MiB) stay over the limit, all are in use")
+
+
+def _clone(repository_url: str, target: str):
+    """
+    git clone --mirror into target, stopped as soon as it grows past the mirror
+    size cap or into the disk space MIRROR_MIN_FREE_BYTES keeps free
+    """
+    limit = min(MIRROR_MAX_BYTES, shutil.disk_usage(MIRROR_DIR).free - MIRROR_MIN_FREE_BYTES)
+    if limit <= 0:
+        raise ValueError(f"Not enough disk space to mirror {repository_url}")
+    deadline = time.monotonic() + cancel.timeout(GIT_TIMEOUT)
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(
+            ["git", *REMOTE_CONFIG, "clone", "--mirror", "--quiet", "--", repository_url, target],
+            stdout=subprocess.DEVNULL, stderr=stderr, env=GIT_ENV, start_new_session=True,
+        )
+        try:
+            while True:
+                try:
+                    process.wait(timeout=CLONE_POLL)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                cancel.check()
+                if _tree_size(target) > limit:
+                    raise ValueError(f"Repository is too large to mirror: {repository_url}")
+                if time.monotonic() > deadline:
+                    raise ValueError(f"Cloning {repository_url} timed out")
+        finally:
+            if process.poll() is None:
+                # The whole group: index-pack and the transport would go on writing into target
+                os.killpg(process.pid, signal.SIGKILL)
+                process.wait()
+        if process.returncode:
+            stderr.seek(0)
+            raise ValueError(f"Could not clone {repository_url}: {stderr.read().decode(errors='replace').strip()}")
+
+
+def ensure_mirror(repository_url: str, max_age: int = FETCH_INTERVAL) -> str:
+    """
+    Bare mirror of a remote repository, cloned once and then fetched when older
+    than max_age seconds; older mirrors are evicted when the mirror limits are exceeded
+    """
+    check_remote_url(repository_url)
+    os.makedirs(MIRROR_DIR, exist_ok=True)
+    mirror = os.path.join(MIRROR_DIR, hashlib.sha256(repository_url.encode("utf-8")).hexdigest()[:24] + ".git")
+    stamp = mirror + ".fetched"
+
+    # Workers and scans share mirrors; the lock serialises clone/fetch per repository
+    updated = True
+    with _locked(mirror):
+        if not os.path.isdir(mirror):
+            tmp = tempfile.mkdtemp(dir=MIRROR_DIR, prefix=".clone-")
+            try:
+                _clone(repository_url, tmp)
+                size = _tree_size(tmp)
+                if size > MIRROR_MAX_BYTES:
+                    raise ValueError(f"Repository is too large to mirror: {repository_url}")
+            except BaseException:
+                shutil.rmtree(tmp, ignore_errors=True)
+                raise
+            os.rename(tmp, mirror)
+            _record_size(mirror, size)
+            logger.info(f"Mirrored {repository_url} to {mirror}")
+        elif time.time() - _mtime(stamp) > max_age:
+            git(mirror, *REMOTE_CONFIG, "fetch", "--prune", "--quiet", "origin")
+            _record_size(mirror, _tree_size(mirror))
+        else:
+            updated = False
+        open(stamp, "w").close()
+    if updated:
+        evict_mirrors(keep=mirror)
+    return mirror
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+class BlobReader:
+    """A long-running 'git cat-file --batch' process"""
+
+    def __init__(self, git_dir: str):
+        self._process = subprocess.Popen(
+            ["git", f"--git-dir={git_dir}", "cat-file", "--batch"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=GIT_ENV,
+        )
+
+    def read(self, sha: str) -> Optional[bytes]:
+        self._process.stdin.write(sha.encode("ascii") + b"\n")
+        self._process.stdin.flush()
+        header = self._process.stdout.readline().split()
+        if len(header) != 3:
+            return None  # "<sha> missing"
+        data = self._process.stdout.read(int(header[2]))
+        self._process.stdout.read(1)  # trailing newline
+        return data if header[1] == b"blob" else None
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+
+def changed_paths(git_dir: str, base: str, head: str) -> List[str]:
+    """Paths added, modified or deleted between two commits (renames count as delete + add)"""
+    output = git(git_dir, "diff-tree", "-r", "-z", "--name-only", "--no-renames", base, head)
+    return [path.decode("utf-8", errors="replace") for path in output.split(b"\0") if path]
+
+
+def _separators(path: str) -> List[int]:
+    """Offsets of the directories above a path, 0 standing for the root"""
+    return [0] + [index for index, char in enumerate(path) if char == "/"]
+
+
+@dataclass(frozen=True)
+class GitSource:
+    """The tree of one commit, read from a repository's object store, optionally limited to some paths"""
+    git_dir: str
+    commit: str
+    paths: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def at(cls, git_dir: str, ref: str) -> "GitSource":
+        """Pin a ref to its commit id so every worker reads the same tree"""
+        if not _REF.match(ref):
+            raise ValueError(f"Invalid commit: {ref}")
+        sha = git(git_dir, "rev-parse", "--verify", f"{ref}^{{commit}}").decode().strip()
+        return cls(git_dir, sha)
+
+    def entries(self, path_filter: Optional[PathFilter] = None) -> List[Tuple[str, str]]:
+        """(path, blob sha) for every selected regular file small enough to scan"""
+        if self.paths is not None and not self.paths:
+            return []
+        blobs = {}
+        args = ["ls-tree", "-r", "-z", "--long", "--full-tree", self.commit]
+        if self.paths is not None and len(self.paths) <= PATHSPEC_LIMIT:
+            # The .gitignore files above each path decide whether it is selected
+            ignore_files = {
+                f"{path[:index]}/.gitignore" if index > 0 else ".gitignore"
+                for path in self.paths for index in _separators(path)
+            }
+            args += ["--"] + [f":(literal){path}" for path in sorted(set(self.paths) | ignore_files)]
+        output = git(self.git_dir, *args)
+        for record in output.split(b"\0"):
+            if not record:
+                continue
+            meta, _, path = record.partition(b"\t")
+            mode, kind, sha, size = meta.split()
+            # Skip symlinks (120000) and submodules (commit entries)
+            if kind != b"blob" or mode == b"120000" or int(size) > MAX_FILE_SIZE:
+                continue
+            blobs[path.decode("utf-8", errors="replace")] = sha.decode("ascii")
+        wanted = set(self.paths) if self.paths is not None else None
+        if path_filter is None:
+            return sorted(item for item in blobs.items() if wanted is None or item[0] in wanted)
+
+        ignore_files = {path.rpartition("/")[0]: sha for path, sha in blobs.items()
+                        if path.rpartition("/")[2] == ".gitignore"}
+        reader = BlobReader(self.git_dir) if ignore_files else None
+        try:
+            def ignore_file(directory: str) -> Optional[List[str]]:
+                if directory not in ignore_files:
+                    return None
+                data = reader.read(ignore_files[directory])
+                return data.decode("utf-8", errors="replace").splitlines() if data else None
+
+            selected = select_tree(sorted(blobs), path_filter, ignore_file)
+        finally:
+            if reader is not None:
+                reader.close()
+        return [(path, blobs[path]) for path in selected if wanted is None or path in wanted]
+
+    def sizes(self, entries: List[Tuple[str, str]]) -> List[int]:
+        """Size in bytes of each entry's blob, from one 'git cat-file --batch-check'"""
+        if not entries:
+            return []
+        output = git(self.git_dir, "cat-file", "--batch-check", input="".join(f"{key}\n" for _, key in entries).encode("ascii"))
+        sizes = []
+        for line in output.splitlines():
+            fields = line.split()
+            sizes.append(int(fields[2]) if len(fields) == 3 else 0)
+        return sizes
+
+    @contextmanager
+    def open(self) -> Iterator[Reader]:
+        reader = BlobReader(self.git_dir)
+        try:
+            yield reader.read
+        finally:
+            reader.close()
@@ -0,0 +1,149 @@
+"""
+Resource limits for scan pool workers
+Pool workers cap their address space, give each task a CPU-time budget
+(RLIMIT_CPU, raised per task) and each file a wall-clock budget for its
+detectors (an interval timer). Both signals surface as LimitExceeded while a
+file is being analysed, so the engine skips that file instead of failing
+the scan. Limits are only enforced in pool workers; signals cannot interrupt
+the server's own threads.
+"""
+
+import logging
+import math
+import os
+import resource
+import signal
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds of detector time per file
+SCAN_FILE_TIMEOUT = float(os.getenv("SCAN_FILE_TIMEOUT", 10))
+# CPU seconds per pool task (a batch of files)
+SCAN_TASK_CPU_LIMIT = int(os.getenv("SCAN_TASK_CPU_LIMIT", 120))
+# Address space a pool worker may add to what it had mapped at start, in MiB
+SCAN_WORKER_MEMORY_MB = int(os.getenv("SCAN_WORKER_MEMORY_MB", 2048))
+# Tasks a pool worker runs before it is replaced by a fresh one (0: never)
+SCAN_MAX_TASKS_PER_CHILD = int(os.getenv("SCAN_MAX_TASKS_PER_CHILD", 100))
+
+SKIPPED = "skipped: limit exceeded"
+
+
+class LimitExceeded(Exception):
+    """A file ran past its time, CPU or memory limit"""
+
+    def __init__(self, limit: str):
+        super().__init__(f"{limit} limit exceeded")
+        self.limit = limit
+
+
+class TaskLimitExceeded(LimitExceeded):
+    """The task ran out of CPU time; the rest of its files are skipped too"""
+
+
+_enforcing = False
+_file_timeout = SCAN_FILE_TIMEOUT
+_in_file = False
+_cpu_exceeded = False
+# Soft RLIMIT_CPU set for the running task; the kernel raises the limit itself with each SIGXCPU
+_cpu_limit: Optional[int] = None
+# rusage trails the kernel's CPU accounting by a few ticks
+CPU_SLACK = 0.1
+
+
+def skipped(path: str, limit: str) -> dict:
+    """Report entry for a file left out of a scan"""
+    return {"file": path, "status": SKIPPED, "limit": limit}
+
+
+def _cpu_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _on_timer(signum, frame):
+    if _in_file:
+        raise LimitExceeded("time")
+
+
+def _on_cpu(signum, frame):
+    global _cpu_exceeded
+    if _cpu_limit is None or _cpu_used() < _cpu_limit - CPU_SLACK:
+        return  # Sent for an earlier task's budget
+    _cpu_exceeded = True
+    if _in_file:
+        raise TaskLimitExceeded("cpu")
+
+
+def _mapped_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[0]) * resource.getpagesize()
+
+
+def install(memory_mb: int = SCAN_WORKER_MEMORY_MB, file_timeout: float = SCAN_FILE_TIMEOUT):
+    """Pool worker initializer: cap memory and turn the limit signals into LimitExceeded"""
+    global _enforcing, _file_timeout
+    _file_timeout = file_timeout
+    signal.signal(signal.SIGALRM, _on_timer)
+    signal.signal(signal.SIGXCPU, _on_cpu)
+    if memory_mb > 0:
+        try:
+            limit = _mapped_bytes() + memory_mb * 1024 * 1024
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            if hard != resource.RLIM_INFINITY:
+                limit = min(limit, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not limit scan worker memory: {e}")
+    _enforcing = True
+
+
+@contextmanager
+def task(cpu_seconds: int = SCAN_TASK_CPU_LIMIT) -> Iterator[None]:
+    """CPU-time budget of one pool task, on top of what the worker already used"""
+    global _cpu_exceeded, _cpu_limit
+    if not _enforcing or cpu_seconds <= 0:
+        yield
+        return
+    _cpu_exceeded = False
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = math.ceil(_cpu_used() + cpu_seconds)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    _cpu_limit = soft
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    try:
+        yield
+    finally:
+        _cpu_limit = None
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def check_task():
+    """Raise TaskLimitExceeded once the task's CPU budget is spent"""
+    if _cpu_exceeded:
+        raise TaskLimitExceeded("cpu")
+
+
+@contextmanager
+def file(timeout: Optional[float] = None) -> Iterator[None]:
+    """Time budget for the detectors of one file; MemoryError counts as a memory limit"""
+    global _in_file
+    if not _enforcing:
+        yield
+        return
+    if timeout is None:
+        timeout = _file_timeout
+    check_task()
+    if timeout > 0:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    _in_file = True
+    try:
+        yield
+    except MemoryError:
+        raise LimitExceeded("memory")
+    finally:
+        _in_file = False
+        if timeout > 0:
+            signal.setitimer(signal.ITIMER_REAL, 0)
@@ -0,0 +1,293 @@
+"""
+File selection for scans
+Gitignore-style rules, built-in excludes and per-scan-type globs are compiled
+into one regex per directory so ignored trees are pruned before anything is
+read. Languages come from extension/filename/shebang lookup tables.
+"""
+
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Sequence, Tuple
+
+# Dependency, build and tooling output that is never worth scanning
+DEFAULT_EXCLUDES = (
+    "node_modules/", "bower_components/", "jspm_packages/", "vendor/", "third_party/",
+    ".venv/", "venv/", "virtualenv/", "site-packages/", "__pycache__/", ".tox/", ".nox/",
+    ".mypy_cache/", ".pytest_cache/", ".gradle/", ".idea/", ".next/", ".nuxt/",
+    "dist/", "build/", "target/", "coverage/",
+    "*.min.js", "*.min.css", "*.bundle.js", "*-bundle.js", "*.chunk.js", "*.map",
+)
+
+# Extra globs per scan type; a non-empty include list restricts files to matches
+SCAN_PROFILES: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "quick": {
+        "include": (),
+        "exclude": ("test/", "tests/", "__tests__/", "spec/", "fixtures/", "testdata/", "docs/", "examples/",
+                    "*_test.go", "*.test.js", "*.spec.js", "*.test.ts", "*.spec.ts", "*.md", "*.rst", "*.txt",
+                    "!requirements*.txt"),
+    },
+    "deep": {
+        "include": (),
+        "exclude": ("docs/", "*.md", "*.rst"),
+    },
+    "full": {
+        "include": (),
+        "exclude": (),
+    },
+}
+
+LANGUAGES = {
+    "python": (".py", ".pyw", ".pyi"),
+    "javascript": (".js", ".mjs", ".cjs", ".jsx"),
+    "typescript": (".ts", ".mts", ".cts", ".tsx"),
+    "java": (".java",),
+    "kotlin": (".kt", ".kts"),
+    "scala": (".scala",),
+    "go": (".go",),
+    "ruby": (".rb", ".erb"),
+    "php": (".php", ".phtml"),
+    "c": (".c", ".h"),
+    "cpp": (".cc", ".cpp", ".cxx", ".hpp", ".hh"),
+    "csharp": (".cs",),
+    "rust": (".rs",),
+    "swift": (".swift",),
+    "shell": (".sh", ".bash", ".zsh"),
+    "sql": (".sql",),
+    "html": (".html", ".htm", ".vue", ".svelte"),
+    "css": (".css", ".scss", ".sass", ".less"),
+    "yaml": (".yml", ".yaml"),
+    "json": (".json",),
+    "toml": (".toml",),
+    "xml": (".xml",),
+    "terraform": (".tf", ".tfvars", ".hcl"),
+    "config": (".ini", ".cfg", ".conf", ".env", ".properties"),
+    "markdown": (".md", ".rst"),
+    "text": (".txt",),
+}
+
+BINARY_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".svgz", ".psd",
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".tar", ".jar", ".war", ".whl", ".egg",
+    ".so", ".dll", ".dylib", ".exe", ".bin", ".o", ".a", ".class", ".pyc", ".pyo", ".wasm",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+    ".mp3", ".mp4", ".wav", ".ogg", ".avi", ".mov", ".webm",
+    ".sqlite", ".db", ".parquet", ".npy", ".npz", ".pkl",
+)
+
+FILENAMES = {
+    "Dockerfile": "dockerfile",
+    "Makefile": "make",
+    "Gemfile": "ruby",
+    "Rakefile": "ruby",
+    "Jenkinsfile": "groovy",
+    ".env": "config",
+    "requirements.txt": "manifest",
+    "pyproject.toml": "manifest",
+    "package.json": "manifest",
+    "package-lock.json": "manifest",
+    "poetry.lock": "manifest",
+    "Pipfile.lock": "manifest",
+}
+
+SHEBANGS = {
+    "python": "python", "pypy": "python",
+    "node": "javascript", "deno": "typescript", "bun": "javascript",
+    "sh": "shell", "bash": "shell", "zsh": "shell", "dash": "shell", "ksh": "shell",
+    "ruby": "ruby", "php": "php", "perl": "perl",
+}
+
+BINARY = "binary"
+
+# Extension (lower case, with dot) -> language, built once from the tables above
+EXTENSIONS: Dict[str, str] = {ext: language for language, exts in LANGUAGES.items() for ext in exts}
+EXTENSIONS.update({ext: BINARY for ext in BINARY_EXTENSIONS})
+
+
+def language_of(path: str) -> Optional[str]:
+    """Language from the file name alone, None when it takes a look at the contents"""
+    filename = path.rsplit("/", 1)[-1]
+    language = FILENAMES.get(filename)
+    if language is not None:
+        return language
+    if filename.startswith("requirements") and filename.endswith(".txt"):
+        return "manifest"
+    dot = filename.rfind(".")
+    if dot <= 0:
+        return None
+    return EXTENSIONS.get(filename[dot:].lower())
+
+
+def detect_language(path: str, text: str) -> Optional[str]:
+    """Language of a file from its name, falling back to a #! line"""
+    language = language_of(path)
+    if language is not None or not text.startswith("#!"):
+        return language
+    parts = text[2:text.find("\n") if "\n" in text else len(text)].split()
+    if not parts:
+        return None
+    interpreter = parts[0].rsplit("/", 1)[-1]
+    if interpreter == "env":
+        arguments = [part for part in parts[1:] if not part.startswith("-")]
+        interpreter = arguments[0] if arguments else ""
+    return SHEBANGS.get(interpreter.rstrip("0123456789.-"))
+
+
+def is_minified(text: str) -> bool:
+    """Generated bundles put kilobytes of code on their first line"""
+    return len(text) > 4096 and "\n" not in text[:4096]
+
+
+def _glob_to_regex(glob: str) -> str:
+    out = []
+    i, n = 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if glob.startswith("**/", i) and (i == 0 or glob[i - 1] == "/"):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if glob.startswith("/**", i) and i + 3 == n:
+            out.append("/.+")
+            break
+        if c == "*":
+            while i + 1 < n and glob[i + 1] == "*":
+                i += 1
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            negated = glob.startswith(("[!", "[^"), i)
+            # A ']' right after the opening bracket is literal
+            end = glob.find("]", i + 3 if negated else i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = glob[i + 2 if negated else i + 1:end].replace("\\", "\\\\").replace("[", "\\[")
+                out.append(f"[{'^' if negated else ''}{body}]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(glob[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def translate(pattern: str, base: str = "") -> Optional[Tuple[str, bool]]:
+    """Regex for one gitignore line declared in directory base, and whether it re-includes"""
+    if pattern.endswith("\n"):
+        pattern = pattern[:-1]
+    if not pattern.endswith("\\ "):
+        pattern = pattern.rstrip()
+    if not pattern or pattern.startswith("#"):
+        return None
+    negate = pattern.startswith("!")
+    if negate:
+        pattern = pattern[1:]
+    elif pattern.startswith("\\"):
+        pattern = pattern[1:]
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    if not pattern:
+        return None
+
+    # A slash anywhere but the end anchors the pattern to its .gitignore
+    anchored = "/" in pattern
+    prefix = re.escape(base + "/") if base else ""
+    if not anchored:
+        prefix += "(?:.*/)?"
+    # Directories are matched with a trailing slash, files without
+    regex = prefix + _glob_to_regex(pattern.lstrip("/")) + ("/" if directory_only else "/?")
+    return regex, negate
+
+
+@lru_cache(maxsize=512)
+def compile_rules(rules: Tuple[Tuple[str, str], ...]) -> Tuple[Optional[Pattern], Tuple[bool, ...]]:
+    """One alternation for a list of (base, pattern) rules, later rules taking precedence"""
+    translated = [t for t in (translate(pattern, base) for base, pattern in rules) if t is not None]
+    if not translated:
+        return None, ()
+    # Alternation stops at the first branch that matches; gitignore wants the last rule
+    translated.reverse()
+    regex = re.compile("|".join(f"({r})" for r, _ in translated), re.DOTALL)
+    return regex, tuple(negate for _, negate in translated)
+
+
+def _match(compiled: Tuple[Optional[Pattern], Tuple[bool, ...]], path: str) -> Optional[bool]:
+    """True if excluded, False if re-included, None if no rule matches"""
+    regex, negations = compiled
+    if regex is None:
+        return None
+    match = regex.fullmatch(path)
+    if match is None:
+        return None
+    return not negations[match.lastindex - 1]
+
+
+class PathFilter:
+    """
+    Decides which files a scan reads
+    Ignore-file rules come first and built-in/scan-type excludes last, so a
+    '!node_modules/' in a .gitignore cannot pull dependencies back in.
+    """
+
+    def __init__(self, excludes: Sequence[str] = (), include: Sequence[str] = (),
+                 ignore_rules: Tuple[Tuple[str, str], ...] = ()):
+        self.excludes = tuple(excludes)
+        self.include = tuple(include)
+        self.ignore_rules = ignore_rules
+        self._rules = compile_rules(ignore_rules + tuple(("", p) for p in self.excludes))
+        self._include = compile_rules(tuple(("", p) for p in self.include))
+
+    @classmethod
+    def for_scan(cls, scan_type: str, include: Sequence[str] = (), exclude: Sequence[str] = ()) -> "PathFilter":
+        profile = SCAN_PROFILES.get(scan_type, SCAN_PROFILES["quick"])
+        return cls(DEFAULT_EXCLUDES + profile["exclude"] + tuple(exclude), profile["include"] + tuple(include))
+
+    def with_ignore_file(self, base: str, lines: Iterable[str]) -> "PathFilter":
+        """Filter for the subtree of base, adding the rules of its .gitignore"""
+        rules = tuple((base, line) for line in lines if line.strip() and not line.startswith("#"))
+        if not rules:
+            return self
+        return PathFilter(self.excludes, self.include, self.ignore_rules + rules)
+
+    def excludes_dir(self, path: str) -> bool:
+        return _match(self._rules, path + "/") is True
+
+    def selects(self, path: str) -> bool:
+        """Whether a file (whose directories were already let through) should be scanned"""
+        if language_of(path) == BINARY or _match(self._rules, path) is True:
+            return False
+        return not self.include or _match(self._include, path) is True
+
+
+def select_tree(paths: Iterable[str], path_filter: PathFilter,
+                ignore_file: Callable[[str], Optional[List[str]]]) -> List[str]:
+    """
+    Filter a flat listing of a tree (e.g. a git commit) as a directory walk would,
+    pruning excluded directories; ignore_file(dir) returns the lines of dir/.gitignore
+    """
+    filters: Dict[str, PathFilter] = {}
+    excluded: Dict[str, bool] = {"": False}
+
+    def filter_for(directory: str) -> PathFilter:
+        if directory not in filters:
+            parent = filter_for(directory.rpartition("/")[0]) if directory else path_filter
+            lines = ignore_file(directory)
+            filters[directory] = parent.with_ignore_file(directory, lines) if lines else parent
+        return filters[directory]
+
+    def is_excluded(directory: str) -> bool:
+        if directory not in excluded:
+            parent = directory.rpartition("/")[0]
+            excluded[directory] = is_excluded(parent) or filter_for(parent).excludes_dir(directory)
+        return excluded[directory]
+
+    selected = []
+    for path in paths:
+        directory = path.rpartition("/")[0]
+        if not is_excluded(directory) and filter_for(directory).selects(path):
+            selected.append(path)
+    return selected
@@ -0,0 +1,72 @@
+"""
+Scan progress reporting
+The caller activates a ProgressReporter in a context variable; the engine
+calls report() as files complete. Updates are coalesced to at most one per
+interval (plus the final one), so reporting costs a clock read per file.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+# Seconds between progress updates sent to a client
+MIN_INTERVAL = 0.25
+
+
+class ProgressReporter:
+    """Throttles (files done, files total, findings so far) updates into a callback"""
+
+    def __init__(self, callback: Callable[[int, int, int], None], min_interval: float = MIN_INTERVAL):
+        self.callback = callback
+        self.min_interval = min_interval
+        self._next = 0.0
+        self._last = -1
+
+    def report(self, done: int, total: int, findings: int):
+        # Progress only ever moves forward; completion is always sent
+        if done <= self._last:
+            return
+        now = time.monotonic()
+        if done < total and now < self._next:
+            return
+        self._next = now + self.min_interval
+        self._last = done
+        self.callback(done, total, findings)
+
+    def part(self, index: int, count: int) -> "ProgressPart":
+        """Reporter for the index-th of count equal passes over the same files"""
+        return ProgressPart(self, index, count)
+
+
+class ProgressPart:
+    def __init__(self, parent: ProgressReporter, index: int, count: int):
+        self.parent = parent
+        self.index = index
+        self.count = count
+
+    def report(self, done: int, total: int, findings: int):
+        self.parent.report(self.index * total + done, self.count * total, findings)
+
+
+_current: ContextVar[Optional[ProgressReporter]] = ContextVar("progress_reporter", default=None)
+
+
+def current() -> Optional[ProgressReporter]:
+    return _current.get()
+
+
+@contextmanager
+def activate(reporter: Optional[ProgressReporter]) -> Iterator[Optional[ProgressReporter]]:
+    token = _current.set(reporter)
+    try:
+        yield reporter
+    finally:
+        _current.reset(token)
+
+
+def report(done: int, total: int, findings: int):
+    """Report scan progress to the current reporter, if any"""
+    reporter = _current.get()
+    if reporter is not None:
+        reporter.report(done, total, findings)
@@ -0,0 +1,285 @@
+"""
+Rule files
+Detector rules are declared in TOML (or YAML, when PyYAML is installed) as a
+list of [[rule]] tables and validated into Rule values:
+
+    [[rule]]
+    id = "PY-EVAL"
+    type = "Code Injection"
+    severity = "High"
+    message = "eval() on dynamic input allows arbitrary code execution"
+    pattern = '(?<![\\w.])eval\\s*\\('      # or patterns = [...], matched as alternatives
+    keyword = "eval"                          # literal the file must contain; inferred when omitted
+    files = ["*.py", "*.js"]                  # globs; "*.ext" is an extension check
+    scan_type = "quick"                       # tier: quick, deep or full
+    flags = ["multiline"]                     # ignorecase, multiline, dotall
+
+Every problem in a file is reported at once, with the rule it belongs to.
+"""
+
+import fnmatch
+import logging
+import re
+import sys
+import time
+import tomllib
+from dataclasses import replace
+from typing import List, Optional, Tuple
+
+from scanner.findings import SEVERITIES
+from scanner.rules import RULE_FILES, SCAN_TIERS, Rule, ensure_artifact, literal_text
+
+try:
+    import yaml
+except ImportError:  # YAML rule files are optional, TOML is always available
+    yaml = None
+
+FLAGS = {"ignorecase": re.IGNORECASE, "multiline": re.MULTILINE, "dotall": re.DOTALL}
+REQUIRED = ("id", "type", "severity", "message")
+KNOWN = set(REQUIRED) | {"pattern", "patterns", "keyword", "files", "scan_type", "flags"}
+# Shortest literal worth inferring as a keyword prefilter
+MIN_KEYWORD = 3
+_RULE_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+_EXTENSION_GLOB = re.compile(r"^\*(\.[A-Za-z0-9_+-]+)$")
+# Characters after the letter of \xhh, \uhhhh, \Uhhhhhhhh and \N{name} escapes
+_ESCAPE_DIGITS = {"x": 3, "u": 5, "U": 9, "N": 1}
+
+
+class RuleError(ValueError):
+    """A rule file that does not parse or holds invalid rules"""
+
+
+def _parse(path: str, data: bytes) -> list:
+    if path.endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise RuleError(f"{path}: YAML rule files need PyYAML")
+        try:
+            document = yaml.safe_load(data)
+        except yaml.YAMLError as e:
+            raise RuleError(f"{path}: {e}")
+    else:
+        try:
+            document = tomllib.loads(data.decode("utf-8"))
+        except (tomllib.TOMLDecodeError, UnicodeDecodeError) as e:
+            raise RuleError(f"{path}: {e}")
+    rules = document.get("rule") if isinstance(document, dict) else None
+    if not isinstance(rules, list):
+        raise RuleError(f"{path}: expected a list of rules under 'rule'")
+    return rules
+
+
+def _atom(pattern: str, index: int) -> Tuple[Optional[str], int]:
+    """(literal character or None, end) of the regex atom starting at index"""
+    char = pattern[index]
+    if char == "\\":
+        escaped = pattern[index + 1:index + 2]
+        if not escaped.isalnum():
+            return escaped or None, index + 2
+        # Numeric escapes and backreferences run past their first character
+        if escaped in _ESCAPE_DIGITS:
+            end = index + 1 + _ESCAPE_DIGITS[escaped]
+            return None, (pattern.find("}", end) + 1 or len(pattern)) if escaped == "N" else end
+        if escaped.isdigit():
+            end = index + 2
+            while end < min(index + 4, len(pattern)) and pattern[end].isdigit():
+                end += 1
+            return None, end
+        return None, index + 2
+    if char == "[":
+        index += 1
+        if pattern[index:index + 1] == "^":
+            index += 1
+        if pattern[index:index + 1] == "]":
+            index += 1
+        while index < len(pattern) and pattern[index] != "]":
+            index += 2 if pattern[index] == "\\" else 1
+        return None, index + 1
+    if char == "(":
+        depth, index = 1, index + 1
+        while index < len(pattern) and depth:
+            if pattern[index] in "\\[":
+                _, index = _atom(pattern, index)
+                continue
+            depth += {"(": 1, ")": -1}.get(pattern[index], 0)
+            index += 1
+        return None, index
+    if char in ".^${}*+?)":
+        return None, index + 1
+    return char, index + 1
+
+
+def infer_keyword(pattern: str) -> str:
+    """
+    Longest literal every match of the pattern contains, taken from its top level
+    (groups and classes end a literal), so a file without it cannot match
+    """
+    best = run = ""
+    index = 0
+    while index < len(pattern):
+        if pattern[index] == "|":
+            return ""  # Top-level alternation: no literal is common to every match
+        literal, index = _atom(pattern, index)
+        quantifier = pattern[index:index + 1]
+        if quantifier and quantifier in "?*+{":
+            index = (pattern.find("}", index) + 1 or len(pattern)) if quantifier == "{" else index + 1
+            if pattern[index:index + 1] in ("?", "+"):
+                index += 1  # Lazy or possessive
+            if quantifier == "+" and literal is not None:
+                # Required once, but what follows is not adjacent to it
+                run += literal
+            literal = None
+        if literal is None:
+            best, run = max(best, run, key=len), ""
+        else:
+            run += literal
+    best = max(best, run, key=len)
+    return best if len(best) >= MIN_KEYWORD else ""
+
+
+def _files(value) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """(extensions, other globs) of a rule's file globs"""
+    extensions, globs = [], []
+    for glob in value:
+        match = _EXTENSION_GLOB.match(glob)
+        if match:
+            extensions.append(match.group(1).lower())
+        else:
+            fnmatch.translate(glob)
+            globs.append(glob)
+    return tuple(extensions), tuple(globs)
+
+
+def _rule(raw: dict) -> Rule:
+    """One validated rule; raises ValueError naming the first problem"""
+    unknown = set(raw) - KNOWN
+    if unknown:
+        raise ValueError(f"unknown fields {', '.join(sorted(unknown))}")
+    for name in REQUIRED:
+        if not isinstance(raw.get(name), str) or not raw[name].strip():
+            raise ValueError(f"'{name}' is required")
+    if not _RULE_ID.match(raw["id"]):
+        raise ValueError(f"invalid id {raw['id']!r}")
+    if raw["severity"] not in SEVERITIES:
+        raise ValueError(f"severity must be one of {', '.join(SEVERITIES)}")
+    scan_type = raw.get("scan_type", "quick")
+    if not isinstance(scan_type, str) or scan_type not in SCAN_TIERS:
+        raise ValueError(f"scan_type must be one of {', '.join(SCAN_TIERS)}")
+
+    if ("pattern" in raw) == ("patterns" in raw):
+        raise ValueError("exactly one of 'pattern' and 'patterns' is required")
+    patterns = [raw["pattern"]] if "pattern" in raw else raw["patterns"]
+    if not isinstance(patterns, list) or not patterns or not all(isinstance(p, str) and p for p in patterns):
+        raise ValueError("patterns must be non-empty strings")
+    pattern = patterns[0] if len(patterns) == 1 else "|".join(f"(?:{p})" for p in patterns)
+
+    flag_names = raw.get("flags", [])
+    if not isinstance(flag_names, list) or not all(isinstance(name, str) and name in FLAGS for name in flag_names):
+        raise ValueError(f"flags must be a list of {', '.join(FLAGS)}")
+    flags = 0
+    for name in flag_names:
+        flags |= FLAGS[name]
+    try:
+        regex = re.compile(pattern, flags)
+    except re.error as e:
+        raise ValueError(f"invalid pattern: {e}")
+    if regex.match(""):
+        raise ValueError("pattern matches the empty string")
+
+    keyword = raw.get("keyword")
+    if keyword is not None and not isinstance(keyword, str):
+        raise ValueError("keyword must be a string")
+
+    files = raw.get("files", [])
+    if not isinstance(files, list) or not all(isinstance(glob, str) and glob for glob in files):
+        raise ValueError("files must be a list of globs")
+    extensions, globs = _files(files)
+    if extensions and globs:
+        # A rule applies to a file matching any of its globs
+        extensions, globs = (), tuple(files)
+    rule = Rule(raw["id"], raw["type"], raw["severity"], pattern, raw["message"], scan_type, keyword or "",
+                extensions, flags, globs)
+    # Inline flags count too: a case-insensitive pattern has no literal to look for,
+    # and in a verbose one whitespace is not literal. A literal pattern is found with
+    # str.find, which is already as cheap as a keyword test
+    if keyword is None and not regex.flags & (re.IGNORECASE | re.VERBOSE) and literal_text(rule) is None:
+        rule = replace(rule, keyword=infer_keyword(pattern))
+    return rule
+
+
+def parse_rules(path: str, data: bytes) -> List[Rule]:
+    """Validated rules of one rule file's contents"""
+    rules, errors, seen = [], [], set()
+    for number, raw in enumerate(_parse(path, data), 1):
+        name = raw.get("id") if isinstance(raw, dict) else None
+        try:
+            if not isinstance(raw, dict):
+                raise ValueError("expected a table")
+            rule = _rule(raw)
+            if rule.id in seen:
+                raise ValueError("duplicate id")
+        except ValueError as e:
+            errors.append(f"{path}: rule {number}" + (f" ({name})" if isinstance(name, str) else "") + f": {e}")
+            continue
+        seen.add(rule.id)
+        rules.append(rule)
+    if errors:
+        raise RuleError("\n".join(errors))
+    return rules
+
+
+def read_rule_files(paths: List[str]) -> List[bytes]:
+    contents = []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                contents.append(f.read())
+        except OSError as e:
+            raise RuleError(f"{path}: {e.strerror}")
+    return contents
+
+
+def load_rule_files(paths: List[str], contents: Optional[List[bytes]] = None) -> List[Rule]:
+    """Rules of several files in order; a later file's rule replaces an earlier one with the same id"""
+    rules = {}
+    for path, data in zip(paths, read_rule_files(paths) if contents is None else contents):
+        for rule in parse_rules(path, data):
+            rules.pop(rule.id, None)
+            rules[rule.id] = rule
+    return list(rules.values())
+
+
+def _main(argv: List[str]) -> int:
+    """usage: python -m scanner.rule_dsl check|compile [RULE_FILE ...] | timing PATH [SCAN_TYPE]"""
+    command, args = (argv[0], argv[1:]) if argv else ("", [])
+    if command in ("check", "compile"):
+        paths = args or RULE_FILES
+        try:
+            rules = load_rule_files(paths)
+            if command == "compile":
+                print(ensure_artifact(rule_files=paths))
+        except RuleError as e:
+            print(e, file=sys.stderr)
+            return 1
+        for rule in rules:
+            matcher = "literal" if literal_text(rule) is not None else "regex"
+            files = ", ".join(rule.globs or tuple(f"*{extension}" for extension in rule.extensions)) or "all files"
+            print(f"{rule.id:<16} {rule.scan_type:<6} {rule.severity:<8} {matcher:<8} "
+                  f"keyword={rule.keyword or '-':<16} {files}")
+        return 0
+    if command == "timing" and args:
+        from scanner.engine import scan_path
+        started = time.perf_counter()
+        result = scan_path(args[0], args[1] if len(args) > 1 else "full")
+        print(f"{result.files_scanned} files, {len(result.findings)} findings in {time.perf_counter() - started:.2f}s")
+        print(f"{'rule':<16} {'seconds':>9} {'files':>7} {'matches':>8} {'us/file':>9}")
+        for item in result.rule_timings:
+            print(f"{item['rule_id']:<16} {item['seconds']:>9.4f} {item['files']:>7} {item['matches']:>8} "
+                  f"{item['us_per_file']:>9.1f}")
+        return 0
+    print(_main.__doc__, file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(_main(sys.argv[1:]))
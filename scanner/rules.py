@@ -0,0 +1,299 @@
+"""
+Detector rule sets, cached as a versioned, memory-mapped artifact
+Rules are declared in rule files (see scanner/rule_dsl.py): the built-in
+scanner/builtin_rules.toml plus any listed in SCAN_RULES. The validated rules
+are cached in an artifact once per rule-file digest, so processes (uvicorn
+workers, scan pool workers) skip parsing and validating the rule files and map
+the same read-only JSON. The artifact holds no compiled regexes: each process
+compiles the rules into matchers specialised for their patterns on first use,
+except workers forked after warm(), which inherit the compiled rules.
+"""
+
+import fnmatch
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Scan types are tiers: a deeper scan runs every rule of the shallower ones
+SCAN_TIERS = {"quick": 0, "deep": 1, "full": 2}
+
+ARTIFACT_MAGIC = b"VGRS"
+ARTIFACT_VERSION = 2
+# magic, format version, rule count, sha256 of the payload, payload length
+_HEADER = struct.Struct("<4sHH32sQ")
+
+CACHE_DIR = os.getenv("RULESET_CACHE_DIR", os.path.join(tempfile.gettempdir(), "vulngpt-rules"))
+BUILTIN_RULE_FILE = os.path.join(os.path.dirname(__file__), "builtin_rules.toml")
+# Extra rule files, separated by os.pathsep; a rule replaces an earlier one with the same id
+RULE_FILES = [BUILTIN_RULE_FILE] + [path for path in os.getenv("SCAN_RULES", "").split(os.pathsep) if path]
+# Name of the per-batch rule timings in a batch's summaries
+TIMING_SUMMARY = "rule_timing"
+# Rules that spend longer than this over a whole scan are logged
+SLOW_RULE_SECONDS = float(os.getenv("SLOW_RULE_SECONDS", 1.0))
+
+_LITERAL = re.compile(r"(?:[^\\.^$*+?{}\[\]|()]|\\[^A-Za-z0-9])+")
+_UNESCAPE = re.compile(r"\\(.)")
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    A regex rule; keyword is a literal that must appear for the regex to be tried,
+    and a rule with extensions or globs only applies to the files they match
+    """
+    id: str
+    type: str
+    severity: str
+    pattern: str
+    message: str
+    scan_type: str = "quick"
+    keyword: str = ""
+    extensions: Tuple[str, ...] = field(default_factory=tuple)
+    flags: int = 0
+    globs: Tuple[str, ...] = field(default_factory=tuple)
+
+
+def encode_rules(rules: List[Rule]) -> bytes:
+    """Serialize a rule set into the versioned artifact format"""
+    payload = json.dumps([asdict(rule) for rule in rules], sort_keys=True, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(payload).digest()
+    header = _HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION, len(rules), digest, len(payload))
+    return header + payload
+
+
+def rule_files_digest(paths: List[str], contents: List[bytes]) -> str:
+    """Cache key of a list of rule files: their names, order and contents"""
+    digest = hashlib.sha256()
+    for path, data in zip(paths, contents):
+        digest.update(f"{os.path.basename(path)}\0{len(data)}\0".encode("utf-8"))
+        digest.update(data)
+    return digest.hexdigest()[:16]
+
+
+def ensure_artifact(rules: Optional[List[Rule]] = None, directory: str = CACHE_DIR,
+                    rule_files: Optional[List[str]] = None) -> str:
+    """
+    Write the artifact for a rule set unless it already exists, returns its path
+    Without explicit rules the rule files are read; their artifact is keyed by
+    the files' digest, so unchanged files are not parsed and validated again
+    """
+    if rules is None:
+        from scanner.rule_dsl import load_rule_files, read_rule_files
+        paths = RULE_FILES if rule_files is None else rule_files
+        contents = read_rule_files(paths)
+        name = f"ruleset-v{ARTIFACT_VERSION}-src-{rule_files_digest(paths, contents)}.bin"
+        if os.path.exists(os.path.join(directory, name)):
+            return os.path.join(directory, name)
+        rules = load_rule_files(paths, contents)
+        data = encode_rules(rules)
+    else:
+        data = encode_rules(rules)
+        name = f"ruleset-v{ARTIFACT_VERSION}-{hashlib.sha256(data).hexdigest()[:16]}.bin"
+    path = os.path.join(directory, name)
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    # Write-then-rename so concurrently starting workers never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".ruleset-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    logger.info(f"Compiled {len(rules)} rules to {path}")
+    return path
+
+
+def literal_text(rule: Rule) -> Optional[str]:
+    """The text a rule's pattern matches when it is a plain literal, else None"""
+    if rule.flags & re.IGNORECASE or not _LITERAL.fullmatch(rule.pattern):
+        return None
+    return _UNESCAPE.sub(r"\1", rule.pattern)
+
+
+def _finder(rule: Rule, regex: re.Pattern) -> Callable[[str], Iterator[int]]:
+    """Offsets of a rule's matches in a text, found with str.find for literal patterns"""
+    literal = literal_text(rule)
+    if literal is not None:
+        size = len(literal)
+
+        def find_literal(text: str) -> Iterator[int]:
+            start = text.find(literal)
+            while start != -1:
+                yield start
+                start = text.find(literal, start + size)
+
+        return find_literal
+    finditer = regex.finditer
+    return lambda text: (match.start() for match in finditer(text))
+
+
+def _glob_filter(globs: Tuple[str, ...]) -> Callable[[str], bool]:
+    """Path test for globs; a glob without a slash matches the file name in any directory"""
+    paths = [glob for glob in globs if "/" in glob]
+    names = [glob for glob in globs if "/" not in glob]
+    path_regex = re.compile("|".join(fnmatch.translate(glob) for glob in paths)) if paths else None
+    name_regex = re.compile("|".join(fnmatch.translate(glob) for glob in names)) if names else None
+
+    def matches(path: str) -> bool:
+        if path_regex is not None and path_regex.match(path):
+            return True
+        return name_regex is not None and name_regex.match(path.rsplit("/", 1)[-1]) is not None
+
+    return matches
+
+
+class CompiledRule:
+    """A rule compiled for this process: its regex, match finder and glob filter"""
+    __slots__ = ("rule", "regex", "find", "matches_path")
+
+    def __init__(self, rule: Rule):
+        self.rule = rule
+        self.regex = re.compile(rule.pattern, rule.flags)
+        self.find = _finder(rule, self.regex)
+        self.matches_path = _glob_filter(rule.globs) if rule.globs else None
+
+    def applies_to(self, path: str) -> bool:
+        if self.matches_path is not None:
+            return self.matches_path(path)
+        return not self.rule.extensions or path.lower().endswith(self.rule.extensions)
+
+
+def _extension(path: str) -> str:
+    name = path.rsplit("/", 1)[-1].lower()
+    return name[name.rfind("."):] if "." in name else ""
+
+
+class RuleSet:
+    """Rules of a rule-set artifact backed by a memory map, and this process's compiled matchers for them"""
+
+    def __init__(self, buffer, path: Optional[str] = None):
+        magic, version, count, digest, length = _HEADER.unpack_from(buffer, 0)
+        if magic != ARTIFACT_MAGIC:
+            raise ValueError(f"Not a rule-set artifact: {path}")
+        if version != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported rule-set version {version} in {path}")
+        payload = memoryview(buffer)[_HEADER.size:_HEADER.size + length]
+        if hashlib.sha256(payload).digest() != digest:
+            raise ValueError(f"Corrupt rule-set artifact: {path}")
+
+        self.path = path
+        self.version = version
+        self.digest = digest.hex()
+        self._buffer = buffer
+        self._payload = payload
+        self._count = count
+        self._rules: Optional[List[Rule]] = None
+        self._compiled: Dict[str, List[CompiledRule]] = {}
+        self._by_extension: Dict[Tuple[int, str], Tuple[List[CompiledRule], bool]] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def rules(self) -> List[Rule]:
+        if self._rules is None:
+            self._rules = [
+                Rule(**{**raw, "extensions": tuple(raw["extensions"]), "globs": tuple(raw["globs"])})
+                for raw in json.loads(bytes(self._payload))
+            ]
+        return self._rules
+
+    def compiled(self, scan_type: str) -> List[CompiledRule]:
+        """Compiled rules for a scan tier, compiled on first use and then cached"""
+        tier = SCAN_TIERS.get(scan_type, 0)
+        key = str(tier)
+        if key not in self._compiled:
+            self._compiled[key] = [
+                CompiledRule(rule) for rule in self.rules if SCAN_TIERS.get(rule.scan_type, 0) <= tier
+            ]
+        return self._compiled[key]
+
+    def for_path(self, scan_type: str, path: str) -> List[CompiledRule]:
+        """Rules of a scan tier that apply to a file, in rule-set order"""
+        extension = _extension(path)
+        key = (SCAN_TIERS.get(scan_type, 0), extension)
+        if key not in self._by_extension:
+            # Extension filters are decided once per extension; glob rules stay and are tested per path
+            selected = [
+                compiled for compiled in self.compiled(scan_type)
+                if compiled.matches_path is not None or compiled.applies_to(extension)
+            ]
+            self._by_extension[key] = selected, any(compiled.matches_path is not None for compiled in selected)
+        selected, has_globs = self._by_extension[key]
+        if not has_globs:
+            return selected
+        return [compiled for compiled in selected if compiled.matches_path is None or compiled.matches_path(path)]
+
+    def warm(self):
+        """Compile every tier, used before forking so children inherit the result"""
+        for scan_type in SCAN_TIERS:
+            self.compiled(scan_type)
+
+
+def load_ruleset(path: str) -> RuleSet:
+    """Map an artifact into memory; its pages are shared by every process mapping it, the compiled rules are not"""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return RuleSet(buffer, path)
+
+
+_ruleset: Optional[RuleSet] = None
+
+
+def attach(path: Optional[str] = None) -> RuleSet:
+    """Attach this process to a rule-set artifact (the one of RULE_FILES by default)"""
+    global _ruleset
+    if _ruleset is None or (path is not None and _ruleset.path != path):
+        _ruleset = load_ruleset(path or ensure_artifact())
+    return _ruleset
+
+
+def get_ruleset() -> RuleSet:
+    return _ruleset if _ruleset is not None else attach()
+
+
+# Per-rule [seconds, files the rule ran on, matches] of the batch being scanned
+_timings: ContextVar[Optional[Dict[str, list]]] = ContextVar("rule_timings", default=None)
+
+
+@contextmanager
+def timing() -> Iterator[Dict[str, list]]:
+    """Collect the time each rule spends on the files scanned in this context"""
+    timings: Dict[str, list] = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def current_timings() -> Optional[Dict[str, list]]:
+    return _timings.get()
+
+
+def merge_timings(batches: List[Dict[str, list]]) -> List[dict]:
+    """Per-rule totals of the timings of every batch, slowest first"""
+    totals: Dict[str, list] = {}
+    for batch in batches:
+        for rule_id, (seconds, files, matches) in batch.items():
+            total = totals.setdefault(rule_id, [0.0, 0, 0])
+            total[0] += seconds
+            total[1] += files
+            total[2] += matches
+    report = [
+        {"rule_id": rule_id, "seconds": round(seconds, 4), "files": files, "matches": matches,
+         "us_per_file": round(seconds / files * 1e6, 1) if files else 0.0}
+        for rule_id, (seconds, files, matches) in totals.items()
+    ]
+    report.sort(key=lambda item: item["seconds"], reverse=True)
+    return report
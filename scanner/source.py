@@ -0,0 +1,122 @@
+"""
+File sources for scans
+A source lists (path, key) entries and opens a reader mapping a key to file bytes.
+Sources are plain picklable values so pool workers can open their own readers.
+"""
+
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from scanner.paths import PathFilter
+
+MAX_FILE_SIZE = 1024 * 1024
+SKIP_DIRS = {".git", ".hg", ".svn"}
+
+Reader = Callable[[str], Optional[bytes]]
+
+
+def read_ignore_file(path: str) -> List[str]:
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return f.read().splitlines()
+    except OSError:
+        return []
+
+
+def local_roots() -> List[str]:
+    """Directories local scans may read from (SCAN_LOCAL_ROOTS, os.pathsep separated)"""
+    return [os.path.realpath(root) for root in os.getenv("SCAN_LOCAL_ROOTS", "").split(os.pathsep) if root]
+
+
+def resolve_local(repository_url: str) -> str:
+    """Map a local path or file:// URL to a directory inside an allowed root"""
+    path = urlparse(repository_url).path if repository_url.startswith("file://") else repository_url
+    path = os.path.realpath(path)
+    for root in local_roots():
+        if path == root or path.startswith(root + os.sep):
+            if not os.path.isdir(path):
+                raise ValueError(f"Repository not found: {repository_url}")
+            return path
+    raise ValueError("Local repositories are not enabled for this path")
+
+
+@dataclass(frozen=True)
+class DirectorySource:
+    """Files of a directory tree, e.g. a working copy"""
+    root: str
+
+    def entries(self, path_filter: Optional[PathFilter] = None) -> List[Tuple[str, str]]:
+        """(path, path) for every selected file, pruning excluded directories during the walk"""
+        entries = []
+        stack = [("", path_filter or PathFilter())]
+        while stack:
+            directory, parent_filter = stack.pop()
+            absolute = os.path.join(self.root, directory)
+            dir_filter = parent_filter.with_ignore_file(directory, read_ignore_file(os.path.join(absolute, ".gitignore")))
+            try:
+                iterator = os.scandir(absolute)
+            except OSError:
+                continue
+            with iterator:
+                for entry in iterator:
+                    path = f"{directory}/{entry.name}" if directory else entry.name
+                    try:
+                        if entry.is_symlink():
+                            continue
+                        if entry.is_dir():
+                            if entry.name not in SKIP_DIRS and not dir_filter.excludes_dir(path):
+                                stack.append((path, dir_filter))
+                        elif entry.is_file() and dir_filter.selects(path) and entry.stat().st_size <= MAX_FILE_SIZE:
+                            entries.append((path, path))
+                    except OSError:
+                        continue
+        entries.sort()
+        return entries
+
+    def sizes(self, entries: List[Tuple[str, str]]) -> List[int]:
+        """Size in bytes of each entry's file, 0 when it is gone"""
+        sizes = []
+        for _, key in entries:
+            try:
+                sizes.append(os.path.getsize(os.path.join(self.root, key)))
+            except OSError:
+                sizes.append(0)
+        return sizes
+
+    @contextmanager
+    def open(self) -> Iterator[Reader]:
+        def read(key: str) -> Optional[bytes]:
+            path = os.path.join(self.root, key)
+            try:
+                if os.path.getsize(path) > MAX_FILE_SIZE:
+                    return None
+                with open(path, "rb") as f:
+                    return f.read()
+            except OSError:
+                return None
+        yield read
+
+
+def resolve_source(repository_url: str, commit: Optional[str] = None):
+    """
+    Source for a repository URL: remote URLs are read from an incrementally
+    fetched bare mirror, local git repositories from their object store
+    (a bare repository, or when a commit is given), other local directories
+    from the working tree
+    """
+    from scanner.git_source import GitSource, ensure_mirror, find_git_dir
+
+    parsed = urlparse(repository_url)
+    if parsed.scheme in ("", "file"):
+        root = resolve_local(repository_url)
+        git_dir = find_git_dir(root)
+        if git_dir is not None and (commit or git_dir == root):
+            return GitSource.at(git_dir, commit or "HEAD")
+        if commit:
+            raise ValueError(f"Not a git repository: {repository_url}")
+        return DirectorySource(root)
+    # ensure_mirror only accepts https URLs on SCAN_ALLOWED_HOSTS
+    return GitSource.at(ensure_mirror(repository_url), commit or "HEAD")
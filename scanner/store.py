@@ -0,0 +1,350 @@
+"""
+Persistent findings store
+Scan results are kept in SQLite (WAL mode) so findings can be queried and
+compared across scans, along with clients' resource subscriptions. Writes go
+through one writer thread per process that bulk-inserts each scan in batched
+transactions; readers use their own connections and never wait on the writer.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from scanner.findings import Finding, SEVERITIES, fingerprint
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.getenv("FINDINGS_DB", os.path.join(tempfile.gettempdir(), "vulngpt-findings.db"))
+INSERT_BATCH = 1000
+MAX_LIMIT = 1000
+# Seconds before a resource subscription the client never cancelled is dropped
+SUBSCRIPTION_TTL = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    repository TEXT NOT NULL,
+    commit_id TEXT,
+    scan_type TEXT NOT NULL,
+    files_scanned INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scans_repository ON scans (repository, id);
+CREATE INDEX IF NOT EXISTS scans_commit ON scans (repository, commit_id, id);
+
+CREATE TABLE IF NOT EXISTS findings (
+    scan_id INTEGER NOT NULL REFERENCES scans (id) ON DELETE CASCADE,
+    fingerprint TEXT NOT NULL,
+    rule_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    file TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    snippet TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS findings_scan ON findings (scan_id);
+CREATE INDEX IF NOT EXISTS findings_fingerprint ON findings (scan_id, fingerprint);
+CREATE INDEX IF NOT EXISTS findings_rule ON findings (scan_id, rule_id);
+CREATE INDEX IF NOT EXISTS findings_severity ON findings (scan_id, severity);
+CREATE INDEX IF NOT EXISTS findings_file ON findings (scan_id, file);
+
+CREATE TABLE IF NOT EXISTS subscriptions (
+    session TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    repository TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session, uri)
+);
+"""
+
+_COLUMNS = "rule_id, type, severity, file, line, description, snippet"
+# Finding fields in order, for reads
+_FIELDS = _COLUMNS + ", fingerprint"
+# Most severe first, then by location
+_ORDER = "CASE severity " + " ".join(f"WHEN '{s}' THEN {i}" for i, s in enumerate(SEVERITIES)) + f" ELSE {len(SEVERITIES)} END, file, line"
+
+# Findings of one scan (f) whose fingerprint is not in another
+_DIFFERENCE = (
+    "FROM findings AS f WHERE f.scan_id = ? AND NOT EXISTS "
+    "(SELECT 1 FROM findings AS o WHERE o.scan_id = ? AND o.fingerprint = f.fingerprint)"
+)
+
+_SCAN_FIELDS = ("id", "repository", "commit", "scan_type", "files_scanned", "created_at")
+
+_STOP = object()
+
+
+def normalize_repository(repository_url: str) -> str:
+    """Key for a repository, ignoring a trailing slash or .git"""
+    repository = repository_url.strip().rstrip("/")
+    return repository[:-4] if repository.endswith(".git") else repository
+
+
+def connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA foreign_keys=ON")
+    return connection
+
+
+def _finding(row) -> Finding:
+    return Finding(*row)
+
+
+class FindingsStore:
+    """Findings of past scans, written by a background thread"""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid: Optional[int] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        connection = connect(path)
+        try:
+            connection.executescript(SCHEMA)
+        finally:
+            connection.close()
+
+    # Writes
+
+    def record(self, repository_url: str, scan_type: str, result) -> Future:
+        """Queue a scan result for storage; the future resolves to the scan id"""
+        repository = normalize_repository(repository_url)
+        return self._submit(f"scan of {repository}", lambda connection: self._insert(connection, repository, scan_type, result))
+
+    def subscribe(self, session: str, uri: str, repository: str) -> Future:
+        """Record that a client session wants updates of a resource of a repository"""
+        def write(connection: sqlite3.Connection):
+            with connection:
+                connection.execute("DELETE FROM subscriptions WHERE created_at < ?", (time.time() - SUBSCRIPTION_TTL,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO subscriptions (session, uri, repository, created_at) VALUES (?, ?, ?, ?)",
+                    (session, uri, normalize_repository(repository), time.time()),
+                )
+        return self._submit(f"subscription to {uri}", write)
+
+    def unsubscribe(self, session: str, uri: str) -> Future:
+        def write(connection: sqlite3.Connection):
+            with connection:
+                connection.execute("DELETE FROM subscriptions WHERE session = ? AND uri = ?", (session, uri))
+        return self._submit(f"subscription to {uri}", write)
+
+    def _submit(self, description: str, task) -> Future:
+        future: Future = Future()
+        self._ensure_writer()
+        self._queue.put((description, task, future))
+        return future
+
+    def _ensure_writer(self):
+        # Threads do not survive fork, so each worker process starts its own
+        with self._lock:
+            if self._writer is None or self._writer_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._writer = threading.Thread(target=self._write_loop, name="findings-writer", daemon=True)
+                self._writer_pid = os.getpid()
+                self._writer.start()
+
+    def _write_loop(self):
+        connection = connect(self.path)
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            description, task, future = item
+            try:
+                future.set_result(task(connection))
+            except Exception as e:
+                logger.error(f"Could not store {description}: {e}")
+                future.set_exception(e)
+        connection.close()
+
+    def _insert(self, connection: sqlite3.Connection, repository: str, scan_type: str, result) -> int:
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO scans (repository, commit_id, scan_type, files_scanned, created_at) VALUES (?, ?, ?, ?, ?)",
+                (repository, result.commit, scan_type, result.files_scanned, time.time()),
+            )
+            scan_id = cursor.lastrowid
+        # One transaction per batch keeps the write lock short for other processes
+        findings = result.findings
+        for start in range(0, len(findings), INSERT_BATCH):
+            with connection:
+                connection.executemany(
+                    f"INSERT INTO findings (scan_id, fingerprint, {_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (scan_id, f.fingerprint or fingerprint(f), f.rule_id, f.type, f.severity, f.file, f.line, f.description, f.snippet)
+                        for f in findings[start:start + INSERT_BATCH]
+                    ],
+                )
+        return scan_id
+
+    def close(self, timeout: float = 30):
+        """Write out queued scans and stop the writer"""
+        if self._writer is not None and self._writer_pid == os.getpid():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+            self._writer = None
+
+    # Reads
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or getattr(self._local, "pid", None) != os.getpid():
+            connection = self._local.connection = connect(self.path)
+            self._local.pid = os.getpid()
+        return connection
+
+    def find_scan(self, repository_url: str, commit: Optional[str] = None, before: Optional[int] = None,
+                  other_than: Optional[str] = None) -> Optional[dict]:
+        """
+        Latest scan of a repository, optionally at a commit (full sha or prefix),
+        before another scan, or of a commit other than the given one
+        """
+        query = "SELECT id, repository, commit_id, scan_type, files_scanned, created_at FROM scans WHERE repository = ?"
+        params: list = [normalize_repository(repository_url)]
+        if commit:
+            query += " AND commit_id >= ? AND commit_id < ?"
+            params += [commit, commit + "\uffff"]
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        if other_than:
+            query += " AND (commit_id IS NULL OR commit_id != ?)"
+            params.append(other_than)
+        row = self._reader().execute(query + " ORDER BY id DESC LIMIT 1", params).fetchone()
+        if row is None:
+            return None
+        return dict(zip(_SCAN_FIELDS, row))
+
+    def list_scans(self, before: Optional[int] = None, limit: int = 50) -> List[dict]:
+        """Most recent scans first, optionally before a scan id"""
+        query = "SELECT id, repository, commit_id, scan_type, files_scanned, created_at FROM scans"
+        params: list = []
+        if before is not None:
+            query += " WHERE id < ?"
+            params.append(before)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(min(limit, MAX_LIMIT))
+        return [dict(zip(_SCAN_FIELDS, row)) for row in self._reader().execute(query, params)]
+
+    def scans_after(self, scan_id: int) -> List[Tuple[int, str]]:
+        """(id, repository) of scans stored after a scan id, oldest first"""
+        return self._reader().execute("SELECT id, repository FROM scans WHERE id > ? ORDER BY id", (scan_id,)).fetchall()
+
+    def last_scan_id(self) -> int:
+        return self._reader().execute("SELECT COALESCE(MAX(id), 0) FROM scans").fetchone()[0]
+
+    def changed(self, scan_id: int) -> bool:
+        """Whether a scan's findings differ from the previous scan of its repository"""
+        scan = self.get_scan(scan_id)
+        if scan is None:
+            return False
+        previous = self.find_scan(scan["repository"], before=scan_id)
+        if previous is None:
+            return True
+        reader = self._reader()
+        return any(
+            reader.execute(f"SELECT 1 {_DIFFERENCE} LIMIT 1", scans).fetchone() is not None
+            for scans in ((scan_id, previous["id"]), (previous["id"], scan_id))
+        )
+
+    def subscriptions(self, session: str, repository: str) -> List[str]:
+        """URIs a session subscribed to for a repository"""
+        rows = self._reader().execute("SELECT uri FROM subscriptions WHERE session = ? AND repository = ?", (session, repository))
+        return [uri for uri, in rows]
+
+    def get_finding(self, scan_id: int, fingerprint: str) -> Optional[Finding]:
+        row = self._reader().execute(
+            f"SELECT {_FIELDS} FROM findings WHERE scan_id = ? AND fingerprint = ? LIMIT 1", (scan_id, fingerprint)
+        ).fetchone()
+        return None if row is None else _finding(row)
+
+    def get_scan(self, scan_id: int) -> Optional[dict]:
+        row = self._reader().execute(
+            "SELECT id, repository, commit_id, scan_type, files_scanned, created_at FROM scans WHERE id = ?", (scan_id,)
+        ).fetchone()
+        return None if row is None else dict(zip(_SCAN_FIELDS, row))
+
+    def list_findings(self, scan_id: int, rule_id: Optional[str] = None, severity: Optional[str] = None,
+                      file: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[Finding]:
+        """Findings of a scan, filtered on the indexed columns; file matches a path prefix"""
+        query, params = self._findings_query(scan_id, rule_id, severity, file)
+        query += " ORDER BY rowid LIMIT ? OFFSET ?"
+        params += [min(limit, MAX_LIMIT), offset]
+        return [_finding(row[1:]) for row in self._reader().execute(query, params)]
+
+    def seek_findings(self, scan_id: int, rule_id: Optional[str] = None, severity: Optional[str] = None,
+                      file: Optional[str] = None, after: int = 0, limit: int = 100) -> Tuple[List[Finding], Optional[int]]:
+        """
+        A page of findings after a position, and the position the next page
+        starts after (None on the last page). Positions are row ids, so every
+        page is an index seek however deep it is.
+        """
+        query, params = self._findings_query(scan_id, rule_id, severity, file)
+        limit = max(1, min(limit, MAX_LIMIT))
+        query += " AND rowid > ? ORDER BY rowid LIMIT ?"
+        params += [after, limit + 1]
+        rows = self._reader().execute(query, params).fetchall()
+        following = rows[limit - 1][0] if len(rows) > limit else None
+        return [_finding(row[1:]) for row in rows[:limit]], following
+
+    @staticmethod
+    def _findings_query(scan_id: int, rule_id: Optional[str], severity: Optional[str], file: Optional[str]):
+        # Rows of a scan are inserted in report order (most severe first, then by location),
+        # so row id order is report order; the store never runs VACUUM, which could renumber them
+        query = f"SELECT rowid, {_FIELDS} FROM findings WHERE scan_id = ?"
+        params: list = [scan_id]
+        if rule_id:
+            query += " AND rule_id = ?"
+            params.append(rule_id)
+        if severity:
+            query += " AND severity = ?"
+            params.append(severity)
+        if file:
+            query += " AND file >= ? AND file < ?"
+            params += [file, file + "\uffff"]
+        return query, params
+
+    def count_findings(self, scan_id: int) -> Dict[str, int]:
+        rows = self._reader().execute("SELECT severity, COUNT(*) FROM findings WHERE scan_id = ? GROUP BY severity", (scan_id,))
+        return dict(rows.fetchall())
+
+    def diff(self, base_id: int, head_id: int, limit: int = MAX_LIMIT) -> dict:
+        """
+        Findings new in head and fixed since base, as set differences over the
+        fingerprint index; each list holds at most limit findings, and totals
+        counts them all when one was cut short (truncated)
+        """
+        reader = self._reader()
+        limit = max(1, min(limit, MAX_LIMIT))
+        diff: dict = {"totals": {}, "truncated": False}
+        for name, scans in (("new", (head_id, base_id)), ("fixed", (base_id, head_id))):
+            rows = reader.execute(f"SELECT {_FIELDS} {_DIFFERENCE} ORDER BY {_ORDER} LIMIT ?", (*scans, limit + 1)).fetchall()
+            diff[name] = [_finding(row) for row in rows[:limit]]
+            if len(rows) > limit:
+                diff["totals"][name] = reader.execute(f"SELECT COUNT(*) {_DIFFERENCE}", scans).fetchone()[0]
+                diff["truncated"] = True
+            else:
+                diff["totals"][name] = len(rows)
+        return diff
+
+
+_store: Optional[FindingsStore] = None
+
+
+def get_store() -> Optional[FindingsStore]:
+    """The process-wide store, None when FINDINGS_DB is set to an empty value"""
+    global _store
+    if _store is None and DB_PATH:
+        _store = FindingsStore(DB_PATH)
+    return _store
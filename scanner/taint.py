@@ -0,0 +1,635 @@
+"""
+Python source-to-sink taint analysis
+Tracks user input (request parameters, request bodies, route arguments, input(),
+sys.argv) into SQL, code-execution and shell sinks.
+
+Each module is analysed once into per-function summaries (which parameters reach
+which sinks, which parameters flow to the return value) plus the calls it makes
+into other modules. Results are cached by file hash in memory and on disk, so a
+rescan only reparses files that changed. Calls across modules are resolved in a
+final pass over the cached summaries without touching the ASTs again.
+"""
+
+import ast
+import copy
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from scanner.findings import Finding
+from scanner.rules import SCAN_TIERS
+
+logger = logging.getLogger(__name__)
+
+# Bump when the analysis changes so stale cache entries are ignored
+ANALYZER_VERSION = 1
+CACHE_DIR = os.getenv("TAINT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "vulngpt-taint"))
+MEMORY_CACHE_SIZE = 1024
+MAX_ROUNDS = 5
+
+SRC = "$src"
+Labels = FrozenSet[str]
+EMPTY: Labels = frozenset()
+
+REQUEST_NAMES = {"request", "req", "flask.request"}
+# request.args / request.form / request.query_params ...
+SOURCE_ATTRIBUTES = {
+    "args", "form", "values", "json", "data", "files", "cookies", "headers",
+    "query_params", "path_params", "GET", "POST", "body", "query_string",
+}
+# request.get_json() / await request.body() / await request.form() ...
+SOURCE_METHODS = {"get_json", "get_data", "body", "json", "form", "stream"}
+SOURCE_CALLS = {"input", "raw_input"}
+SOURCE_NAMES = {"sys.argv"}
+
+ROUTE_DECORATORS = {"get", "post", "put", "patch", "delete", "route", "api_route", "websocket"}
+# Route parameters with these annotations/defaults are framework objects, not input
+NON_INPUT_ANNOTATIONS = {"Request", "Response", "WebSocket", "BackgroundTasks", "Session"}
+
+# kind, rule id, severity
+SQL = ("SQL Injection", "TAINT-SQL", "High")
+CODE = ("Code Injection", "TAINT-CODE", "Critical")
+SHELL = ("Command Injection", "TAINT-SHELL", "Critical")
+
+SQL_METHODS = {"execute", "executemany", "executescript", "raw", "mogrify", "extra"}
+SINK_CALLS = {
+    "eval": CODE,
+    "exec": CODE,
+    "compile": CODE,
+    "os.system": SHELL,
+    "os.popen": SHELL,
+    "commands.getoutput": SHELL,
+    "subprocess.getoutput": SHELL,
+    "subprocess.getstatusoutput": SHELL,
+    "sqlalchemy.text": SQL,
+    "sqlalchemy.sql.text": SQL,
+}
+SUBPROCESS_CALLS = {"subprocess.run", "subprocess.call", "subprocess.Popen", "subprocess.check_output", "subprocess.check_call"}
+SANITIZERS = {"int", "float", "bool", "len", "abs", "round", "shlex.quote", "pipes.quote", "uuid.UUID"}
+
+SINK_KINDS = {kind[0]: kind for kind in (SQL, CODE, SHELL)}
+
+
+def module_name(path: str) -> str:
+    """'src/app/db.py' -> 'src.app.db', packages map to their directory"""
+    name = path[:-3] if path.endswith(".py") else path
+    parts = [part for part in name.split("/") if part]
+    if parts and parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def dotted(node: ast.AST) -> Optional[str]:
+    """'a.b.c' for a chain of Name/Attribute nodes, None otherwise"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return ".".join(reversed(parts))
+    return None
+
+
+class ModuleContext:
+    """Import aliases and local function table for one module"""
+
+    def __init__(self, name: str, is_package: bool, tree: ast.Module):
+        self.name = name
+        self.package = name if is_package else name.rpartition(".")[0]
+        self.aliases: Dict[str, str] = {}
+        self.functions: Dict[str, ast.AST] = {}
+        self.summaries: Dict[str, dict] = {}
+        self.methods: Dict[str, List[str]] = {}
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    self.aliases[alias.asname or alias.name.split(".")[0]] = alias.name if alias.asname else alias.name.split(".")[0]
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ""
+                if node.level:
+                    package = self.package.split(".") if self.package else []
+                    package = package[:len(package) - (node.level - 1)] if node.level > 1 else package
+                    base = ".".join(part for part in package + ([base] if base else []) if part)
+                for alias in node.names:
+                    self.aliases[alias.asname or alias.name] = f"{base}.{alias.name}" if base else alias.name
+
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.functions[node.name] = node
+            elif isinstance(node, ast.ClassDef):
+                for item in node.body:
+                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        self.functions[f"{node.name}.{item.name}"] = item
+                        self.methods.setdefault(item.name, []).append(f"{node.name}.{item.name}")
+
+    def resolve(self, name: str) -> str:
+        """Expand the first component of a dotted name through the import aliases"""
+        head, _, rest = name.partition(".")
+        if head in self.aliases:
+            return self.aliases[head] + ("." + rest if rest else "")
+        return name
+
+
+def _is_route(node) -> bool:
+    for decorator in node.decorator_list:
+        target = decorator.func if isinstance(decorator, ast.Call) else decorator
+        if isinstance(target, ast.Attribute) and target.attr in ROUTE_DECORATORS:
+            return True
+    return False
+
+
+def _parameters(node) -> List[ast.arg]:
+    args = node.args
+    return list(args.posonlyargs) + list(args.args) + ([args.vararg] if args.vararg else []) + list(args.kwonlyargs) + ([args.kwarg] if args.kwarg else [])
+
+
+def _is_framework_param(arg: ast.arg, default: Optional[ast.AST]) -> bool:
+    annotation = dotted(arg.annotation) if arg.annotation is not None else None
+    if annotation and annotation.rpartition(".")[2] in NON_INPUT_ANNOTATIONS:
+        return True
+    if isinstance(default, ast.Call) and (dotted(default.func) or "").rpartition(".")[2] in ("Depends", "Security"):
+        return True
+    return False
+
+
+class FunctionAnalysis:
+    """Abstract interpretation of one function body over taint label sets"""
+
+    def __init__(self, module: ModuleContext, qualname: str, node, record_calls: bool):
+        self.module = module
+        self.qualname = qualname
+        self.node = node
+        self.record_calls = record_calls
+        self.params: List[str] = []
+        self.returns: set = set()
+        self.sinks: Dict[str, List[dict]] = {}
+        self.findings: List[dict] = []
+        self.calls: List[dict] = []
+
+    def run(self) -> dict:
+        env: Dict[str, Labels] = {}
+        body = self.node.body
+        if isinstance(self.node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            params = _parameters(self.node)
+            defaults = [None] * (len(self.node.args.posonlyargs) + len(self.node.args.args) - len(self.node.args.defaults)) + list(self.node.args.defaults)
+            route = _is_route(self.node)
+            for index, arg in enumerate(params):
+                self.params.append(arg.arg)
+                if arg.arg in ("self", "cls"):
+                    continue
+                labels = {f"P{index}"}
+                default = defaults[index] if index < len(defaults) else None
+                if route and not _is_framework_param(arg, default):
+                    labels.add(SRC)
+                env[arg.arg] = frozenset(labels)
+        self.block(body, env)
+        return {
+            "params": self.params,
+            "returns": sorted(self.returns),
+            "sinks": self.sinks,
+        }
+
+    # Statements
+
+    def block(self, statements, env):
+        for statement in statements:
+            self.statement(statement, env)
+
+    def branches(self, env, *blocks):
+        """Run each block on a copy of env and merge the results back"""
+        results = []
+        for statements in blocks:
+            branch = dict(env)
+            self.block(statements, branch)
+            results.append(branch)
+        for branch in results:
+            for name, labels in branch.items():
+                env[name] = env.get(name, EMPTY) | labels
+
+    def assign(self, target, labels: Labels, env, strong: bool = True):
+        if isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self.assign(element, labels, env, strong)
+        elif isinstance(target, ast.Starred):
+            self.assign(target.value, labels, env, strong)
+        elif isinstance(target, ast.Name):
+            env[target.id] = labels if strong else env.get(target.id, EMPTY) | labels
+        elif isinstance(target, ast.Attribute):
+            name = dotted(target)
+            if name:
+                env[name] = labels if strong else env.get(name, EMPTY) | labels
+        elif isinstance(target, ast.Subscript):
+            # d[k] = v taints the container without clearing earlier taint
+            self.expr(target.slice, env)
+            self.assign(target.value, labels, env, strong=False)
+
+    def statement(self, node, env):
+        if isinstance(node, ast.Assign):
+            labels = self.expr(node.value, env)
+            for target in node.targets:
+                self.assign(target, labels, env)
+        elif isinstance(node, ast.AnnAssign):
+            if node.value is not None:
+                self.assign(node.target, self.expr(node.value, env), env)
+        elif isinstance(node, ast.AugAssign):
+            self.assign(node.target, self.expr(node.value, env) | self.expr(node.target, env), env)
+        elif isinstance(node, ast.Return):
+            if node.value is not None:
+                self.returns |= self.expr(node.value, env)
+        elif isinstance(node, ast.If):
+            self.expr(node.test, env)
+            self.branches(env, node.body, node.orelse)
+        elif isinstance(node, (ast.For, ast.AsyncFor)):
+            self.assign(node.target, self.expr(node.iter, env), env, strong=False)
+            # Twice, so taint assigned late in the body reaches uses early in it
+            self.branches(env, node.body + node.body, node.orelse)
+        elif isinstance(node, ast.While):
+            self.expr(node.test, env)
+            self.branches(env, node.body + node.body, node.orelse)
+        elif isinstance(node, (ast.With, ast.AsyncWith)):
+            for item in node.items:
+                labels = self.expr(item.context_expr, env)
+                if item.optional_vars is not None:
+                    self.assign(item.optional_vars, labels, env)
+            self.block(node.body, env)
+        elif isinstance(node, ast.Try) or type(node).__name__ == "TryStar":
+            self.block(node.body, env)
+            self.branches(env, *[handler.body for handler in node.handlers], node.orelse)
+            self.block(node.finalbody, env)
+        elif isinstance(node, ast.Match):
+            labels = self.expr(node.subject, env)
+            for case in node.cases:
+                for name in (n.name for n in ast.walk(case.pattern) if isinstance(n, (ast.MatchAs, ast.MatchStar)) and n.name):
+                    env[name] = env.get(name, EMPTY) | labels
+            self.branches(env, *[case.body for case in node.cases])
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Import, ast.ImportFrom)):
+            return
+        else:
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.expr):
+                    self.expr(child, env)
+
+    # Expressions
+
+    def expr(self, node, env) -> Labels:
+        if node is None or isinstance(node, ast.Constant):
+            return EMPTY
+        if isinstance(node, ast.Name):
+            return env.get(node.id, EMPTY)
+        if isinstance(node, ast.Attribute):
+            name = dotted(node)
+            if name is not None:
+                resolved = self.module.resolve(name)
+                if resolved in SOURCE_NAMES:
+                    return frozenset({SRC})
+                if node.attr in SOURCE_ATTRIBUTES and self._is_request(node.value):
+                    return frozenset({SRC})
+                if name in env:
+                    return env[name]
+            return self.expr(node.value, env)
+        if isinstance(node, ast.Subscript):
+            # The index is evaluated for sinks but does not taint the element
+            self.expr(node.slice, env)
+            return self.expr(node.value, env)
+        if isinstance(node, ast.Call):
+            return self.call(node, env)
+        if isinstance(node, ast.Await):
+            return self.expr(node.value, env)
+        if isinstance(node, ast.NamedExpr):
+            labels = self.expr(node.value, env)
+            self.assign(node.target, labels, env)
+            return labels
+        if isinstance(node, (ast.Compare, ast.Lambda)):
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, ast.expr) and not isinstance(node, ast.Lambda):
+                    self.expr(child, env)
+            return EMPTY
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+            scope = dict(env)
+            labels = EMPTY
+            for generator in node.generators:
+                self.assign(generator.target, self.expr(generator.iter, scope), scope)
+                for condition in generator.ifs:
+                    self.expr(condition, scope)
+            if isinstance(node, ast.DictComp):
+                return labels | self.expr(node.key, scope) | self.expr(node.value, scope)
+            return labels | self.expr(node.elt, scope)
+
+        # BinOp, BoolOp, JoinedStr, FormattedValue, IfExp, containers, Starred ...
+        labels = EMPTY
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.expr):
+                labels = labels | self.expr(child, env)
+        return labels
+
+    def _is_request(self, node) -> bool:
+        name = dotted(node)
+        return name is not None and (name in REQUEST_NAMES or self.module.resolve(name) in REQUEST_NAMES)
+
+    def call(self, node: ast.Call, env) -> Labels:
+        args = [self.expr(arg, env) for arg in node.args]
+        kwargs = {kw.arg: self.expr(kw.value, env) for kw in node.keywords}
+        argument_labels = frozenset().union(*args, *kwargs.values())
+
+        func = node.func
+        name = dotted(func)
+        resolved = self.module.resolve(name) if name else None
+        receiver = self.expr(func.value, env) if isinstance(func, ast.Attribute) else EMPTY
+
+        # Sources
+        if resolved in SOURCE_CALLS:
+            return frozenset({SRC})
+        if isinstance(func, ast.Attribute) and func.attr in SOURCE_METHODS and self._is_request(func.value):
+            return frozenset({SRC})
+        if isinstance(func, ast.Attribute) and func.attr in ("get", "getlist", "get_all") and isinstance(func.value, ast.Attribute) \
+                and func.value.attr in SOURCE_ATTRIBUTES and self._is_request(func.value.value):
+            return frozenset({SRC})
+
+        # Sinks
+        sink = None
+        if resolved in SINK_CALLS:
+            sink = SINK_CALLS[resolved]
+        elif isinstance(func, ast.Attribute) and func.attr in SQL_METHODS:
+            sink = SQL
+        elif resolved in SUBPROCESS_CALLS and node.args:
+            shell = any(kw.arg == "shell" and not (isinstance(kw.value, ast.Constant) and not kw.value.value) for kw in node.keywords)
+            if shell or not isinstance(node.args[0], (ast.List, ast.Tuple)):
+                sink = SHELL
+        if sink is not None:
+            first = args[0] if args else kwargs.get("sql", kwargs.get("statement", kwargs.get("args", EMPTY)))
+            self.reach_sink(sink, resolved or (func.attr if isinstance(func, ast.Attribute) else "call"), first, node.lineno)
+            return EMPTY
+
+        if resolved in SANITIZERS:
+            return EMPTY
+
+        # Calls into functions of this module use their summaries
+        local = self._local_function(func, name)
+        if local is not None:
+            summary = self.module.summaries.get(local)
+            if summary is None:
+                return argument_labels | receiver
+            method = isinstance(func, ast.Attribute)
+            # Recorded too: finalize() may extend the callee's sinks through other modules
+            self.record_call(f"{self.module.name}.{local}", node, args, kwargs, argument_labels,
+                             local=True, offset=1 if method and summary["params"][:1] in (["self"], ["cls"]) else 0)
+            return self.apply_summary(local, summary, node, args, kwargs, method=method)
+
+        # Calls into other modules are resolved after every module is summarised
+        if resolved and "." in resolved:
+            self.record_call(resolved, node, args, kwargs, argument_labels)
+        return argument_labels | receiver
+
+    def record_call(self, callee: str, node, args, kwargs, argument_labels: Labels, local: bool = False, offset: int = 0):
+        if not self.record_calls or not argument_labels:
+            return
+        self.calls.append({
+            "callee": callee,
+            "line": node.lineno,
+            "args": [sorted(labels) for labels in args],
+            "kwargs": {key: sorted(labels) for key, labels in kwargs.items() if key},
+            "local": local,
+            "offset": offset,
+        })
+
+    def _local_function(self, func, name: Optional[str]) -> Optional[str]:
+        if isinstance(func, ast.Name) and func.id in self.module.functions:
+            return func.id
+        if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id in ("self", "cls"):
+            owner = self.qualname.rpartition(".")[0]
+            candidate = f"{owner}.{func.attr}"
+            if candidate in self.module.functions:
+                return candidate
+        if name and name in self.module.functions:
+            return name
+        if isinstance(func, ast.Attribute) and (name is None or name.partition(".")[0] not in self.module.aliases):
+            # obj.method(): without type inference, accept a method name defined by exactly one class
+            candidates = self.module.methods.get(func.attr, [])
+            if len(candidates) == 1:
+                return candidates[0]
+        return None
+
+    def apply_summary(self, callee: str, summary: dict, node, args, kwargs, method: bool) -> Labels:
+        params = summary["params"]
+        offset = 1 if method and params and params[0] in ("self", "cls") else 0
+        bound: Dict[int, Labels] = {}
+        for index, labels in enumerate(args):
+            bound[index + offset] = labels
+        for key, labels in kwargs.items():
+            if key in params:
+                bound[params.index(key)] = labels
+
+        for index, labels in bound.items():
+            for sink in summary["sinks"].get(str(index), []):
+                self.reach_sink(SINK_KINDS[sink["kind"]], f"{callee}() -> {sink['sink']}", labels, node.lineno, via=sink)
+
+        result = set()
+        for label in summary["returns"]:
+            if label == SRC:
+                result.add(SRC)
+            elif label.startswith("P") and int(label[1:]) in bound:
+                result |= bound[int(label[1:])]
+        return frozenset(result)
+
+    def reach_sink(self, sink, sink_name: str, labels: Labels, line: int, via: Optional[dict] = None):
+        kind = sink[0]
+        if SRC in labels:
+            self.findings.append({"kind": kind, "line": line, "sink": sink_name, "via": via})
+        for label in labels:
+            if label.startswith("P"):
+                record = {"kind": kind, "sink": sink_name, "line": line}
+                records = self.sinks.setdefault(label[1:], [])
+                if record not in records:
+                    records.append(record)
+
+
+def analyze_module(path: str, text: str) -> Optional[dict]:
+    """Parse and summarise one module; returns None when it does not parse"""
+    try:
+        tree = ast.parse(text, filename=path)
+    except (SyntaxError, ValueError):
+        return None
+
+    module = ModuleContext(module_name(path), path.endswith("__init__.py"), tree)
+    units = [("<module>", tree)] + list(module.functions.items())
+
+    # Iterate to a fixpoint so summaries of callees are applied at call sites
+    for _ in range(MAX_ROUNDS):
+        changed = False
+        for qualname, node in units[1:]:
+            summary = FunctionAnalysis(module, qualname, node, record_calls=False).run()
+            if module.summaries.get(qualname) != summary:
+                module.summaries[qualname] = summary
+                changed = True
+        if not changed:
+            break
+
+    findings, calls = [], []
+    for qualname, node in units:
+        analysis = FunctionAnalysis(module, qualname, node, record_calls=True)
+        analysis.run()
+        findings.extend(analysis.findings)
+        calls.extend({**call, "caller": qualname} for call in analysis.calls)
+
+    return {
+        "module": module.name,
+        "functions": module.summaries,
+        "findings": findings,
+        "calls": calls,
+    }
+
+
+_memory_cache: "OrderedDict[str, Optional[dict]]" = OrderedDict()
+
+
+def _cache_key(path: str, text: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(path.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8", errors="replace"))
+    return f"v{ANALYZER_VERSION}-{digest.hexdigest()}"
+
+
+def analyze_cached(path: str, text: str) -> Optional[dict]:
+    """analyze_module backed by an in-process LRU and an on-disk cache keyed by file hash"""
+    key = _cache_key(path, text)
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+
+    cache_file = os.path.join(CACHE_DIR, key[:len(f"v{ANALYZER_VERSION}-") + 2], key + ".json")
+    analysis = None
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            analysis = json.load(f)
+    except (OSError, ValueError):
+        analysis = analyze_module(path, text)
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cache_file))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(analysis, f)
+            os.replace(tmp, cache_file)
+        except OSError as e:
+            logger.warning(f"Could not write taint cache entry: {e}")
+
+    _memory_cache[key] = analysis
+    if len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+    return analysis
+
+
+def _finding(path: str, record: dict, text_lines: Optional[List[str]] = None) -> Finding:
+    kind, rule_id, severity = SINK_KINDS[record["kind"]]
+    via = record.get("via")
+    where = f" (line {via['line']})" if via else ""
+    return Finding(
+        rule_id=rule_id,
+        type=kind,
+        severity=severity,
+        file=path,
+        line=record["line"],
+        description=f"User input flows into {record['sink']}{where}",
+        snippet=text_lines[record["line"] - 1].strip()[:200] if text_lines and record["line"] <= len(text_lines) else "",
+    )
+
+
+class TaintDetector:
+    """Intra-module findings per file, cross-module findings in finalize()"""
+    name = "taint"
+    languages = frozenset({"python"})
+
+    def enabled(self, path: str, scan_type: str) -> bool:
+        return SCAN_TIERS.get(scan_type, 0) >= SCAN_TIERS["deep"]
+
+    def scan(self, path: str, text: str, scan_type: str) -> List[Finding]:
+        if not self.enabled(path, scan_type):
+            return []
+        analysis = analyze_cached(path, text)
+        if analysis is None:
+            return []
+        lines = text.split("\n")
+        seen = set()
+        findings = []
+        for record in analysis["findings"]:
+            key = (record["line"], record["kind"], record["sink"])
+            if key not in seen:
+                seen.add(key)
+                findings.append(_finding(path, record, lines))
+        return findings
+
+    def summarize(self, path: str, text: str, scan_type: str) -> Optional[dict]:
+        """Module summary for finalize(); served from the cache filled by scan()"""
+        if not self.enabled(path, scan_type):
+            return None
+        analysis = analyze_cached(path, text)
+        if analysis is None:
+            return None
+        if not analysis["calls"] and not any(function["sinks"] for function in analysis["functions"].values()):
+            return None
+        return {"path": path, **analysis}
+
+    def finalize(self, summaries: List[dict], scan_type: str) -> List[Finding]:
+        """Resolve calls between modules against every module's summaries"""
+        # Summaries may be shared with the analysis cache, and are extended below
+        summaries = copy.deepcopy(summaries)
+        # Sinks of local callees were already reported by scan(); only new ones count
+        original = {
+            (summary["module"], qualname): [json.dumps(sink, sort_keys=True) for sinks in function["sinks"].values() for sink in sinks]
+            for summary in summaries for qualname, function in summary["functions"].items()
+        }
+        index: Dict[str, Tuple[dict, str]] = {}
+        for summary in summaries:
+            parts = summary["module"].split(".")
+            for qualname, function in summary["functions"].items():
+                # Register every suffix so both 'src.app.db.f' and 'app.db.f' resolve
+                for start in range(len(parts)):
+                    index.setdefault(".".join(parts[start:] + [qualname]), (function, summary["path"]))
+
+        findings: Dict[Tuple[str, int, str], Finding] = {}
+        for _ in range(MAX_ROUNDS):
+            changed = False
+            for summary in summaries:
+                for call in summary["calls"]:
+                    target = index.get(call["callee"])
+                    if target is None:
+                        continue
+                    callee, callee_path = target
+                    params = callee["params"]
+                    bound = {i + call.get("offset", 0): labels for i, labels in enumerate(call["args"])}
+                    for key, labels in call["kwargs"].items():
+                        if key in params:
+                            bound[params.index(key)] = labels
+                    known = original.get((summary["module"], call["callee"][len(summary["module"]) + 1:]), []) if call.get("local") else []
+                    for position, labels in bound.items():
+                        for sink in callee["sinks"].get(str(position), []):
+                            if json.dumps(sink, sort_keys=True) in known:
+                                continue
+                            sink_name = f"{call['callee']}() -> {sink['sink']}"
+                            if SRC in labels:
+                                key = (summary["path"], call["line"], sink["kind"])
+                                if key not in findings:
+                                    findings[key] = _finding(summary["path"], {
+                                        "kind": sink["kind"], "line": call["line"], "sink": sink_name,
+                                        "via": {"line": sink["line"]},
+                                    })
+                                    findings[key].description += f" in {callee_path}"
+                            # Propagate the sink to the caller's own parameters
+                            caller = summary["functions"].get(call["caller"])
+                            for label in labels:
+                                if caller is None or not label.startswith("P"):
+                                    continue
+                                record = {"kind": sink["kind"], "sink": sink_name, "line": call["line"]}
+                                records = caller["sinks"].setdefault(label[1:], [])
+                                if record not in records:
+                                    records.append(record)
+                                    changed = True
+            if not changed:
+                break
+        return list(findings.values())
@@ -0,0 +1,26 @@
+"""
+Offset/line helpers shared by detectors
+"""
+
+from bisect import bisect_right
+from typing import List
+
+
+def line_starts(text: str) -> List[int]:
+    """Offsets of the first character of every line, for offset -> line lookups"""
+    starts = [0]
+    index = text.find("\n")
+    while index != -1:
+        starts.append(index + 1)
+        index = text.find("\n", index + 1)
+    return starts
+
+
+def line_of(starts: List[int], offset: int) -> int:
+    """1-based line number of a character offset"""
+    return bisect_right(starts, offset)
+
+
+def snippet_at(text: str, starts: List[int], line: int) -> str:
+    end = starts[line] - 1 if line < len(starts) else len(text)
+    return text[starts[line - 1]:end].strip()[:200]
@@ -0,0 +1,223 @@
+"""
+Production launcher for the MCP server
+Warms caches once, then pre-forks uvicorn workers sharing one listening socket
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("serve")
+
+# app_simple is the app with the MCP JSON-RPC endpoint, the frontend and /scan
+DEFAULT_APP = "app_simple:app"
+# A worker exiting sooner than this many seconds after it was forked failed to start
+MIN_WORKER_UPTIME = 10
+# Seconds before a worker that failed to start is replaced, doubled per consecutive failure
+RESPAWN_BACKOFF = 1.0
+RESPAWN_BACKOFF_MAX = 30.0
+# Consecutive startup failures after which the supervisor stops and exits
+MAX_STARTUP_FAILURES = 5
+
+
+def _optional(module: str, fallback: str) -> str:
+    """Use uvloop/httptools when installed, otherwise uvicorn's defaults"""
+    try:
+        importlib.import_module(module)
+        return module
+    except ImportError:
+        return fallback
+
+
+def load_app(target: str):
+    """Import 'module:attribute' and run the module's warmup hook if it has one"""
+    module_name, _, attribute = target.partition(":")
+    module = importlib.import_module(module_name)
+    warmup = getattr(module, "warmup", None)
+    if callable(warmup):
+        started = time.perf_counter()
+        warmup()
+        logger.info(f"Warmup of {module_name} took {(time.perf_counter() - started) * 1000:.1f}ms")
+    return getattr(module, attribute or "app")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the VulnGPT MCP server")
+    parser.add_argument("--app", default=os.getenv("APP_MODULE", DEFAULT_APP),
+                        help="ASGI app as module:attribute (default: %(default)s)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("KEEP_ALIVE", 5)),
+                        help="Seconds to keep idle connections open")
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("BACKLOG", 2048)))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", 30)),
+                        help="Seconds to let in-flight requests (scans) finish on shutdown")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    parser.add_argument("--forwarded-allow-ips", default=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+                        help="Proxy addresses trusted to set X-Forwarded-For/-Proto, comma separated or * "
+                             "(default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+def build_config(app, args) -> uvicorn.Config:
+    return uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        loop=_optional("uvloop", "asyncio"),
+        http=_optional("httptools", "h11"),
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        backlog=args.backlog,
+        log_level=args.log_level,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+    )
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, args, sock: socket.socket):
+    """Body of a forked worker; never returns"""
+    code = 0
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        uvicorn.Server(build_config(app, args)).run(sockets=[sock])
+    except Exception as e:
+        logger.error(f"Worker {os.getpid()} crashed: {e}")
+        code = 1
+    finally:
+        os._exit(code)
+
+
+class Supervisor:
+    """
+    Forks workers after warmup and replaces any that die; workers that keep
+    failing right after they start are replaced with a growing delay, and after
+    MAX_STARTUP_FAILURES in a row the supervisor stops
+    """
+
+    def __init__(self, app, args, sock: socket.socket):
+        self.app = app
+        self.args = args
+        self.sock = sock
+        # pid -> monotonic time it was forked
+        self.workers = {}
+        # Monotonic times at which to fork replacements, earliest first
+        self.respawns = []
+        self.failures = 0
+        self.stopping = False
+        self.exit_code = 0
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(self.app, self.args, self.sock)
+        self.workers[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def replace(self, pid: int, status: int):
+        """Schedule a replacement for a worker that exited, or give up on repeated startup failures"""
+        uptime = time.monotonic() - self.workers.pop(pid)
+        if self.stopping:
+            return
+        if uptime >= MIN_WORKER_UPTIME:
+            self.failures = 0
+            logger.warning(f"Worker {pid} exited with status {status}, replacing it")
+            self.respawns.insert(0, time.monotonic())
+            return
+        self.failures += 1
+        if self.failures >= MAX_STARTUP_FAILURES:
+            logger.error(f"Workers failed to start {self.failures} times in a row, stopping")
+            self.exit_code = 1
+            self.respawns = []
+            self.stop(None, None)
+            return
+        delay = min(RESPAWN_BACKOFF * 2 ** (self.failures - 1), RESPAWN_BACKOFF_MAX)
+        logger.warning(f"Worker {pid} exited with status {status} {uptime:.1f}s after starting, "
+                       f"replacing it in {delay:.1f}s")
+        self.respawns.append(time.monotonic() + delay)
+        self.respawns.sort()
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        if signum is not None:
+            logger.info(f"Received signal {signum}, draining {len(self.workers)} workers")
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+
+        deadline = None
+        while self.workers or (self.respawns and not self.stopping):
+            now = time.monotonic()
+            if not self.stopping and self.respawns and self.respawns[0] <= now:
+                self.respawns.pop(0)
+                self.spawn()
+                continue
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + self.args.graceful_timeout + 5
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning("Graceful timeout exceeded, killing remaining workers")
+                for pid in self.workers:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                deadline = float("inf")
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG) if self.workers else (0, 0)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.2)
+                continue
+            if pid in self.workers:
+                self.replace(pid, status)
+        logger.info("All workers stopped")
+        return self.exit_code
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = load_app(args.app)
+
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        uvicorn.Server(build_config(app, args)).run()
+        return
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    logger.info(f"Serving {args.app} on {args.host}:{args.port} with {args.workers} workers")
+    return Supervisor(app, args, sock).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+In-memory static asset cache for the frontend
+Assets are read once, with gzip/brotli variants and strong ETags precomputed
+"""
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from compression import negotiate_encoding
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Versioned assets (?v=... in the URL) never change under the same URL
+VERSIONED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unversioned assets (the landing page) must be revalidated with the ETag
+DEFAULT_CACHE_CONTROL = "public, no-cache"
+
+
+@dataclass
+class StaticAsset:
+    """A single asset with its precomputed encodings"""
+    name: str
+    path: str
+    mtime: float
+    media_type: str
+    etag: str
+    body: bytes
+    gzip_body: Optional[bytes] = None
+    br_body: Optional[bytes] = None
+
+
+def _load_asset(name: str, path: str) -> StaticAsset:
+    """Read a file and precompute its ETag and compressed variants"""
+    with open(path, "rb") as f:
+        body = f.read()
+    mtime = os.stat(path).st_mtime
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    asset = StaticAsset(
+        name=name,
+        path=path,
+        mtime=mtime,
+        media_type=media_type,
+        etag=hashlib.sha256(body).hexdigest()[:32],
+        body=body,
+    )
+
+    # Only keep a variant when it actually saves bytes
+    gz = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(gz) < len(body):
+        asset.gzip_body = gz
+    if brotli is not None:
+        br = brotli.compress(body, quality=11)
+        if len(br) < len(body):
+            asset.br_body = br
+    return asset
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110)"""
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+class StaticAssetCache:
+    """Serves files from a directory out of memory"""
+
+    def __init__(self, directory: str, reload: bool = False):
+        self.directory = os.path.abspath(directory)
+        self.reload = reload
+        self._assets: Dict[str, StaticAsset] = {}
+        self._loaded = False
+
+    def load_all(self) -> int:
+        """Load every file under the directory, returns the number of assets"""
+        self._loaded = True
+        if not os.path.isdir(self.directory):
+            return 0
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                self._assets[name] = _load_asset(name, path)
+        logger.info(f"Loaded {len(self._assets)} static assets from {self.directory}")
+        return len(self._assets)
+
+    def _resolve(self, name: str) -> Optional[str]:
+        """Map an asset name to a path inside the directory, or None"""
+        path = os.path.abspath(os.path.join(self.directory, name))
+        if not path.startswith(self.directory + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        """Return the cached asset, reloading it on mtime change in reload mode"""
+        if not self._loaded:
+            self.load_all()
+        asset = self._assets.get(name)
+        if not self.reload:
+            return asset
+
+        path = asset.path if asset else self._resolve(name)
+        if path is None:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            self._assets.pop(name, None)
+            return None
+        if asset is None or mtime != asset.mtime:
+            asset = self._assets[name] = _load_asset(name, path)
+        return asset
+
+    def response(self, request: Request, name: str, versioned: bool = False) -> Optional[Response]:
+        """Build a response for an asset, honouring If-None-Match and Accept-Encoding"""
+        asset = self.get(name)
+        if asset is None:
+            return None
+
+        variants = {"br": asset.br_body, "gzip": asset.gzip_body}
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""),
+                                      [coding for coding, variant in variants.items() if variant is not None])
+        body = variants[encoding] if encoding else asset.body
+
+        # Each representation gets its own strong ETag
+        etag = f"{asset.etag}-{encoding}" if encoding else asset.etag
+        headers = {
+            "ETag": f'"{etag}"',
+            "Cache-Control": VERSIONED_CACHE_CONTROL if versioned else DEFAULT_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=asset.media_type, headers=headers)
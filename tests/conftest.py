@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GIT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "Test", "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "Test", "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def run_git(cwd, *args) -> str:
+    result = subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True,
+                            env={**os.environ, **GIT_IDENTITY})
+    return result.stdout.decode().strip()
+
+
+def write(root, path: str, data):
+    full = os.path.join(root, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "wb") as f:
+        f.write(data.encode() if isinstance(data, str) else data)
+
+
+@pytest.fixture
+def local_root(tmp_path, monkeypatch):
+    """A directory local scans may read from"""
+    monkeypatch.setenv("SCAN_LOCAL_ROOTS", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def git_repo(local_root):
+    """
+    A working copy with two commits: the first adds app.py, lib/util.py and an
+    ignored build output, the second changes app.py and adds a symlink
+    """
+    repo = local_root / "repo"
+    repo.mkdir()
+    run_git(repo, "init", "-q", "-b", "main")
+    write(repo, "app.py", "import os\nos.system(cmd)\n")
+    write(repo, "lib/util.py", "def helper():\n    return 1\n")
+    write(repo, ".gitignore", "generated/\n")
+    write(repo, "generated/out.py", "eval(x)\n")
+    run_git(repo, "add", "-A")
+    run_git(repo, "add", "-f", "generated/out.py")
+    run_git(repo, "commit", "-q", "-m", "first")
+    write(repo, "app.py", "import os\nos.system(cmd)\neval(data)\n")
+    os.symlink("app.py", repo / "link.py")
+    run_git(repo, "add", "-A")
+    run_git(repo, "commit", "-q", "-m", "second")
+    return repo
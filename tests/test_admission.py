@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+from admission import CHEAP, HEAVY, MAX_CLASSIFY_BODY, NORMAL, AdmissionController, AdmissionMiddleware, classify
+
+
+def call(tool, arguments, request_id=1):
+    return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": {"name": tool, "arguments": arguments}}
+
+
+def body(message) -> bytes:
+    return json.dumps(message).encode()
+
+
+def oversized(tool) -> bytes:
+    return body(call(tool, {"tokens": ["x" * 100] * (MAX_CLASSIFY_BODY // 100)}))
+
+
+def test_classify_small_bodies():
+    assert classify("POST", "/mcp", body(call("validate", {"token": "t"}))) == CHEAP
+    assert classify("POST", "/mcp", body(call("validate_batch", {"tokens": ["t"]}))) == NORMAL
+    assert classify("POST", "/mcp", body(call("scan_repository", {}))) == HEAVY
+    assert classify("POST", "/mcp", body([call("validate", {}), call("scan_repository", {})])) == HEAVY
+    assert classify("POST", "/validate/batch", b"x" * 4 * MAX_CLASSIFY_BODY) == NORMAL
+
+
+def test_unparseable_body_is_not_cheap():
+    assert classify("POST", "/mcp", b'{"method": "ping"') == NORMAL
+    assert classify("POST", "/mcp/tools/call", b"not json") == NORMAL
+
+
+def test_oversized_body_is_not_cheap():
+    assert classify("POST", "/mcp", oversized("validate")) == NORMAL
+    assert classify("POST", "/mcp", oversized("validate_batch")) == NORMAL
+    assert classify("POST", "/mcp", oversized("scan_repository")) == HEAVY
+    # Nothing known about the calls in the part read
+    padding = b'{"jsonrpc": "2.0", "padding": "' + b"x" * MAX_CLASSIFY_BODY
+    assert classify("POST", "/mcp", padding + b'", "method": "ping"}') == HEAVY
+
+
+def run_middleware(data: bytes, chunk: int = 16 * 1024):
+    controller = AdmissionController(max_in_flight=10, max_normal=10, max_heavy=10)
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["in_flight"] = list(controller.in_flight)
+        received = b""
+        while True:
+            message = await receive()
+            received += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        seen["body"] = received
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    chunks = [data[start:start + chunk] for start in range(0, len(data), chunk)]
+    messages = [{"type": "http.request", "body": part, "more_body": index < len(chunks) - 1}
+                for index, part in enumerate(chunks)]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "POST", "path": "/mcp", "headers": []}
+    asyncio.run(AdmissionMiddleware(app, controller)(scope, receive, send))
+    return seen, controller
+
+
+def test_middleware_admits_oversized_body_as_normal():
+    data = oversized("validate")
+    seen, controller = run_middleware(data)
+    assert seen["in_flight"] == [0, 1, 0]
+    assert seen["body"] == data
+    assert controller.in_flight == [0, 0, 0]
+
+
+def test_streams_are_capped_apart_from_requests():
+    controller = AdmissionController(max_in_flight=1, max_normal=1, max_heavy=1, max_streams=2)
+    statuses = []
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        if scope["headers"]:
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def request(method, headers):
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append((method, message["status"]))
+        scope = {"type": "http", "method": method, "path": "/mcp", "headers": headers}
+        await AdmissionMiddleware(app, controller)(scope, receive, send)
+
+    async def main():
+        stream = [(b"accept", b"text/event-stream")]
+        tasks = [asyncio.ensure_future(request("GET", stream)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert controller.streams == 2
+        assert controller.in_flight == [0, 0, 0]
+        # The open streams leave room for requests
+        await request("GET", [])
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert sorted(statuses) == [("GET", 200), ("GET", 200), ("GET", 200), ("GET", 503)]
+    assert controller.streams == 0
+    assert controller.stats()["streams"] == {"open": 0, "shed": 1}
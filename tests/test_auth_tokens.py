@@ -0,0 +1,59 @@
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+
+import auth_tokens
+from auth_tokens import InvalidToken, TokenVerifier, _b64encode
+
+KEYS = {"k1": b"secret"}
+
+
+def signed(header: dict, claims: dict, key: bytes = KEYS["k1"]) -> str:
+    signing_input = f"{_b64encode(json.dumps(header).encode())}.{_b64encode(json.dumps(claims).encode())}"
+    signature = hmac.new(key, signing_input.encode("ascii"), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64encode(signature)}"
+
+
+def claims(**extra) -> dict:
+    return {"phone_number": "919876543210", "exp": time.time() + 60, "jti": "j", **extra}
+
+
+@pytest.fixture
+def verifier(monkeypatch):
+    verifier = TokenVerifier(KEYS)
+    monkeypatch.setattr(auth_tokens, "_verifier", verifier)
+    return verifier
+
+
+@pytest.mark.parametrize("kid", [[1], {"k": 1}, 1, None])
+def test_non_string_kid_is_an_unknown_key(verifier, kid):
+    token = signed({"alg": "HS256", "kid": kid}, claims())
+    with pytest.raises(InvalidToken, match="Unknown signing key"):
+        verifier.verify(token)
+    assert isinstance(verifier.verify_many([token])[token], InvalidToken)
+    assert auth_tokens.phone_number(token) is None
+
+
+@pytest.mark.parametrize("phone", [919876543210, ["919876543210"], None])
+def test_non_string_phone_number_claim(verifier, phone):
+    token = signed({"alg": "HS256", "kid": "k1"}, claims(phone_number=phone))
+    assert auth_tokens.phone_number(token) is None
+    assert isinstance(auth_tokens.phone_numbers([token])[token], InvalidToken)
+
+
+def test_valid_token(verifier):
+    token = verifier.issue("919876543210")
+    assert auth_tokens.phone_number(token) == "919876543210"
+    assert auth_tokens.phone_numbers([token]) == {token: "919876543210"}
+
+
+def test_validate_endpoint_rejects_unhashable_kid(verifier):
+    from fastapi.testclient import TestClient
+    from app_simple import app
+
+    token = signed({"alg": "HS256", "kid": [1]}, claims())
+    response = TestClient(app).post("/validate", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
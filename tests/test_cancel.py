@@ -0,0 +1,65 @@
+import threading
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+
+import app_simple
+from scanner import cancel
+
+AUTHORIZED = {"Authorization": "Bearer puch_ai_token_123"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    started = threading.Event()
+
+    async def slow_tool(request, tool_name, arguments):
+        started.set()
+        for _ in range(100):
+            cancel.check()
+            await anyio.sleep(0.01)
+        return app_simple.Outcome.error(-32000, "not cancelled", status_code=500)
+
+    monkeypatch.setattr(app_simple, "dispatch_tool", slow_tool)
+    with TestClient(app_simple.app) as client:
+        client.post("/mcp", json={"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}})
+        client.started = started
+        yield client
+
+
+def call_and_cancel(client, call_headers: dict, cancel_headers: dict):
+    """Status of a tools/call while a notifications/cancelled for its id is sent alongside"""
+    response = {}
+
+    def call():
+        response["call"] = client.post("/mcp", headers=call_headers, json={
+            "jsonrpc": "2.0", "id": 7, "method": "tools/call", "params": {"name": "slow", "arguments": {}}})
+
+    client.started.clear()
+    thread = threading.Thread(target=call)
+    thread.start()
+    assert client.started.wait(5)
+    client.post("/mcp", headers=cancel_headers, json={
+        "jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": 7, "reason": "stop"}})
+    thread.join(10)
+    return response["call"].status_code
+
+
+def test_session_cancels_its_own_request(client):
+    session = {"Mcp-Session-Id": "s1"}
+    assert call_and_cancel(client, session, session) == 499
+
+
+def test_authenticated_caller_cancels_its_own_request(client):
+    assert call_and_cancel(client, AUTHORIZED, AUTHORIZED) == 499
+
+
+def test_anonymous_callers_cannot_cancel(client):
+    assert call_and_cancel(client, {}, {}) == 500
+    assert not app_simple.in_flight_requests
+
+
+def test_other_session_cannot_cancel(client):
+    assert call_and_cancel(client, {"Mcp-Session-Id": "s1"}, {"Mcp-Session-Id": "s2"}) == 500
+    assert call_and_cancel(client, AUTHORIZED, {"Authorization": "Bearer demo_token_456"}) == 500
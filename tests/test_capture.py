@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from capture import MAX_CAPTURE_BODY, REDACTED, CaptureMiddleware, redact_body
+
+TOKENS = [f"tok{index:05d}.{'s' * 20}" for index in range(3000)]
+
+
+def capture(tmp_path, path: str, body: bytes, content_type: bytes = b"application/json",
+            response: bytes = b'{"ok":true}') -> dict:
+    output = tmp_path / "capture.jsonl"
+
+    async def app(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": response})
+
+    chunks = [body[start:start + 16384] for start in range(0, len(body), 16384)] or [b""]
+    messages = [{"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+                for index, chunk in enumerate(chunks)]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        pass
+
+    middleware = CaptureMiddleware(app, str(output), sample_rate=1.0)
+    scope = {"type": "http", "method": "POST", "path": path, "query_string": b"",
+             "headers": [(b"content-type", content_type), (b"authorization", b"Bearer secret-token")]}
+    asyncio.run(middleware(scope, receive, send))
+    middleware.writer.close()
+    text = output.read_text()
+    return json.loads(text)
+
+
+def test_truncated_json_body_is_not_kept(tmp_path):
+    body = json.dumps({"tokens": TOKENS}).encode()
+    assert len(body) > MAX_CAPTURE_BODY
+    record = capture(tmp_path, "/validate/batch", body)
+    assert record["truncated"] is True
+    assert record["body"] is None
+    assert record["body_size"] == len(body)
+    assert "tok0" not in json.dumps(record)
+    assert record["headers"]["authorization"] == f"Bearer {REDACTED}"
+
+
+def test_small_json_body_is_redacted_by_key(tmp_path):
+    record = capture(tmp_path, "/validate/batch", json.dumps({"tokens": TOKENS[:3], "limit": 5}).encode())
+    assert json.loads(record["body"]) == {"tokens": REDACTED, "limit": 5}
+
+
+def test_truncated_response_is_not_kept(tmp_path):
+    response = json.dumps({"results": ["919876543210"] * 10000}).encode()
+    record = capture(tmp_path, "/validate/batch", b"{}", response=response)
+    assert record["response_truncated"] is True
+    assert record["response"] is None
+    assert "9198765" not in json.dumps(record)
+
+
+def test_unparseable_json_is_dropped():
+    assert redact_body(b'{"tokens": ["abc.def.ghi"', "application/json") is None
+    # Without a JSON content type too: the body still looks like JSON
+    assert redact_body(b'{"tokens": ["abc.def.ghi"', "text/plain") is None
+    assert redact_body(b"Bearer abc.def 919876543210", "text/plain") == f"{REDACTED} {REDACTED}"
@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+
+import pytest
+
+from conftest import write
+from scanner import cluster
+from scanner.cluster import FILE_COST, ShardFailed, make_shards, scan_shard
+from scanner.engine import scan_path, scan_source
+from scanner.source import DirectorySource
+
+SNIPPETS = ["eval(data)\n", "import os\nos.system(cmd)\n", "import pickle\npickle.loads(blob)\n", "x = 1\n"]
+
+
+@pytest.fixture
+def project(local_root):
+    root = local_root / "project"
+    for index in range(24):
+        padding = "# filler\n" * (index * 7 % 50)
+        write(root, f"pkg{index % 3}/module{index}.py", padding + SNIPPETS[index % len(SNIPPETS)])
+    write(root, "web/page.js", "eval(location.hash)\n")
+    return root
+
+
+class StubNodes:
+    """Stands in for the worker nodes: each URL scans shards in process, fails, or hangs until aborted"""
+
+    def __init__(self, monkeypatch, behaviours: dict):
+        self.behaviours = behaviours
+        self.calls = []
+        self.aborted = []
+        self.lock = threading.Lock()
+        monkeypatch.setattr(cluster, "SCAN_NODES", list(behaviours))
+        monkeypatch.setattr(cluster, "SCAN_NODE_SECRET", "secret")
+        monkeypatch.setattr(cluster, "DISTRIBUTE_THRESHOLD", 1)
+        monkeypatch.setattr(cluster, "POLL", 0.01)
+        monkeypatch.setattr(cluster, "STRAGGLER_MIN", 0.2)
+        monkeypatch.setattr(cluster._Call, "run", lambda call, body, timeout: self.run(call, body))
+
+    def run(stub, call, body: bytes) -> dict:
+        params = json.loads(body)["params"]
+        behaviour = stub.behaviours[call.node.url]
+        with stub.lock:
+            stub.calls.append((call.node.url, call.shard.index))
+        if callable(behaviour):
+            behaviour = behaviour(call.shard)
+        if behaviour == "fail":
+            raise ShardFailed("HTTP 500")
+        if behaviour == "hang":
+            deadline = time.monotonic() + 10
+            while not call.aborted and time.monotonic() < deadline:
+                time.sleep(0.01)
+            with stub.lock:
+                stub.aborted.append((call.node.url, call.shard.index))
+            raise OSError("Connection reset")
+        return json.loads(json.dumps(scan_shard(params)))
+
+    def nodes(self, shard_index: int):
+        return sorted(url for url, index in self.calls if index == shard_index)
+
+
+def report(result) -> tuple:
+    return [finding.to_dict() for finding in result.findings], result.files_scanned, result.skipped
+
+
+def scan_distributed(root):
+    return scan_source(DirectorySource(str(root)), "full", repository_url=str(root))
+
+
+def test_make_shards_balances_cost():
+    entries = [(f"f{index}", f"f{index}") for index in range(100)]
+    sizes = [(index * 7919) % 20000 for index in range(100)]
+    shards = make_shards(entries, sizes, 8)
+    assert len(shards) == 8
+    assert sorted(entry for shard in shards for entry in shard.entries) == sorted(entries)
+    costs = [shard.cost for shard in shards]
+    assert costs == sorted(costs, reverse=True)
+    assert sum(costs) == sum(sizes) + FILE_COST * len(entries)
+    # Largest first onto the cheapest shard: no shard exceeds another by more than one file
+    assert costs[0] - costs[-1] <= max(sizes) + FILE_COST
+    assert all(shard.entries == sorted(shard.entries) for shard in shards)
+
+
+def test_make_shards_never_makes_empty_shards():
+    entries = [("a", "a"), ("b", "b")]
+    shards = make_shards(entries, [10, 20], 8)
+    assert len(shards) == 2
+    assert [shard.entries for shard in shards] == [[("b", "b")], [("a", "a")]]
+    assert make_shards(entries, [1, 1], 0)[0].entries == entries
+
+
+def test_sharded_scan_matches_local_scan(project, monkeypatch):
+    nodes = StubNodes(monkeypatch, {"http://a": "ok", "http://b": "ok"})
+    distributed = scan_distributed(project)
+    assert {url for url, _ in nodes.calls} == {"http://a", "http://b"}
+    assert distributed.findings
+    assert report(distributed) == report(scan_path(str(project), "full"))
+
+
+def test_failed_node_shards_go_to_other_nodes(project, monkeypatch):
+    nodes = StubNodes(monkeypatch, {"http://a": "fail", "http://b": "ok"})
+    distributed = scan_distributed(project)
+    failed = {index for url, index in nodes.calls if url == "http://a"}
+    assert failed
+    # Every shard the failed node was given was scanned again on the other one
+    assert all("http://b" in nodes.nodes(index) for index in failed)
+    assert report(distributed) == report(scan_path(str(project), "full"))
+
+
+def test_coordinator_scans_when_every_node_fails(project, monkeypatch):
+    StubNodes(monkeypatch, {"http://a": "fail", "http://b": "fail"})
+    assert report(scan_distributed(project)) == report(scan_path(str(project), "full"))
+
+
+def test_straggler_is_copied_to_an_idle_node(project, monkeypatch):
+    slow = {}
+
+    def first_shard_hangs(shard):
+        slow.setdefault("index", shard.index)
+        return "hang" if shard.index == slow["index"] else "ok"
+
+    nodes = StubNodes(monkeypatch, {"http://a": first_shard_hangs, "http://b": "ok"})
+    distributed = scan_distributed(project)
+    assert nodes.nodes(slow["index"]) == ["http://a", "http://b"]
+    # The copy finished first and the original call was dropped; its thread returns soon after
+    deadline = time.monotonic() + 5
+    while not nodes.aborted and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert nodes.aborted == [("http://a", slow["index"])]
+    assert report(distributed) == report(scan_path(str(project), "full"))
+
+
+@pytest.mark.parametrize("params", [
+    None,
+    [],
+    {"entries": [["a.py", "a.py"]]},
+    {"repository_url": "x", "entries": "a.py"},
+    {"repository_url": "x", "entries": [["a.py", "a.py"]], "commit": 1},
+    {"repository_url": "x", "entries": [["a.py"]]},
+    {"repository_url": "x", "entries": [["a.py", 1]]},
+    {"repository_url": "x", "entries": [("a.py", "a.py", "b")]},
+    {"repository_url": "x", "entries": [["a.py", "/etc/passwd"]]},
+    {"repository_url": "x", "entries": [["a.py", "../outside.py"]]},
+    {"repository_url": "x", "entries": [["a.py", "pkg/../../outside.py"]]},
+])
+def test_scan_shard_rejects_invalid_params(params):
+    with pytest.raises(ValueError):
+        scan_shard(params)
+
+
+def test_scan_shard_scans_given_entries(project):
+    result = scan_shard({"repository_url": str(project), "scan_type": "quick",
+                         "entries": [["pkg0/module0.py", "pkg0/module0.py"], ["pkg1/module1.py", "pkg1/module1.py"]]})
+    assert result["files_scanned"] == 2
+    assert {finding["file"] for finding in result["findings"]} == {"pkg0/module0.py", "pkg1/module1.py"}
+    assert isinstance(result["summaries"], dict)
+
+
+def test_scan_shard_requires_a_local_root(tmp_path, monkeypatch):
+    monkeypatch.setenv("SCAN_LOCAL_ROOTS", str(tmp_path / "elsewhere"))
+    with pytest.raises(ValueError):
+        scan_shard({"repository_url": str(tmp_path), "entries": [["a.py", "a.py"]]})
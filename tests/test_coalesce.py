@@ -0,0 +1,174 @@
+import json
+
+import anyio
+import pytest
+
+import coalesce
+from coalesce import IdempotencyConflict, Outcome, ResponseCache, ToolCalls, call_key
+from scanner import cancel
+
+ARGUMENTS = {"repository_url": "https://github.com/example/repo", "scan_type": "quick"}
+
+
+class Tool:
+    """A tool execution counting its runs; it finishes once released"""
+
+    def __init__(self, outcome: Outcome = Outcome.result({"ok": True})):
+        self.outcome = outcome
+        self.runs = 0
+        self.cancelled = 0
+        self.released = False
+
+    async def __call__(self) -> Outcome:
+        self.runs += 1
+        try:
+            while not self.released:
+                cancel.check()
+                await anyio.sleep(0.01)
+        except cancel.Cancelled:
+            self.cancelled += 1
+            raise
+        return self.outcome
+
+
+def test_call_keys_ignore_spelling_differences():
+    key = call_key("p", "scan_repository", ARGUMENTS)
+    assert call_key("p", "scan_repository", {"scan_type": " quick ", "commit": "",
+                                              "repository_url": "https://github.com/example/repo.git/"}) == key
+    assert call_key("q", "scan_repository", ARGUMENTS) != key
+    assert call_key("p", "list_findings", ARGUMENTS) != key
+    assert call_key("p", "scan_repository", {**ARGUMENTS, "scan_type": "deep"}) != key
+
+
+def test_response_body_splices_the_shared_member():
+    body = Outcome.result({"findings": ["ä"]}).response_body("r-1")
+    assert json.loads(body) == {"jsonrpc": "2.0", "id": "r-1", "result": {"findings": ["ä"]}}
+    assert json.loads(Outcome.error(-32602, "bad").response_body(None))["error"] == {"code": -32602, "message": "bad"}
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    calls, tool, other = ToolCalls(), Tool(), Tool()
+    results = []
+
+    async def call(arguments, execute):
+        results.append(await calls.call("Bearer a", "scan_repository", arguments, None, execute))
+
+    async def main():
+        async with anyio.create_task_group() as group:
+            for _ in range(5):
+                group.start_soon(call, ARGUMENTS, tool)
+            group.start_soon(call, {**ARGUMENTS, "repository_url": ARGUMENTS["repository_url"] + ".git"}, tool)
+            group.start_soon(call, {**ARGUMENTS, "scan_type": "deep"}, other)
+            await anyio.sleep(0.1)
+            tool.released = True
+            other.released = True
+
+    anyio.run(main)
+    assert (tool.runs, other.runs) == (1, 1)
+    assert len(results) == 7
+    # Later identical calls without an idempotency key run again
+    anyio.run(call, ARGUMENTS, tool)
+    assert tool.runs == 2
+
+
+def test_idempotency_key_replays_the_response():
+    calls, tool = ToolCalls(), Tool()
+    tool.released = True
+
+    async def call(authorization, arguments, key="retry-1"):
+        return await calls.call(authorization, "scan_repository", arguments, key, tool)
+
+    first = anyio.run(call, "Bearer a", ARGUMENTS)
+    assert anyio.run(call, "Bearer a", ARGUMENTS) is first
+    assert tool.runs == 1
+    with pytest.raises(IdempotencyConflict, match="different arguments"):
+        anyio.run(call, "Bearer a", {**ARGUMENTS, "scan_type": "deep"})
+    with pytest.raises(IdempotencyConflict, match="longer than"):
+        anyio.run(call, "Bearer a", ARGUMENTS, "k" * 256)
+    # Keys are per caller
+    anyio.run(call, "Bearer b", ARGUMENTS)
+    assert tool.runs == 2
+
+
+def test_server_errors_are_not_replayed():
+    calls, tool = ToolCalls(), Tool(Outcome.error(-32603, "boom", status_code=500))
+    tool.released = True
+    for _ in range(2):
+        anyio.run(calls.call, "Bearer a", "scan_repository", ARGUMENTS, "retry-1", tool)
+    assert tool.runs == 2
+
+
+def test_response_cache_evicts_by_size_and_age(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(coalesce.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(max_bytes=100, ttl=10)
+    outcome = Outcome.result("x" * 38)
+    assert len(outcome.body) == 40
+    for index in range(3):
+        cache.put(("p", str(index)), "k", outcome)
+    assert cache.get(("p", "0")) is None
+    assert cache.get(("p", "1")) == ("k", outcome) and cache.size == 80
+    cache.put(("p", "big"), "k", Outcome.result("x" * 200))
+    assert cache.get(("p", "big")) is None and cache.size == 80
+    now[0] = 11
+    assert cache.get(("p", "2")) is None
+    cache.put(("p", "3"), "k", outcome)
+    assert cache.size == 40
+
+
+def test_execution_outlives_one_caller_but_not_all():
+    calls, tool = ToolCalls(), Tool()
+    scopes = [cancel.CancelScope(), cancel.CancelScope()]
+    outcomes = []
+
+    async def call(scope):
+        with cancel.activate(scope):
+            try:
+                outcomes.append(await calls.call("Bearer a", "scan_repository", ARGUMENTS, None, tool))
+            except cancel.Cancelled:
+                outcomes.append("cancelled")
+
+    async def main():
+        async with anyio.create_task_group() as group:
+            group.start_soon(call, scopes[0])
+            group.start_soon(call, scopes[1])
+            await anyio.sleep(0.05)
+            scopes[0].cancel()
+            await anyio.sleep(0.3)
+            assert tool.cancelled == 0
+            scopes[1].cancel()
+        await anyio.sleep(0.1)
+
+    anyio.run(main)
+    assert outcomes == ["cancelled", "cancelled"]
+    assert (tool.runs, tool.cancelled) == (1, 1)
+
+
+def test_abandoned_execution_is_not_joined():
+    calls, scope = ToolCalls(), cancel.CancelScope()
+    runs, outcomes = [], []
+
+    async def slow_to_notice():
+        runs.append(1)
+        await anyio.sleep(0.3)
+        cancel.check()
+        return Outcome.result(len(runs))
+
+    async def call(caller):
+        with cancel.activate(caller):
+            try:
+                outcomes.append(await calls.call("Bearer a", "scan_repository", ARGUMENTS, None, slow_to_notice))
+            except cancel.Cancelled as e:
+                outcomes.append(str(e))
+
+    async def main():
+        async with anyio.create_task_group() as group:
+            group.start_soon(call, scope)
+            await anyio.sleep(0.05)
+            scope.cancel("gone")
+            await anyio.sleep(0.15)
+            # The first execution has not noticed its cancellation when the next caller arrives
+            group.start_soon(call, cancel.CancelScope())
+
+    anyio.run(main)
+    assert outcomes == ["gone", Outcome.result(2)]
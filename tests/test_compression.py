@@ -0,0 +1,107 @@
+import asyncio
+import json
+import zlib
+
+import pytest
+
+from compression import CompressionMiddleware, negotiate_encoding
+
+SUPPORTED = ["br", "zstd", "gzip"]
+REPORT = json.dumps({"findings": [{"rule_id": "PY-EVAL", "file": f"app{i}.py", "line": i} for i in range(200)]}).encode()
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("GZIP", "gzip"),
+    ("br;q=0, gzip;q=0.8, zstd;q=0.9", "zstd"),
+    ("br;q=0.1, gzip", "gzip"),
+    ("*", "br"),
+    ("*;q=0.5, br;q=0", "zstd"),
+    ("gzip;q=0", None),
+    ("gzip;q=nonsense", None),
+    ("identity, deflate", None),
+    ("", None),
+])
+def test_negotiate_encoding(accept_encoding, encoding):
+    assert negotiate_encoding(accept_encoding, SUPPORTED) == encoding
+
+
+def run(app, accept_encoding="gzip", **options):
+    """Messages sent for one GET through the middleware (gzip only, as when brotli/zstd are missing)"""
+    middleware = CompressionMiddleware(app, **options)
+    middleware.supported = ["gzip"]
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(middleware(scope, receive, send))
+    return sent
+
+
+def responder(chunks, content_type=b"application/json", status=200, headers=()):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", content_type), *headers]})
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+    return app
+
+
+def headers(start) -> dict:
+    return {name: value for name, value in start["headers"]}
+
+
+def gunzip(data: bytes) -> bytes:
+    return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+def test_large_body_is_compressed_with_its_length():
+    start, body = run(responder([REPORT]))
+    assert headers(start)[b"content-encoding"] == b"gzip"
+    assert headers(start)[b"vary"] == b"Accept-Encoding"
+    assert int(headers(start)[b"content-length"]) == len(body["body"]) < len(REPORT)
+    assert gunzip(body["body"]) == REPORT
+
+
+@pytest.mark.parametrize("app, accept_encoding, body", [
+    (responder([b'{"ok": true}']), "gzip", b'{"ok": true}'),
+    (responder([REPORT]), "identity", REPORT),
+    (responder([REPORT], content_type=b"image/png"), "gzip", REPORT),
+    (responder([b""], status=304), "gzip", b""),
+])
+def test_responses_left_alone(app, accept_encoding, body):
+    start, *bodies = run(app, accept_encoding)
+    assert b"content-encoding" not in headers(start)
+    assert b"".join(message["body"] for message in bodies) == body
+
+
+def test_encoded_response_is_not_encoded_again():
+    start, body = run(responder([REPORT], headers=[(b"content-encoding", b"br")]))
+    assert headers(start)[b"content-encoding"] == b"br"
+    assert body["body"] == REPORT
+
+
+def test_stream_chunks_decompress_as_they_arrive():
+    lines = [json.dumps({"file": f"app{i}.py"}).encode() + b"\n" for i in range(5)]
+    start, *bodies = run(responder(lines, content_type=b"application/x-ndjson"))
+    assert headers(start)[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers(start)
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Each chunk is flushed, so a client sees every line without waiting for the end
+    assert [decoder.decompress(body["body"]) for body in bodies] == lines
+    assert [body["more_body"] for body in bodies] == [True] * 4 + [False]
+
+
+def test_chunked_body_past_offload_size_is_compressed_incrementally():
+    chunks = [REPORT[i:i + 1000] for i in range(0, len(REPORT), 1000)]
+    start, *bodies = run(responder(chunks), offload_size=4000)
+    assert headers(start)[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers(start)
+    assert len(bodies) > 1
+    assert gunzip(b"".join(body["body"] for body in bodies)) == REPORT
@@ -0,0 +1,69 @@
+import math
+from collections import Counter
+
+import pytest
+
+from scanner import credentials
+from scanner.credentials import SecretDetector, shannon_entropy
+
+AWS_KEY = "AKIA" + "ABCDEFGHIJKLMNOP"
+TOKEN = "q8Zr3LmX0vTk9WbPj2YsNc7HdFg4Ue1A"
+
+
+def entropy(token: bytes) -> float:
+    counts = Counter(token)
+    return -sum(n / len(token) * math.log2(n / len(token)) for n in counts.values())
+
+
+def test_entropy_matches_the_definition():
+    tokens = [b"aaaa", b"abab", b"abcd", TOKEN.encode(), b"0123456789abcdef" * 2, b"x"]
+    scores, is_hex = shannon_entropy(tokens)
+    assert scores == pytest.approx([entropy(token) for token in tokens])
+    assert list(is_hex) == [True, True, True, False, True, False]
+
+
+def test_entropy_batches_agree(monkeypatch):
+    tokens = [bytes([65 + i % 26]) * (1 + i % 7) + bytes(range(97, 97 + i % 20)) for i in range(50)]
+    whole = shannon_entropy(tokens)
+    monkeypatch.setattr(credentials, "ENTROPY_BATCH", 8)
+    batched = shannon_entropy(tokens)
+    assert list(batched[0]) == pytest.approx(list(whole[0]))
+    assert list(batched[1]) == list(whole[1])
+    assert [len(part) for part in shannon_entropy([])] == [0, 0]
+
+
+def scan(text: str, scan_type: str = "quick", path: str = "config.py"):
+    return [(f.rule_id, f.line) for f in SecretDetector().scan(path, text, scan_type)]
+
+
+def test_provider_key_is_reported_redacted():
+    findings = SecretDetector().scan("settings.py", f'x = 1\nkey = "{AWS_KEY}"\n', "quick")
+    assert [(f.rule_id, f.line) for f in findings] == [("SECRET-AWS-ACCESS-KEY", 2)]
+    assert AWS_KEY not in findings[0].snippet
+    assert "AKIA****" in findings[0].snippet
+
+
+def test_assignments_are_scored_by_entropy():
+    assert scan(f'password = "{TOKEN}"\n') == [("SECRET-HARDCODED-CREDENTIAL", 1)]
+    assert scan('password = "aaaaaaaaaaaa"\n') == []
+    # Words, placeholders and names that are not secrets
+    assert scan('password = "correct-horse"\n') == []
+    assert scan('api_key = "your_api_key_here"\n') == []
+    assert scan(f'token_type = "{TOKEN}"\n') == []
+
+
+def test_quoted_tokens_need_a_deep_scan():
+    text = f'headers = {{"X-Auth": "{TOKEN}"}}\n'
+    assert scan(text, "quick") == []
+    assert scan(text, "deep") == [("SECRET-HIGH-ENTROPY", 1)]
+    # Hex needs less entropy per character than mixed alphabets
+    assert scan('digest = ["8f14e45fceea167a5a36dedd4bea2543"]\n', "deep") == [("SECRET-HIGH-ENTROPY", 1)]
+    assert scan('name = "abcdefghijabcdefghijabcdefghij"\n', "deep") == []
+
+
+def test_provider_match_is_not_reported_twice():
+    assert scan(f'aws_access_key = "{AWS_KEY}"\n', "deep") == [("SECRET-AWS-ACCESS-KEY", 1)]
+
+
+def test_lockfiles_are_skipped():
+    assert scan(f'"integrity": "{TOKEN}"\n', "deep", path="web/package-lock.json") == []
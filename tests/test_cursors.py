@@ -0,0 +1,108 @@
+import base64
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app_simple
+import cursors
+from cursors import InvalidCursor, decode, encode
+from scanner import store as findings_store
+from scanner.engine import ScanResult
+from scanner.findings import Finding
+from scanner.store import FindingsStore
+
+POSITION = {"scan": 12, "after": 340, "severity": "High", "limit": 50}
+
+
+def raw(cursor: str) -> bytes:
+    return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+
+
+def pack(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def test_round_trip():
+    cursor = encode("findings", POSITION)
+    assert cursor.isascii() and "=" not in cursor
+    assert decode("findings", cursor) == POSITION
+
+
+def test_edited_cursors_are_rejected():
+    data = raw(encode("findings", POSITION))
+    signature, payload = data[:cursors.SIGNATURE_SIZE], data[cursors.SIGNATURE_SIZE:]
+    edited = payload.replace(b'"after":340', b'"after":0')
+    tampered = [
+        pack(signature + edited),
+        pack(signature[:-1] + bytes([signature[-1] ^ 1]) + payload),
+        pack(data[:-1]),
+        pack(data[:cursors.SIGNATURE_SIZE]),
+        pack(signature + json.dumps([1, 2]).encode()),
+        "",
+        "not a cursor!",
+        "é",
+    ]
+    for cursor in tampered:
+        with pytest.raises(InvalidCursor):
+            decode("findings", cursor)
+
+
+def test_cursor_is_bound_to_its_kind_and_secret(monkeypatch):
+    cursor = encode("tools", {"after": "scan_repository"})
+    with pytest.raises(InvalidCursor):
+        decode("findings", cursor)
+    monkeypatch.setattr(cursors, "CURSOR_SECRET", b"another server")
+    with pytest.raises(InvalidCursor):
+        decode("tools", cursor)
+    # A signed list is still not a position
+    with pytest.raises(InvalidCursor):
+        decode("tools", encode("tools", [1]))
+
+
+def test_tools_list_pages_and_rejects_forged_cursors(monkeypatch):
+    monkeypatch.setattr(app_simple, "TOOLS_PAGE_SIZE", 2)
+    with TestClient(app_simple.app) as client:
+        client.post("/mcp", json={"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}})
+
+        def tools_list(cursor=None):
+            return client.post("/mcp", json={"jsonrpc": "2.0", "id": 1, "method": "tools/list",
+                                             "params": {"cursor": cursor} if cursor else {}})
+
+        names, cursor = [], None
+        while True:
+            result = tools_list(cursor).json()["result"]
+            names += [tool["name"] for tool in result["tools"]]
+            cursor = result.get("nextCursor")
+            if cursor is None:
+                break
+        assert names == [tool["name"] for tool in app_simple.TOOLS]
+
+        for forged in (encode("tools", {"after": "no_such_tool"}), encode("findings", {"after": names[1]}), "abc"):
+            response = tools_list(forged)
+            assert response.status_code == 400
+            assert response.json()["error"] == {"code": -32602, "message": "Invalid cursor"}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = FindingsStore(str(tmp_path / "findings.db"))
+    monkeypatch.setattr(findings_store, "_store", store)
+    yield store
+    store.close()
+
+
+def test_findings_cursor_keeps_its_scan_and_filters(store):
+    findings = [Finding("R", "Type", "High" if i % 2 else "Low", f"f{i}.py", 1, "d") for i in range(9)]
+    for finding in findings:
+        finding.fingerprint = finding.file
+    store.record("https://example.com/repo", "quick", ScanResult(findings, len(findings), "a")).result()
+    page = app_simple.query_findings({"repository_url": "https://example.com/repo", "severity": "High", "limit": 3})
+    files = [finding["file"] for finding in page["findings"]]
+    while "nextCursor" in page:
+        # Filters given next to a cursor are ignored; the cursor carries its own
+        page = app_simple.query_findings({"cursor": page["nextCursor"], "severity": "Low"})
+        files += [finding["file"] for finding in page["findings"]]
+    assert sorted(files) == [f"f{i}.py" for i in range(1, 9, 2)]
+    with pytest.raises(InvalidCursor):
+        app_simple.query_findings({"cursor": encode("findings", {"scan": 999, "after": 0})})
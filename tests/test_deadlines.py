@@ -0,0 +1,101 @@
+import time
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+
+import app_simple
+import deadlines
+from conftest import write
+from scanner import cancel
+from scanner.engine import scan_path
+
+TOOL_CALL = {"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": {"name": "slow", "arguments": {}}}
+
+
+@pytest.mark.parametrize("value, timeout", [("2.5", 2.5), ("0", None), ("-1", None), ("soon", None), (None, None)])
+def test_parse_timeout(value, timeout):
+    assert deadlines.parse_timeout(value) == timeout
+
+
+def test_scope_deadline_and_timeouts():
+    scope = cancel.CancelScope()
+    assert cancel.timeout(30) == 30
+    with cancel.activate(scope):
+        assert cancel.timeout(30) == 30
+        scope.shorten(5)
+        assert 4 < cancel.timeout(30) <= 5
+        assert cancel.timeout(1) == 1
+        scope.shorten(60)
+        assert scope.remaining() <= 5
+        scope.deadline = time.time() - 1
+        with pytest.raises(cancel.DeadlineExceeded):
+            cancel.timeout(30)
+        with pytest.raises(cancel.DeadlineExceeded):
+            cancel.check()
+    assert cancel.current() is None
+    cancel.check()
+
+
+def test_explicit_cancel_keeps_the_first_reason():
+    scope = cancel.CancelScope(time.time() + 60)
+    scope.cancel("Client disconnected")
+    scope.cancel("later")
+    with pytest.raises(cancel.Cancelled, match="Client disconnected") as error:
+        scope.check()
+    assert not isinstance(error.value, cancel.DeadlineExceeded)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def slow_tool(request, tool_name, arguments):
+        for _ in range(500):
+            cancel.check()
+            await anyio.sleep(0.01)
+        return app_simple.Outcome.error(-32000, "no deadline", status_code=500)
+
+    monkeypatch.setattr(app_simple, "dispatch_tool", slow_tool)
+    with TestClient(app_simple.app) as client:
+        client.post("/mcp", json={"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}})
+        yield client
+
+
+def timed_call(client, body: dict, headers: dict):
+    started = time.monotonic()
+    response = client.post("/mcp", headers=headers, json=body)
+    return response, time.monotonic() - started
+
+
+def test_timeout_header_sets_the_deadline(client):
+    response, elapsed = timed_call(client, TOOL_CALL, {"X-Request-Timeout": "0.3"})
+    assert response.status_code == 504
+    assert response.json()["error"] == {"code": -32001, "message": "Deadline exceeded"}
+    assert elapsed < 3
+
+
+def test_meta_timeout_only_shortens_the_deadline(client):
+    body = {**TOOL_CALL, "params": {**TOOL_CALL["params"], "_meta": {"timeout": 0.3}}}
+    response, elapsed = timed_call(client, body, {"X-Request-Timeout": "60"})
+    assert response.status_code == 504 and elapsed < 3
+    body["params"]["_meta"]["timeout"] = 60
+    response, elapsed = timed_call(client, body, {"X-Request-Timeout": "0.3"})
+    assert response.status_code == 504 and elapsed < 3
+
+
+def test_server_limit_caps_the_header(client, monkeypatch):
+    middleware = app_simple.app.middleware_stack
+    while not isinstance(middleware, deadlines.DeadlineMiddleware):
+        middleware = middleware.app
+    monkeypatch.setattr(middleware, "default_timeout", 0.3)
+    response, elapsed = timed_call(client, TOOL_CALL, {"X-Request-Timeout": "60"})
+    assert response.status_code == 504 and elapsed < 3
+
+
+def test_expired_deadline_stops_a_scan(local_root):
+    root = local_root / "project"
+    for index in range(5):
+        write(root, f"m{index}.py", "import os\nos.system(input())\n")
+    with cancel.activate(cancel.CancelScope(time.time() - 1)):
+        with pytest.raises(cancel.DeadlineExceeded):
+            scan_path(str(root), "full")
+    assert scan_path(str(root), "full").findings
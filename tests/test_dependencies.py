@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from conftest import write
+from scanner import dependencies
+from scanner.dependencies import AdvisoryIndex, DependencyDetector, build_index, version_key
+
+ADVISORIES = [
+    {"id": "GHSA-range", "summary": "Range", "database_specific": {"severity": "HIGH"},
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "Jinja2"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "2.0"}, {"fixed": "2.10.1"},
+                                                                 {"introduced": "3.0.0rc1"}, {"fixed": "3.1.3"}]}]}]},
+    {"id": "GHSA-last", "summary": "Last affected", "database_specific": {"severity": "CRITICAL"},
+     "affected": [{"package": {"ecosystem": "PyPI", "name": "jinja2"},
+                   "ranges": [{"type": "ECOSYSTEM", "events": [{"introduced": "0"}, {"last_affected": "2.4"}]}]}]},
+    {"id": "GHSA-open", "summary": "Never fixed",
+     "affected": [{"package": {"ecosystem": "npm", "name": "left-pad"},
+                   "ranges": [{"type": "SEMVER", "events": [{"introduced": "1.1.0"}]}]}]},
+    {"id": "GHSA-list", "summary": "Listed versions", "database_specific": {"severity": "LOW"},
+     "affected": [{"package": {"ecosystem": "npm", "name": "lodash"}, "versions": ["4.17.20"]}]},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    for advisory in ADVISORIES:
+        write(tmp_path, f"osv/{advisory['id']}.json", json.dumps(advisory))
+    write(tmp_path, "osv/broken.json", "{")
+    assert build_index(str(tmp_path / "osv"), str(tmp_path / "advisories.idx")) == len(ADVISORIES)
+    return AdvisoryIndex(str(tmp_path / "advisories.idx"))
+
+
+@pytest.mark.parametrize("lower, higher", [
+    ("1.0", "1.0.1"), ("1.9", "1.10"), ("2.0.0rc1", "2.0.0"), ("2.0.0.dev1", "2.0.0a1"),
+    ("2.0.0a2", "2.0.0b1"), ("2.0.0", "2.0.0.post1"), ("v1.2", "1.3"),
+])
+def test_version_keys_sort_like_versions(lower, higher):
+    assert version_key(lower) < version_key(higher)
+    assert version_key(higher, inclusive=False) < version_key(higher, inclusive=True)
+
+
+def ids(index, ecosystem, name, version):
+    return sorted(advisory["id"] for advisory in index.match(ecosystem, name, version))
+
+
+@pytest.mark.parametrize("version, expected", [
+    ("1.0", ["GHSA-last"]),
+    ("2.4", ["GHSA-last", "GHSA-range"]),
+    ("2.5", ["GHSA-range"]),
+    ("2.10.1", []),
+    ("3.0.0b1", []),
+    ("3.0.0rc1", ["GHSA-range"]),
+    ("3.1.2", ["GHSA-range"]),
+    ("3.1.3", []),
+    ("not-a-version", []),
+])
+def test_ranges(index, version, expected):
+    assert ids(index, "PyPI", "jinja2", version) == expected
+
+
+def test_names_and_ecosystems(index):
+    assert ids(index, "PyPI", "JINJA2", "2.5") == ["GHSA-range"]
+    assert ids(index, "npm", "jinja2", "2.5") == []
+    assert ids(index, "npm", "left-pad", "99.0.0") == ["GHSA-open"]
+    assert ids(index, "npm", "left-pad", "1.0.9") == []
+    assert ids(index, "npm", "lodash", "4.17.20") == ["GHSA-list"]
+    assert ids(index, "npm", "lodash", "4.17.21") == []
+    assert ids(index, "npm", "unknown", "1.0.0") == []
+
+
+def test_advisory_details(index):
+    [advisory] = index.match("PyPI", "jinja2", "3.1.2")
+    assert advisory == {"id": "GHSA-range", "summary": "Range", "severity": "High", "fixed": "3.1.3"}
+    assert index.match("npm", "left-pad", "2.0.0")[0]["severity"] == "Medium"
+
+
+def test_detector_reports_pinned_manifest_entries(index, monkeypatch):
+    monkeypatch.setattr(dependencies, "_index", index)
+    text = "# pins\nrequests>=2.0\nJinja2==2.5  # templates\nflask\n"
+    findings = DependencyDetector().scan("requirements-dev.txt", text, "quick")
+    assert [(f.rule_id, f.line, f.snippet) for f in findings] == [("GHSA-range", 3, "Jinja2==2.5")]
+    assert "fixed in 2.10.1" in findings[0].description
+    package_json = json.dumps({"dependencies": {"left-pad": "1.3.0", "lodash": "^4.17.20"}}, indent=2)
+    assert [f.rule_id for f in DependencyDetector().scan("web/package.json", package_json, "quick")] == ["GHSA-open"]
+    assert DependencyDetector().scan("package.json", "{", "quick") == []
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from scanner import export
+from scanner.export import _sample_findings, iter_binary, iter_sarif, read_binary
+from scanner.findings import Finding, assign_fingerprints
+
+
+@pytest.fixture
+def findings():
+    findings = _sample_findings(500)
+    findings.append(Finding("PY-EVAL", "Code Injection", "High", "src/ünïcode.py", 0, "eval — dynamic", "eval(x)  # ✓"))
+    for finding in findings:
+        assign_fingerprints([finding], None)
+    findings[0].fingerprint = ""
+    return findings
+
+
+def test_binary_round_trip(findings, monkeypatch):
+    monkeypatch.setattr(export, "CHUNK_SIZE", 1000)
+    chunks = list(iter_binary(findings))
+    assert len(chunks) > 1
+    data = b"".join(chunks)
+    assert list(read_binary(data)) == findings
+    # Repeated strings are written once
+    assert len(data) < len(json.dumps([finding.to_dict() for finding in findings])) / 3
+
+
+def test_binary_rejects_other_and_truncated_data(findings):
+    data = b"".join(iter_binary(findings))
+    with pytest.raises(ValueError, match="Not a findings file"):
+        list(read_binary(b"VGRF\x01" + data[5:]))
+    with pytest.raises(ValueError, match="Not a findings file"):
+        list(read_binary(b"{}"))
+    with pytest.raises(ValueError, match="Truncated"):
+        list(read_binary(data[:len(data) // 2]))
+    assert list(read_binary(b"".join(iter_binary([])))) == []
+
+
+def test_sarif_log(findings, monkeypatch):
+    monkeypatch.setattr(export, "CHUNK_SIZE", 1000)
+    log = json.loads(b"".join(iter_sarif(findings, "https://github.com/example/repo", "abc123")))
+    assert log["version"] == "2.1.0"
+    [run] = log["runs"]
+    rules = run["tool"]["driver"]["rules"]
+    assert sorted(rule["id"] for rule in rules) == sorted({finding.rule_id for finding in findings})
+    assert run["versionControlProvenance"] == [{"repositoryUri": "https://github.com/example/repo", "revisionId": "abc123"}]
+    results = run["results"]
+    assert len(results) == len(findings)
+    for result, finding in zip(results, findings):
+        assert rules[result["ruleIndex"]]["id"] == finding.rule_id == result["ruleId"]
+        location = result["locations"][0]["physicalLocation"]
+        assert location["artifactLocation"]["uri"] == finding.file
+        assert location["region"]["startLine"] == max(finding.line, 1)
+        assert result["partialFingerprints"] == ({"vulngpt/v1": finding.fingerprint} if finding.fingerprint else {})
+    assert {result["level"] for result in results} == {"error", "warning", "note"}
+
+
+def test_empty_sarif_log():
+    log = json.loads(b"".join(iter_sarif([])))
+    assert log["runs"][0]["results"] == []
+    assert "versionControlProvenance" not in log["runs"][0]
@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app_simple
+from scanner import store as findings_store
+from scanner.engine import ScanResult
+from scanner.findings import Finding
+from scanner.store import FindingsStore
+
+REPOSITORY = "https://github.com/example/private"
+AUTHORIZED = {"Authorization": "Bearer puch_ai_token_123"}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = FindingsStore(str(tmp_path / "findings.db"))
+    for commit, snippet in (("a", "eval(a)"), ("b", "eval(b)")):
+        finding = Finding("PY-EVAL", "Code Injection", "High", "secret/app.py", 1, "eval", snippet)
+        store.record(REPOSITORY, "quick", ScanResult([finding], 1, commit)).result()
+    monkeypatch.setattr(findings_store, "_store", store)
+    yield TestClient(app_simple.app)
+    store.close()
+
+
+@pytest.mark.parametrize("path", ["/findings", "/findings/diff"])
+def test_findings_routes_require_a_token(client, path):
+    params = {"repository_url": REPOSITORY}
+    assert client.get(path, params=params).status_code in (401, 403)
+    assert client.get(path, params=params, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get(path, params=params, headers=AUTHORIZED)
+    assert response.status_code == 200
+    assert "secret/app.py" in response.text
+
+
+def rpc(client, method: str, params: dict, headers=None):
+    client.post("/mcp", json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}})
+    return client.post("/mcp", headers=headers or {}, json={"jsonrpc": "2.0", "id": 2, "method": method, "params": params})
+
+
+MCP_READS = [
+    ("resources/list", {}),
+    ("resources/read", {"uri": "vulngpt://scan/1"}),
+    ("resources/subscribe", {"uri": "vulngpt://scan/1"}),
+    ("tools/call", {"name": "list_findings", "arguments": {"repository_url": REPOSITORY}}),
+    ("tools/call", {"name": "diff_scans", "arguments": {"repository_url": REPOSITORY}}),
+]
+
+
+@pytest.mark.parametrize("method, params", MCP_READS)
+def test_mcp_reads_of_stored_scans_require_a_token(client, method, params):
+    response = rpc(client, method, params)
+    assert response.status_code == 401
+    assert response.json()["error"]["code"] == app_simple.UNAUTHORIZED_CODE
+    assert "secret/app.py" not in response.text
+    response = rpc(client, method, params, AUTHORIZED)
+    assert response.status_code == 200
+    assert "result" in response.json()
+
+
+def test_resource_templates_are_public(client):
+    response = rpc(client, "resources/templates/list", {})
+    assert response.status_code == 200
+    assert response.json()["result"]["resourceTemplates"]
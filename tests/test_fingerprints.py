@@ -0,0 +1,87 @@
+from conftest import write
+from scanner.engine import scan_path
+from scanner.findings import Finding, assign_fingerprints, fingerprint
+
+DB = "import os\n\n\ndef run(cmd):\n    os.system(cmd)\n\n\ndef query(cursor, sql):\n    cursor.execute(sql)\n"
+
+
+def finding(line, rule_id="R", snippet="", description="d"):
+    return Finding(rule_id, "Type", "High", "a.py", line, description, snippet)
+
+
+def test_cross_module_findings_get_distinct_fingerprints(local_root):
+    root = local_root / "project"
+    write(root, "db.py", DB)
+    write(root, "app.py", "import sys\nfrom db import run, query\n\nrun(input())\nrun(input())\nquery(c, sys.argv[1])\n")
+    findings = scan_path(str(root), "full").findings
+    cross = [f for f in findings if f.file == "app.py"]
+    assert [(f.rule_id, f.line) for f in cross] == [("TAINT-SHELL", 4), ("TAINT-SHELL", 5), ("TAINT-SQL", 6)]
+    assert [f.snippet for f in cross] == ["run(input())", "run(input())", "query(c, sys.argv[1])"]
+    fingerprints = [f.fingerprint for f in findings]
+    assert all(fingerprints)
+    assert len(set(fingerprints)) == len(fingerprints)
+
+
+def test_fallback_fingerprint_without_text_keeps_sinks_apart():
+    shell, code = finding(3, description="-> os.system"), finding(3, description="-> eval")
+    assert fingerprint(shell) != fingerprint(code)
+    findings = [shell, code, finding(9, description="-> eval")]
+    assign_fingerprints(findings, None)
+    assert len({f.fingerprint for f in findings}) == 3
+
+
+def test_taken_fingerprints_are_not_reused():
+    text = "x = 1\neval(data)\n"
+    reported = [finding(2)]
+    assign_fingerprints(reported, text)
+    again = [finding(2)]
+    assign_fingerprints(again, text, taken={reported[0].fingerprint})
+    assert again[0].fingerprint != reported[0].fingerprint
+
+
+def test_only_newlines_end_lines(local_root):
+    # Form feeds and unicode line separators are not line breaks to Python or the detectors
+    root = local_root / "project"
+    write(root, "app.py", "import os\n# \x0c page   break\nos.system(input())\n")
+    findings = [f for f in scan_path(str(root), "full").findings if f.rule_id == "TAINT-SHELL"]
+    assert [(f.line, f.snippet) for f in findings] == [(3, "os.system(input())")]
+    text = "x = 1  # \x0c\neval(data)\n"
+    moved, plain = finding(2), finding(2)
+    assign_fingerprints([moved], text)
+    assign_fingerprints([plain], "x = 1  #\neval(data)\n")
+    assert moved.fingerprint == plain.fingerprint
+
+
+def fingerprints(text, lines, rule_id="R"):
+    findings = [finding(line, rule_id) for line in lines]
+    assign_fingerprints(findings, text)
+    return [f.fingerprint for f in findings]
+
+
+def test_fingerprints_survive_moves_and_reformatting():
+    text = "import os\n\ndef run(cmd):\n    os.system(cmd)\n    return cmd\n"
+    [original] = fingerprints(text, [4])
+    assert fingerprints("# header\n\n\n" + text, [7]) == [original]
+    assert fingerprints(text.replace("\n\ndef", "\n\n\n\ndef"), [6]) == [original]
+    assert fingerprints(text.replace("    ", "\t").replace("return cmd", "return   cmd  "), [4]) == [original]
+    # The flagged line, its neighbours, the rule and the file are all part of the identity
+    assert fingerprints(text.replace("os.system(cmd)", "os.popen(cmd)"), [4]) != [original]
+    assert fingerprints(text.replace("return cmd", "return None"), [4]) != [original]
+    assert fingerprints(text, [4], rule_id="OTHER") != [original]
+
+
+def test_repeated_code_gets_stable_distinct_fingerprints():
+    block = "x = load()\neval(x)\nprint(x)\n"
+    first = fingerprints(block * 3, [2, 5, 8])
+    assert len(set(first)) == 3
+    assert fingerprints("import os\n" + block * 3, [3, 6, 9]) == first
+    assert fingerprints(block * 3, [2, 5, 8]) == first
+
+
+def test_scan_fingerprints_are_stable(local_root):
+    root = local_root / "project"
+    write(root, "db.py", DB)
+    before = {(f.rule_id, f.snippet): f.fingerprint for f in scan_path(str(root), "full").findings}
+    write(root, "db.py", '"""Database helpers"""\n\n' + DB)
+    after = {(f.rule_id, f.snippet): f.fingerprint for f in scan_path(str(root), "full").findings}
+    assert before and after == before
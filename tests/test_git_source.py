@@ -0,0 +1,163 @@
+import os
+
+import pytest
+
+from conftest import run_git, write
+from scanner import git_source
+from scanner.git_source import GitSource, changed_paths, check_remote_url, ensure_mirror, evict_mirrors
+from scanner.paths import PathFilter
+from scanner.source import MAX_FILE_SIZE, DirectorySource, resolve_source
+
+
+def test_resolve_source_requires_a_local_root(git_repo, monkeypatch):
+    monkeypatch.setenv("SCAN_LOCAL_ROOTS", str(git_repo / "lib"))
+    with pytest.raises(ValueError, match="not enabled"):
+        resolve_source(str(git_repo))
+
+
+def test_resolve_source_rejects_paths_escaping_the_root(git_repo):
+    with pytest.raises(ValueError):
+        resolve_source(str(git_repo / ".." / ".." / "etc"))
+
+
+def test_working_copy_without_commit_reads_the_working_tree(git_repo):
+    source = resolve_source(str(git_repo))
+    assert isinstance(source, DirectorySource)
+    assert source.root == os.path.realpath(git_repo)
+
+
+def test_commit_is_pinned_to_its_id(git_repo):
+    first = run_git(git_repo, "rev-parse", "HEAD~1")
+    source = resolve_source(f"file://{git_repo}", "HEAD~1")
+    assert isinstance(source, GitSource)
+    assert source.commit == first
+    # A later commit on the branch does not move a pinned source
+    write(git_repo, "new.py", "x = 1\n")
+    run_git(git_repo, "add", "-A")
+    run_git(git_repo, "commit", "-q", "-m", "third")
+    assert resolve_source(str(git_repo), first).commit == first
+    assert resolve_source(str(git_repo), "HEAD").commit != source.commit
+
+
+def test_bare_repository_reads_head(git_repo, local_root):
+    bare = local_root / "bare.git"
+    run_git(local_root, "clone", "-q", "--bare", str(git_repo), str(bare))
+    source = resolve_source(str(bare))
+    assert isinstance(source, GitSource)
+    assert source.commit == run_git(git_repo, "rev-parse", "HEAD")
+
+
+@pytest.mark.parametrize("ref", ["--output=/tmp/x", "main;id", "no-such-branch"])
+def test_invalid_or_unknown_commits_are_rejected(git_repo, ref):
+    with pytest.raises(ValueError):
+        resolve_source(str(git_repo), ref)
+
+
+def test_commit_of_a_plain_directory_is_rejected(local_root):
+    (local_root / "plain").mkdir()
+    with pytest.raises(ValueError, match="Not a git repository"):
+        resolve_source(str(local_root / "plain"), "HEAD")
+
+
+@pytest.mark.parametrize("url", ["http://github.com/a/b", "https://10.0.0.1/a", "https://github.com:8443/a/b",
+                                 "ssh://github.com/a/b", "https://github.com.evil.test/a"])
+def test_remote_urls_outside_the_allowlist_are_rejected(url):
+    with pytest.raises(ValueError):
+        check_remote_url(url)
+
+
+def test_ls_tree_lists_blobs_without_symlinks(git_repo):
+    source = resolve_source(str(git_repo), "HEAD")
+    entries = dict(source.entries())
+    assert sorted(entries) == [".gitignore", "app.py", "generated/out.py", "lib/util.py"]
+    assert entries["app.py"] == run_git(git_repo, "rev-parse", "HEAD:app.py")
+
+
+def test_ls_tree_applies_gitignore_and_path_limits(git_repo):
+    source = resolve_source(str(git_repo), "HEAD")
+    selected = [path for path, _ in source.entries(PathFilter.for_scan("full"))]
+    assert "generated/out.py" not in selected
+    assert "app.py" in selected and "lib/util.py" in selected
+
+    limited = GitSource(source.git_dir, source.commit, paths=("lib/util.py", "missing.py"))
+    assert [path for path, _ in limited.entries(PathFilter.for_scan("full"))] == ["lib/util.py"]
+    assert GitSource(source.git_dir, source.commit, paths=()).entries() == []
+
+
+def test_ls_tree_skips_oversized_blobs(git_repo):
+    write(git_repo, "big.py", b"#" * (MAX_FILE_SIZE + 1))
+    run_git(git_repo, "add", "-A")
+    run_git(git_repo, "commit", "-q", "-m", "big")
+    assert "big.py" not in dict(resolve_source(str(git_repo), "HEAD").entries())
+
+
+def test_cat_file_reads_blobs_at_the_pinned_commit(git_repo):
+    first = resolve_source(str(git_repo), "HEAD~1")
+    second = resolve_source(str(git_repo), "HEAD")
+    with first.open() as read_first, second.open() as read_second:
+        assert read_first(dict(first.entries())["app.py"]) == b"import os\nos.system(cmd)\n"
+        assert read_second(dict(second.entries())["app.py"]) == b"import os\nos.system(cmd)\neval(data)\n"
+        # A missing object and a non-blob object read as None, and the reader keeps working
+        assert read_second("0" * 40) is None
+        assert read_second(second.commit) is None
+        assert read_second(dict(second.entries())["lib/util.py"]) == b"def helper():\n    return 1\n"
+
+
+def test_sizes_come_from_batch_check(git_repo):
+    source = resolve_source(str(git_repo), "HEAD")
+    entries = source.entries()
+    assert source.sizes(entries) == [len(open(git_repo / path, "rb").read()) for path, _ in entries]
+    assert source.sizes([("gone.py", "0" * 40)]) == [0]
+
+
+def test_changed_paths_between_commits(git_repo):
+    source = resolve_source(str(git_repo), "HEAD")
+    base = run_git(git_repo, "rev-parse", "HEAD~1")
+    assert changed_paths(source.git_dir, base, source.commit) == ["app.py", "link.py"]
+
+
+@pytest.fixture
+def mirrors(tmp_path, monkeypatch):
+    """Mirror directory that ensure_mirror may fill from local file:// repositories"""
+    directory = tmp_path / "mirrors"
+    monkeypatch.setattr(git_source, "MIRROR_DIR", str(directory))
+    monkeypatch.setattr(git_source, "check_remote_url", lambda url: None)
+    monkeypatch.setattr(git_source, "GIT_ENV", {**git_source.GIT_ENV, "GIT_ALLOW_PROTOCOL": "file"})
+    monkeypatch.setattr(git_source, "CLONE_POLL", 0.01)
+    return directory
+
+
+def test_mirror_records_its_size(git_repo, mirrors):
+    mirror = ensure_mirror(f"file://{git_repo}")
+    assert int(open(mirror + ".size").read()) == git_source._tree_size(mirror)
+
+
+def test_clone_past_the_size_cap_is_dropped(git_repo, mirrors, monkeypatch):
+    write(git_repo, "blob.bin", os.urandom(512 * 1024))
+    run_git(git_repo, "add", "-A")
+    run_git(git_repo, "commit", "-q", "-m", "blob")
+    monkeypatch.setattr(git_source, "MIRROR_MAX_BYTES", 256 * 1024)
+    with pytest.raises(ValueError, match="too large"):
+        ensure_mirror(f"file://{git_repo}")
+    assert not [name for name in os.listdir(mirrors) if name.endswith(".git") or name.startswith(".clone-")]
+
+
+def test_clone_needs_free_disk_space(git_repo, mirrors, monkeypatch):
+    monkeypatch.setattr(git_source, "MIRROR_MIN_FREE_BYTES", 1 << 62)
+    with pytest.raises(ValueError, match="disk space"):
+        ensure_mirror(f"file://{git_repo}")
+
+
+def test_eviction_reads_recorded_sizes(mirrors, monkeypatch):
+    for index, size in enumerate((300, 200, 100)):
+        path = mirrors / f"m{index}.git"
+        write(path, "objects/pack/data", b"x" * size)
+        write(mirrors, f"m{index}.git.size", str(size))
+        write(mirrors, f"m{index}.git.fetched", "")
+        os.utime(mirrors / f"m{index}.git.fetched", (index, index))
+    monkeypatch.setattr(git_source, "_tree_size", lambda path: pytest.fail(f"walked {path}"))
+    monkeypatch.setattr(git_source, "MIRROR_MAX_BYTES", 350)
+    evict_mirrors()
+    # The least recently fetched go first, until the recorded sizes fit
+    assert sorted(name for name in os.listdir(mirrors) if name.endswith(".git")) == ["m1.git", "m2.git"]
+    assert not (mirrors / "m0.git.size").exists()
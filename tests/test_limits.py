@@ -0,0 +1,100 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from conftest import write
+from scanner import engine, limits, rules
+from scanner.engine import scan_path
+
+# Catastrophic backtracking: runs for minutes on a long enough run of "a"
+SLOW_RULE = """
+[[rule]]
+id = "SLOW"
+type = "Code Injection"
+severity = "Low"
+message = "backtracks"
+pattern = '(a+)+b'
+keyword = "aaaa"
+"""
+
+
+@pytest.fixture
+def slow_rules(tmp_path, monkeypatch):
+    """Rule files with a rule that never finishes on slow.py, and pool workers with a short file timeout"""
+    write(tmp_path, "rules/slow.toml", SLOW_RULE)
+    monkeypatch.setattr(rules, "RULE_FILES", rules.RULE_FILES + [str(tmp_path / "rules/slow.toml")])
+    monkeypatch.setattr(rules, "_ruleset", None)
+    monkeypatch.setattr(limits, "SCAN_FILE_TIMEOUT", 0.5)
+    engine.shutdown_pool()
+    yield
+    engine.shutdown_pool()
+
+
+def test_slow_file_in_small_scan_is_skipped(local_root, slow_rules):
+    root = local_root / "project"
+    write(root, "slow.py", "a" * 40 + "c\n")
+    write(root, "app.py", "eval(data)\n")
+    started = time.monotonic()
+    result = scan_path(str(root), "quick")
+    assert time.monotonic() - started < 10
+    assert result.skipped == [{"file": "slow.py", "status": limits.SKIPPED, "limit": "time"}]
+    assert result.files_scanned == 1
+    assert [(f.file, f.rule_id) for f in result.findings] == [("app.py", "PY-EVAL")]
+
+
+def allocate(megabytes: int) -> str:
+    try:
+        with limits.file():
+            block = bytearray(megabytes * 1024 * 1024)
+            return f"allocated {len(block)}"
+    except limits.LimitExceeded as e:
+        return e.limit
+
+
+def spin(seconds: float, cpu_seconds: int = 0) -> str:
+    with limits.task(cpu_seconds):
+        try:
+            with limits.file():
+                end = time.monotonic() + seconds
+                while time.monotonic() < end:
+                    pass
+        except limits.LimitExceeded as e:
+            try:
+                limits.check_task()
+            except limits.TaskLimitExceeded:
+                return f"{e.limit}, task over"
+            return e.limit
+    return "finished"
+
+
+@pytest.fixture
+def worker():
+    """A forked worker with 64 MiB of extra address space and a 0.5s file timeout"""
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("fork"),
+                             initializer=limits.install, initargs=(64, 0.5)) as executor:
+        yield executor
+
+
+def test_worker_limits_surface_as_skips(worker):
+    assert worker.submit(allocate, 16).result(30) == f"allocated {16 * 1024 * 1024}"
+    assert worker.submit(allocate, 512).result(30) == "memory"
+    assert worker.submit(spin, 0.1).result(30) == "finished"
+    assert worker.submit(spin, 5).result(30) == "time"
+    # The worker stays usable after each limit
+    assert worker.submit(allocate, 16).result(30) == f"allocated {16 * 1024 * 1024}"
+
+
+def test_task_cpu_budget():
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("fork"),
+                             initializer=limits.install, initargs=(0, 0)) as executor:
+        assert executor.submit(spin, 10, 1).result(30) == "cpu, task over"
+        assert executor.submit(spin, 0.1, 1).result(30) == "finished"
+
+
+def test_limits_are_not_enforced_in_the_server():
+    assert allocate(16) == f"allocated {16 * 1024 * 1024}"
+    started = time.monotonic()
+    assert spin(0.2) == "finished"
+    assert time.monotonic() - started >= 0.2
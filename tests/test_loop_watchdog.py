@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+
+import loop_watchdog
+from admission import LoopLagMonitor
+from loop_watchdog import LoopWatchdog
+
+
+def run_with_watchdog(handler, threshold: float = 0.05) -> LoopWatchdog:
+    monitor = LoopLagMonitor(interval=0.02)
+    watchdog = LoopWatchdog(monitor, threshold=threshold, sample_interval=0.005)
+
+    async def main():
+        heartbeat = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.1)
+        await asyncio.create_task(handler(), name="handler")
+        await asyncio.sleep(0.1)
+        heartbeat.cancel()
+
+    watchdog.start()
+    try:
+        asyncio.run(main())
+    finally:
+        watchdog.stop()
+    return watchdog
+
+
+async def blocking_handler():
+    time.sleep(0.3)
+
+
+async def awaiting_handler():
+    await asyncio.sleep(0.3)
+
+
+def test_stall_is_recorded_with_the_blocking_code():
+    watchdog = run_with_watchdog(blocking_handler)
+    stats = watchdog.stats()
+    assert stats["stalls"] == 1
+    assert 200 <= stats["max_stall_ms"] <= 400
+    last = stats["last"]
+    assert "test_loop_watchdog.py" in last["location"] and last["location"].endswith("in blocking_handler")
+    assert last["task"] == "handler (blocking_handler)"
+    assert any("time.sleep(0.3)" in line for line in watchdog.recent[-1]["stack"])
+
+
+def test_awaiting_handler_is_not_a_stall():
+    assert run_with_watchdog(awaiting_handler).stats() == {"stalls": 0, "stalled_ms": 0.0, "max_stall_ms": 0.0, "last": None}
+
+
+def test_long_stall_is_logged_while_it_lasts(monkeypatch, caplog):
+    monkeypatch.setattr(loop_watchdog, "LONG_STALL", 0.15)
+    with caplog.at_level(logging.WARNING, logger="loop_watchdog"):
+        run_with_watchdog(blocking_handler)
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith("Event loop blocked for") and "so far in" in message for message in messages)
+    assert sum("so far" not in message for message in messages) == 1
+
+
+def test_zero_threshold_disables_the_watchdog():
+    watchdog = LoopWatchdog(LoopLagMonitor(), threshold=0)
+    watchdog.start()
+    assert watchdog._thread is None
+    watchdog.stop()
+
+
+def test_stalls_under_the_threshold_are_ignored():
+    assert run_with_watchdog(blocking_handler, threshold=1.0).stats()["stalls"] == 0
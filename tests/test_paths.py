@@ -0,0 +1,69 @@
+import pytest
+
+from scanner.paths import PathFilter, detect_language, is_minified, select_tree
+
+FULL = PathFilter.for_scan("full")
+
+
+def selected(paths, ignore_files: dict, path_filter: PathFilter = FULL):
+    return select_tree(paths, path_filter, lambda directory: ignore_files.get(directory))
+
+
+@pytest.mark.parametrize("pattern, ignored, kept", [
+    ("*.log", ["a.log", "deep/dir/b.log"], ["a.log.py", "log.py"]),
+    ("/build.py", ["build.py"], ["pkg/build.py"]),
+    ("docs/*.py", ["docs/conf.py"], ["docs/api/conf.py", "pkg/docs/conf.py"]),
+    ("**/gen/*.py", ["gen/a.py", "x/y/gen/a.py"], ["gen/sub/a.py"]),
+    ("secret/", ["secret/key.py", "x/secret/key.py"], ["secret.py"]),
+    ("data/**", ["data/a.py", "data/b/c.py"], ["data.py"]),
+    ("file[0-9].py", ["file1.py"], ["filea.py"]),
+    ("\\#hash.py", ["#hash.py"], ["hash.py"]),
+])
+def test_gitignore_patterns(pattern, ignored, kept):
+    assert selected(ignored + kept, {"": [pattern]}) == kept
+
+
+def test_negation_and_rule_order():
+    paths = ["a.py", "keep.py", "logs/x.py"]
+    assert selected(paths, {"": ["*.py", "!keep.py"]}) == ["keep.py"]
+    assert selected(paths, {"": ["!keep.py", "*.py"]}) == []
+    # A file cannot be re-included from an excluded directory
+    assert selected(paths, {"": ["logs/", "!logs/x.py"]}) == ["a.py", "keep.py"]
+
+
+def test_nested_ignore_files_apply_to_their_subtree():
+    paths = ["a.gen.py", "pkg/a.gen.py", "pkg/sub/b.gen.py", "other/c.gen.py", "pkg/keep.py"]
+    assert selected(paths, {"pkg": ["*.gen.py", "# comment", ""]}) == ["a.gen.py", "other/c.gen.py", "pkg/keep.py"]
+    assert selected(paths, {"pkg": ["/a.gen.py"]}) == [p for p in paths if p != "pkg/a.gen.py"]
+
+
+def test_builtin_excludes_win_over_ignore_files():
+    paths = ["node_modules/lib/index.js", "app.js", "dist/app.js", "web/app.min.js", "logo.png"]
+    assert selected(paths, {"": ["!node_modules/", "!dist/"]}) == ["app.js"]
+
+
+def test_scan_profiles():
+    paths = ["app.py", "tests/test_app.py", "README.md", "requirements.txt", "notes.txt", "docs/conf.py"]
+    assert selected(paths, {}, PathFilter.for_scan("quick")) == ["app.py", "requirements.txt"]
+    assert selected(paths, {}, PathFilter.for_scan("deep")) == ["app.py", "tests/test_app.py", "requirements.txt", "notes.txt"]
+    assert selected(paths, {}) == paths
+    assert selected(paths, {}, PathFilter.for_scan("full", include=["*.py"])) == ["app.py", "tests/test_app.py", "docs/conf.py"]
+
+
+@pytest.mark.parametrize("path, text, language", [
+    ("app.py", "", "python"),
+    ("web/App.TSX", "", "typescript"),
+    ("requirements-dev.txt", "", "manifest"),
+    ("package.json", "{}", "manifest"),
+    ("bin/tool", "#!/usr/bin/env -S python3.11\n", "python"),
+    ("bin/run", "#!/bin/bash\n", "shell"),
+    ("Makefile.unknown", "", None),
+    ("bin/empty", "#!\n", None),
+])
+def test_detect_language(path, text, language):
+    assert detect_language(path, text) == language
+
+
+def test_minified():
+    assert is_minified("var a=1;" * 1000)
+    assert not is_minified("var a = 1;\n" * 1000)
@@ -0,0 +1,81 @@
+import json
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+
+import app_simple
+from conftest import write
+from scanner import progress
+from scanner.engine import scan_path
+from scanner.progress import ProgressReporter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(progress.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_updates_are_throttled(clock):
+    updates = []
+    reporter = ProgressReporter(lambda *update: updates.append(update), min_interval=1)
+    for done in range(1, 50):
+        reporter.report(done, 100, done // 10)
+        clock[0] += 0.25
+    assert [done for done, _, _ in updates] == list(range(1, 50, 4))
+    # Completion is sent at once, but never twice and never followed by older progress
+    reporter.report(100, 100, 7)
+    reporter.report(100, 100, 7)
+    clock[0] += 5
+    reporter.report(60, 100, 7)
+    assert updates[-1] == (100, 100, 7) and len(updates) == 14
+
+
+def test_parts_map_passes_onto_one_range(clock):
+    updates = []
+    reporter = ProgressReporter(lambda *update: updates.append(update), min_interval=0)
+    first, second = reporter.part(0, 2), reporter.part(1, 2)
+    first.report(5, 10, 1)
+    first.report(10, 10, 2)
+    second.report(3, 10, 2)
+    second.report(10, 10, 4)
+    assert updates == [(5, 20, 1), (10, 20, 2), (13, 20, 2), (20, 20, 4)]
+
+
+def test_scan_reports_completion(local_root):
+    root = local_root / "project"
+    for index in range(20):
+        write(root, f"m{index}.py", "import os\nos.system(input())\n")
+    updates = []
+    with progress.activate(ProgressReporter(lambda *update: updates.append(update))):
+        scan_path(str(root), "full")
+    done, total, findings = updates[-1]
+    assert done == total > 0
+    assert [update[0] for update in updates] == sorted({update[0] for update in updates})
+    progress.report(1, 1, 1)
+
+
+def test_progress_token_streams_throttled_notifications(monkeypatch):
+    def work():
+        for done in range(1, 100001):
+            progress.report(done, 100000, done // 1000)
+        return app_simple.Outcome.error(-32000, "finished", status_code=500)
+
+    async def tool(request, tool_name, arguments):
+        return await anyio.to_thread.run_sync(work)
+
+    monkeypatch.setattr(app_simple, "dispatch_tool", tool)
+    with TestClient(app_simple.app) as client:
+        client.post("/mcp", json={"jsonrpc": "2.0", "id": 0, "method": "initialize", "params": {}})
+        response = client.post("/mcp", headers={"Accept": "application/json, text/event-stream"}, json={
+            "jsonrpc": "2.0", "id": 5, "method": "tools/call",
+            "params": {"name": "slow", "arguments": {}, "_meta": {"progressToken": "p1"}}})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    *notifications, result = events
+    assert result["id"] == 5 and result["error"]["message"] == "finished"
+    assert 1 <= len(notifications) < 100
+    assert all(n["method"] == "notifications/progress" and n["params"]["progressToken"] == "p1" for n in notifications)
+    assert notifications[-1]["params"]["progress"] == notifications[-1]["params"]["total"] == 100000
@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+import httpx
+
+from replay import replay
+
+
+def record(ts, method, request_id):
+    body = json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method})
+    return {"ts": ts, "method": "POST", "path": "/mcp", "query": "", "headers": {}, "body": body, "status": 200}
+
+
+def stateful_app():
+    """An app answering 400 until it has been initialized, slow to initialize"""
+    state = {"initialized": False, "initialize_calls": 0}
+
+    async def app(scope, receive, send):
+        message = json.loads((await receive())["body"])
+        if message["method"] == "initialize":
+            state["initialize_calls"] += 1
+            await asyncio.sleep(0.05)
+            state["initialized"] = True
+        status = 200 if state["initialized"] else 400
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": json.dumps({"id": message["id"]}).encode()})
+
+    return app, state
+
+
+def run(records):
+    app, state = stateful_app()
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+            return await replay(records, client, speed=0)
+
+    return asyncio.run(main()), state
+
+
+def test_captured_initialize_completes_before_other_requests():
+    records = [record(1.0, "initialize", 1)] + [record(1.0 + i / 100, "tools/list", i) for i in range(2, 10)]
+    results, state = run(records)
+    assert [result["status"] for result in results] == [200] * len(records)
+    assert [result["record"] for result in results] == records
+
+
+def test_sampled_capture_without_initialize_is_initialized_first():
+    records = [record(1.0 + i / 100, "tools/list", i) for i in range(5)]
+    results, state = run(records)
+    assert state["initialize_calls"] == 1
+    assert len(results) == len(records)
+    assert all(result["status"] == 200 for result in results)
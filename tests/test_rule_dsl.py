@@ -0,0 +1,116 @@
+import re
+
+import pytest
+
+from scanner.rule_dsl import RuleError, infer_keyword, load_rule_files, parse_rules
+
+
+def rule_file(pattern: str, **fields) -> bytes:
+    lines = ["[[rule]]", 'id = "R"', 'type = "Code Injection"', 'severity = "High"', 'message = "m"',
+             f"pattern = '{pattern}'"]
+    lines += [f"{name} = {value}" for name, value in fields.items()]
+    return "\n".join(lines).encode()
+
+
+def inferred(pattern: str, **fields) -> str:
+    return parse_rules("rules.toml", rule_file(pattern, **fields))[0].keyword
+
+
+@pytest.mark.parametrize("pattern, keyword", [
+    (r"(?<![\w.])eval\s*\(", "eval"),
+    (r"pickle\.loads?\(", "pickle.load"),
+    (r"os\.system\s*\(", "os.system"),
+    (r"ab+cdef", "cdef"),
+    (r"abc|def", ""),
+    (r"(abc)de", ""),
+    (r"api_key\s*=", "api_key"),
+])
+def test_infer_keyword(pattern, keyword):
+    assert infer_keyword(pattern) == keyword
+
+
+@pytest.mark.parametrize("pattern", [r"\x41PIKEY\s*=", r"\U00000041PIKEY\s*=",
+                                     r"\101PIKEY\s*=", r"\N{LATIN CAPITAL LETTER A}PIKEY\s*="])
+def test_numeric_escapes_end_the_keyword(pattern):
+    assert re.search(pattern, "APIKEY =")
+    assert infer_keyword(pattern) == "PIKEY"
+    assert inferred(pattern) in "APIKEY ="
+
+
+def test_backreference_digits_are_not_literal():
+    assert infer_keyword(r"(['\"])token12\1234") == "token12"
+
+
+def test_verbose_pattern_infers_no_keyword():
+    assert inferred("(?x) secret ") == ""
+    assert inferred("(?x) secret \\s* = ") == ""
+    assert inferred("(?i)secret") == ""
+    assert inferred("(?i)secret", keyword='"secret"') == "secret"
+
+
+def test_explicit_keyword_wins():
+    assert inferred(r"eval\s*\(", keyword='"ev"') == "ev"
+
+
+def errors(data: bytes, path: str = "rules.toml") -> str:
+    with pytest.raises(RuleError) as error:
+        parse_rules(path, data)
+    return str(error.value)
+
+
+@pytest.mark.parametrize("fields, message", [
+    ({"scan_type": '"slow"'}, "scan_type must be one of quick, deep, full"),
+    ({"scan_type": '["deep"]'}, "scan_type must be one of"),
+    ({"flags": '["unicode"]'}, "flags must be a list of"),
+    ({"flags": '[["ignorecase"]]'}, "flags must be a list of"),
+    ({"keyword": "3"}, "keyword must be a string"),
+    ({"files": '"*.py"'}, "files must be a list of globs"),
+    ({"patterns": '["a"]'}, "exactly one of 'pattern' and 'patterns'"),
+    ({"severity_level": '"High"'}, "unknown fields severity_level"),
+])
+def test_invalid_fields(fields, message):
+    assert message in errors(rule_file("eval", **fields))
+
+
+def test_unknown_severity():
+    data = rule_file("eval").replace(b'"High"', b'"Severe"')
+    assert errors(data) == "rules.toml: rule 1 (R): severity must be one of Critical, High, Medium, Low"
+
+
+@pytest.mark.parametrize("pattern, message", [
+    ("eval(", "invalid pattern: missing ), unterminated subpattern"),
+    ("a*", "pattern matches the empty string"),
+    ("(?:x|)", "pattern matches the empty string"),
+])
+def test_invalid_patterns(pattern, message):
+    assert f"rules.toml: rule 1 (R): {message}" in errors(rule_file(pattern))
+
+
+def test_every_invalid_rule_is_reported():
+    data = b"\n".join([
+        rule_file("eval"),
+        rule_file("exec"),
+        b'[[rule]]\nid = "bad id"\ntype = "t"\nseverity = "Low"\nmessage = "m"\npattern = "x"',
+        b'[[rule]]\ntype = "t"\nseverity = "Low"\nmessage = "m"\npattern = "x"',
+    ])
+    assert errors(data).splitlines() == [
+        "rules.toml: rule 2 (R): duplicate id",
+        "rules.toml: rule 3 (bad id): invalid id 'bad id'",
+        "rules.toml: rule 4: 'id' is required",
+    ]
+
+
+def test_unreadable_files():
+    assert errors(b"rule = 'x'") == "rules.toml: expected a list of rules under 'rule'"
+    assert errors(b"[[rule]\n").startswith("rules.toml: ")
+    assert errors(b"\xff").startswith("rules.toml: ")
+    assert errors(b"rule = [1]") == "rules.toml: rule 1: expected a table"
+    with pytest.raises(RuleError, match="missing.toml: No such file"):
+        load_rule_files(["missing.toml"])
+
+
+def test_later_files_replace_rules_by_id():
+    first = rule_file("eval") + b"\n" + rule_file("exec").replace(b'"R"', b'"S"')
+    second = rule_file("compile").replace(b'"High"', b'"Low"')
+    rules = load_rule_files(["a.toml", "b.toml"], [first, second])
+    assert [(rule.id, rule.pattern, rule.severity) for rule in rules] == [("S", "exec", "High"), ("R", "compile", "Low")]
@@ -0,0 +1,37 @@
+import os
+import signal
+import socket
+import time
+
+import pytest
+
+import serve
+
+
+@pytest.fixture
+def supervisor(monkeypatch):
+    handlers = {signum: signal.getsignal(signum) for signum in (signal.SIGTERM, signal.SIGINT)}
+    monkeypatch.setattr(serve, "RESPAWN_BACKOFF", 0.05)
+    args = serve.parse_args(["--workers", "2", "--graceful-timeout", "1"])
+    sock = socket.socket()
+    yield serve.Supervisor(None, args, sock)
+    sock.close()
+    for signum, handler in handlers.items():
+        signal.signal(signum, handler)
+
+
+def test_workers_failing_at_startup_make_the_supervisor_give_up(supervisor, monkeypatch):
+    monkeypatch.setattr(serve, "_run_worker", lambda app, args, sock: os._exit(3))
+    started = time.monotonic()
+    assert supervisor.run() == 1
+    assert supervisor.failures == serve.MAX_STARTUP_FAILURES
+    assert not supervisor.workers
+    # Replacements were delayed by the backoff, 0.05s and then 0.1s
+    assert time.monotonic() - started >= 0.15
+
+
+def test_forwarded_headers_trusted_from_localhost_only(monkeypatch):
+    monkeypatch.delenv("FORWARDED_ALLOW_IPS", raising=False)
+    assert serve.parse_args([]).forwarded_allow_ips == "127.0.0.1"
+    args = serve.parse_args(["--forwarded-allow-ips", "10.0.0.1,10.0.0.2"])
+    assert serve.build_config(None, args).forwarded_allow_ips == "10.0.0.1,10.0.0.2"
@@ -0,0 +1,54 @@
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from conftest import write
+from static_assets import StaticAssetCache
+
+PAGE = "<html>" + "<p>hello</p>" * 200 + "</html>"
+
+
+def request(accept_encoding: str, **headers) -> Request:
+    headers = [(b"accept-encoding", accept_encoding.encode())] + [
+        (name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    write(tmp_path, "index.html", PAGE)
+    cache = StaticAssetCache(str(tmp_path))
+    # Stands in for a brotli variant when brotli is not installed
+    cache.get("index.html").br_body = b"brotli"
+    return cache
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("gzip, br", "br"),
+    ("gzip, deflate", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0.5, br;q=0.2", "gzip"),
+    ("xbrotli, gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    ("*", "br"),
+    ("*;q=0.1, gzip;q=0", "br"),
+    ("", None),
+])
+def test_encoding_follows_q_values(cache, accept_encoding, encoding):
+    response = cache.response(request(accept_encoding), "index.html")
+    assert response.headers.get("content-encoding") == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    if encoding is None:
+        assert response.body == PAGE.encode()
+    elif encoding == "gzip":
+        assert gzip.decompress(response.body) == PAGE.encode()
+
+
+def test_each_encoding_has_its_own_etag(cache):
+    plain = cache.response(request(""), "index.html").headers["etag"]
+    gzipped = cache.response(request("gzip"), "index.html").headers["etag"]
+    assert plain != gzipped
+    assert cache.response(request("gzip", if_none_match=gzipped), "index.html").status_code == 304
+    assert cache.response(request("", if_none_match=gzipped), "index.html").status_code == 200
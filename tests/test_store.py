@@ -0,0 +1,48 @@
+import pytest
+
+from scanner.engine import ScanResult
+from scanner.findings import Finding
+from scanner.store import FindingsStore
+
+
+def findings(count, prefix="f"):
+    return [Finding("R", "Type", "High", f"{prefix}{i}.py", 1, "description") for i in range(count)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FindingsStore(str(tmp_path / "findings.db"))
+    yield store
+    store.close()
+
+
+def record(store, commit, items):
+    return store.record("https://example.com/repo", "quick", ScanResult(items, len(items), commit)).result()
+
+
+def test_diff_lists_new_and_fixed(store):
+    base = record(store, "a", findings(3))
+    head = record(store, "b", findings(2) + findings(1, prefix="g"))
+    diff = store.diff(base, head)
+    assert [f.file for f in diff["new"]] == ["g0.py"]
+    assert [f.file for f in diff["fixed"]] == ["f2.py"]
+    assert diff["totals"] == {"new": 1, "fixed": 1}
+    assert diff["truncated"] is False
+    assert store.changed(head)
+
+
+def test_diff_reports_truncation(store):
+    base = record(store, "a", findings(5))
+    head = record(store, "b", findings(2, prefix="g"))
+    diff = store.diff(base, head, limit=3)
+    assert len(diff["fixed"]) == 3
+    assert len(diff["new"]) == 2
+    assert diff["totals"] == {"new": 2, "fixed": 5}
+    assert diff["truncated"] is True
+
+
+def test_unchanged_scan(store):
+    base = record(store, "a", findings(2))
+    head = record(store, "b", findings(2))
+    assert not store.changed(head)
+    assert store.diff(base, head)["totals"] == {"new": 0, "fixed": 0}
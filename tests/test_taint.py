@@ -0,0 +1,80 @@
+import pytest
+
+from scanner import taint
+from scanner.taint import TaintDetector, analyze_cached
+
+DB = "import os\n\n\ndef run(cmd):\n    os.system(cmd)\n"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Empty taint caches, counting the modules actually parsed"""
+    parsed = []
+    analyze = taint.analyze_module
+    monkeypatch.setattr(taint, "CACHE_DIR", str(tmp_path / "taint"))
+    monkeypatch.setattr(taint, "_memory_cache", taint.OrderedDict())
+    monkeypatch.setattr(taint, "analyze_module", lambda path, text: parsed.append(path) or analyze(path, text))
+    return parsed
+
+
+def scan(text: str, path: str = "app.py"):
+    return [(f.rule_id, f.line) for f in TaintDetector().scan(path, text, "deep")]
+
+
+@pytest.mark.parametrize("text, findings", [
+    ("import os\nos.system(input())\n", [("TAINT-SHELL", 2)]),
+    ("import sys\nname = sys.argv[1]\nquery = 'SELECT ' + name\ncursor.execute(query)\n", [("TAINT-SQL", 4)]),
+    ("from flask import request\n\ndef view():\n    eval(request.args['x'])\n", [("TAINT-CODE", 4)]),
+    ("import subprocess\nsubprocess.run(input(), shell=True)\n", [("TAINT-SHELL", 2)]),
+    # Sanitized or constant values reach no sink
+    ("import sys\ncursor.execute('SELECT %s' % int(sys.argv[1]))\n", []),
+    ("import os\nos.system('ls')\n", []),
+    ("import os\n\ndef run(cmd):\n    os.system(cmd)\n\nrun('ls')\n", []),
+])
+def test_source_to_sink(cache, text, findings):
+    assert scan(text) == findings
+
+
+def test_local_function_summary_is_applied(cache):
+    assert scan(DB + "\nrun(input())\n") == [("TAINT-SHELL", 7)]
+
+
+def test_unparseable_module_has_no_findings(cache):
+    assert scan("def broken(:\n") == []
+    assert analyze_cached("broken.py", "def broken(:\n") is None
+
+
+def test_modules_are_parsed_once(cache, monkeypatch):
+    text = "import os\nos.system(input())\n"
+    first = analyze_cached("app.py", text)
+    assert analyze_cached("app.py", text) is first
+    # A new process finds the entry on disk
+    monkeypatch.setattr(taint, "_memory_cache", taint.OrderedDict())
+    assert analyze_cached("app.py", text) == first
+    assert cache == ["app.py"]
+    analyze_cached("app.py", text + "x = 1\n")
+    analyze_cached("other.py", text)
+    assert cache == ["app.py", "app.py", "other.py"]
+
+
+def test_new_analyzer_version_ignores_old_entries(cache, monkeypatch):
+    analyze_cached("app.py", DB)
+    monkeypatch.setattr(taint, "_memory_cache", taint.OrderedDict())
+    monkeypatch.setattr(taint, "ANALYZER_VERSION", taint.ANALYZER_VERSION + 1)
+    analyze_cached("app.py", DB)
+    assert cache == ["app.py", "app.py"]
+
+
+def test_finalize_follows_calls_through_modules(cache):
+    detector = TaintDetector()
+    files = {
+        "pkg/db.py": DB,
+        "pkg/service.py": "from pkg.db import run\n\n\ndef handle(value):\n    run(value)\n",
+        "app.py": "from pkg.service import handle\n\nhandle(input())\nhandle('ls')\n",
+    }
+    summaries = [summary for path, text in files.items() if (summary := detector.summarize(path, text, "deep"))]
+    findings = detector.finalize(summaries, "deep")
+    assert [(f.file, f.line, f.rule_id) for f in findings] == [("app.py", 3, "TAINT-SHELL")]
+    assert "pkg/service.py" in findings[0].description
+    # finalize works on copies; the cached summaries are unchanged
+    assert analyze_cached("pkg/service.py", files["pkg/service.py"])["functions"]["handle"]["sinks"] == {}
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+import app_simple
+import auth_tokens
+from admission import NORMAL, AdmissionController, AdmissionMiddleware
+from app_simple import valid_phone_number, valid_phone_numbers, validate_tokens
+
+PHONES = [
+    "919876543210", "911234567890", "919876543210",
+    "929876543210", "819876543210", "91987654321", "9198765432100", "",
+    "91987654321x", "91 987654321", "91９８７６５４３２１０", "९१९८७६५४३२१०",
+]
+
+
+def test_valid_phone_numbers_match_the_scalar_check():
+    assert valid_phone_numbers(PHONES).tolist() == [valid_phone_number(phone) for phone in PHONES]
+    assert valid_phone_numbers(PHONES).tolist()[:3] == [True, True, True]
+    assert not any(valid_phone_numbers(PHONES).tolist()[3:])
+    assert valid_phone_numbers([]).tolist() == []
+
+
+@pytest.fixture
+def verifier(monkeypatch):
+    verifier = auth_tokens.TokenVerifier({"k1": b"secret"})
+    monkeypatch.setattr(auth_tokens, "_verifier", verifier)
+    return verifier
+
+
+def test_validate_tokens_in_request_order(verifier, monkeypatch):
+    monkeypatch.setattr(app_simple, "USER_DATABASE", {"static": "919876543210", "bad-phone": "12345"})
+    signed = verifier.issue("911234567890")
+    result = validate_tokens(["static", signed, "bad-phone", "unknown", signed])
+    assert result["results"] == ["919876543210", "911234567890", "invalid_phone", "invalid_token", "911234567890"]
+    assert (result["valid"], result["invalid"]) == (3, 2)
+
+
+def test_large_batch_is_admitted_as_normal(verifier):
+    tokens = [verifier.issue("919876543210") for _ in range(2)] * 2500
+    body = app_simple.json.dumps({"tokens": tokens}).encode()
+    assert len(body) > 64 * 1024
+    controller = AdmissionController()
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["in_flight"] = list(controller.in_flight)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "POST", "path": "/validate/batch", "headers": []}
+    asyncio.run(AdmissionMiddleware(app, controller)(scope, receive, send))
+    assert seen["in_flight"][NORMAL] == 1
+    assert sum(seen["in_flight"]) == 1
+
+
+def call_validate_batch(headers: dict):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app_simple.app)
+    client.post("/mcp", json={"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}})
+    return client.post("/mcp", headers=headers, json={
+        "jsonrpc": "2.0", "id": 2, "method": "tools/call",
+        "params": {"name": "validate_batch", "arguments": {"tokens": ["demo_token_456", "unknown"]}}
+    })
+
+
+def test_validate_batch_tool_requires_authentication():
+    response = call_validate_batch({})
+    assert response.status_code == 401
+    assert response.json()["error"]["code"] == app_simple.UNAUTHORIZED_CODE
+    response = call_validate_batch({"Authorization": "Bearer not-a-token"})
+    assert response.status_code == 401
+
+
+def test_validate_batch_tool_with_token():
+    response = call_validate_batch({"Authorization": "Bearer puch_ai_token_123"})
+    assert response.status_code == 200
+    data = app_simple.json.loads(response.json()["result"]["content"][1]["text"])
+    assert data["results"] == ["918765432109", "invalid_token"]